@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
+import os
 import subprocess
 import sys
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server'))
+from config_editor import ConfigEditor
+from ocm_transport import get_transport
+
+NODE = {'id': 'pc-bb', 'host': '192.168.3.17', 'sshUser': 'openclaw02', 'sshPort': 22,
+        'ocPath': '/home/openclaw02/.openclaw'}
+
 def delete_agent(agent_id):
     try:
         print(f'删除agent: {agent_id}')
@@ -12,20 +20,20 @@ def delete_agent(agent_id):
                        'cd ~/.openclaw && cp openclaw.json openclaw.json.backup-final'], 
                        check=True)
         
-        # 2. 读取和修改配置
+        # 2. 读取配置，删除agent的修改以 JSON-patch 提交 (节点上应用，记录历史可撤销)
         result = subprocess.run(['ssh', 'openclaw02@192.168.3.17', 
                                 'cd ~/.openclaw && cat openclaw.json'], 
                                capture_output=True, text=True, check=True)
         config = json.loads(result.stdout)
         
         # 删除agent
-        config['agents']['list'] = [a for a in config['agents']['list'] if a.get('id') != agent_id]
+        updated = dict(config, agents=dict(config['agents']))
+        updated['agents']['list'] = [a for a in config['agents']['list'] if a.get('id') != agent_id]
         
         # 写回配置
-        config_json = json.dumps(config, indent=2)
-        subprocess.run(['ssh', 'openclaw02@192.168.3.17', 
-                       f'cd ~/.openclaw && cat > openclaw.json << ENDCONFIG\n{config_json}\nENDCONFIG'], 
-                       shell=True, check=True)
+        editor = ConfigEditor(NODE, get_transport(NODE))
+        editor.edit(config, updated, f'final_delete {agent_id}')
+        editor.commit()
         
         # 3. 删除目录
         subprocess.run(['ssh', 'openclaw02@192.168.3.17', 
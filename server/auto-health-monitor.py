@@ -10,10 +10,14 @@ import sqlite3
 import time
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import threading
 import sys
 import os
 
+from health_writer import HealthResultWriter
+import proc_sampler
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -23,12 +27,15 @@ class AutoHealthMonitor:
         self.db_path = db_path
         self.monitoring_interval = 300  # 5分钟检查间隔
         self.ssh_timeout = 30
+        self.max_workers = 8  # 并行探测线程数
         self.is_running = False
+        self.writer = HealthResultWriter(db_path)
         
     def start_monitoring(self):
         """启动健康监控服务"""
         logger.info("🚀 启动自动化节点健康监控服务...")
         self.is_running = True
+        self.writer.start()
         
         monitor_thread = threading.Thread(target=self.monitoring_loop, daemon=True)
         monitor_thread.start()
@@ -40,6 +47,7 @@ class AutoHealthMonitor:
         """停止监控服务"""
         logger.info("⏹️ 停止健康监控服务...")
         self.is_running = False
+        self.writer.stop()
     
     def monitoring_loop(self):
         """监控主循环"""
@@ -57,22 +65,24 @@ class AutoHealthMonitor:
             nodes = self.get_nodes_from_database()
             logger.info(f"📊 开始检查 {len(nodes)} 个节点的健康状态...")
             
-            for node in nodes:
-                try:
-                    health_result = self.check_node_health(node)
-                    self.update_node_health_status(node['id'], health_result)
-                    
-                    # 记录状态变化
-                    if health_result.get('status_changed', False):
-                        logger.info(f"🔄 节点 {node['name']} 状态变化: {health_result.get('old_status')} → {health_result.get('new_status')}")
-                        
-                except Exception as e:
-                    logger.error(f"❌ 检查节点 {node.get('name', node.get('id'))} 失败: {str(e)}")
+            # 探测线程只负责检查，结果统一交给写线程批量落库
+            results = {}
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = {pool.submit(self.check_node_health, node): node for node in nodes}
+                for future, node in futures.items():
+                    try:
+                        results[node['id']] = future.result()
+                    except Exception as e:
+                        logger.error(f"❌ 检查节点 {node.get('name', node.get('id'))} 失败: {str(e)}")
+            
+            # 记录状态变化
+            for change in self.writer.write_cycle(results).result():
+                logger.info(f"🔄 节点 {change['node_id']} 状态变化: {change['old_status']} → {change['new_status']} (分数: {change['health_score']})")
             
             logger.info("✅ 节点健康检查循环完成")
             
         except Exception as e:
-            logger.error(f"❌ 获取节点列表失败: {str(e)}")
+            logger.error(f"❌ 节点健康检查循环失败: {str(e)}")
     
     def check_node_health(self, node):
         """检查单个节点的健康状态"""
@@ -150,26 +160,11 @@ class AutoHealthMonitor:
         return health_result
     
     def get_system_resources(self, ssh):
-        """获取系统资源信息"""
+        """获取系统资源信息（一次远程执行完成 /proc 差值采样）"""
         try:
-            # CPU使用率
-            stdin, stdout, stderr = ssh.exec_command("top -bn1 | grep 'Cpu(s)' | awk '{print $2}' | cut -d'%' -f1", timeout=10)
-            cpu_usage = stdout.read().decode().strip()
-            
-            # 内存使用率  
-            stdin, stdout, stderr = ssh.exec_command("free | grep Mem | awk '{printf \"%.1f\", $3/$2 * 100.0}'", timeout=10)
-            memory_usage = stdout.read().decode().strip()
-            
-            # 磁盘使用率
-            stdin, stdout, stderr = ssh.exec_command("df -h / | tail -1 | awk '{print $5}' | cut -d'%' -f1", timeout=10)
-            disk_usage = stdout.read().decode().strip()
-            
-            return {
-                'cpu_usage': float(cpu_usage) if cpu_usage.replace('.', '').isdigit() else 0,
-                'memory_usage': float(memory_usage) if memory_usage.replace('.', '').isdigit() else 0,
-                'disk_usage': float(disk_usage) if disk_usage.isdigit() else 0,
-                'resource_check_time': datetime.now().isoformat()
-            }
+            resources = proc_sampler.to_resource_fields(proc_sampler.sample_via_ssh(ssh, timeout=10))
+            resources['resource_check_time'] = datetime.now().isoformat()
+            return resources
             
         except Exception as e:
             logger.debug(f"资源信息获取失败: {str(e)}")
@@ -232,56 +227,12 @@ class AutoHealthMonitor:
             return []
     
     def update_node_health_status(self, node_id, health_result):
-        """更新节点的健康状态到数据库"""
+        """更新单个节点的健康状态到数据库（经由写线程）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # 获取当前状态以检查变化
-            cursor.execute("SELECT status, openclaw_version FROM nodes WHERE id = ?", (node_id,))
-            current = cursor.fetchone()
-            old_status = current[0] if current else None
-            old_version = current[1] if current else None
-            
-            # 检查状态是否变化
-            status_changed = old_status != health_result['status']
-            version_changed = old_version != health_result['details'].get('openclaw_version')
-            
-            # 更新节点状态
-            update_sql = """
-                UPDATE nodes SET 
-                    status = ?,
-                    openclaw_version = ?,
-                    cpu_usage = ?,
-                    ram_usage = ?,
-                    disk_usage = ?,
-                    last_seen_at = ?,
-                    last_score = ?,
-                    last_score_at = ?,
-                    updated_at = ?
-                WHERE id = ?
-            """
-            
-            cursor.execute(update_sql, (
-                health_result['status'],
-                health_result['details'].get('openclaw_version'),
-                health_result['details'].get('cpu_usage', 0),
-                health_result['details'].get('memory_usage', 0),
-                health_result['details'].get('disk_usage', 0),
-                int(time.time() * 1000),  # 时间戳（毫秒）
-                health_result['health_score'],
-                int(time.time() * 1000),
-                int(time.time() * 1000)
-            ), (node_id,))
-            
-            conn.commit()
-            conn.close()
-            
-            # 记录重要变化
-            if status_changed:
+            for change in self.writer.write_cycle({node_id: health_result}).result():
                 health_result['status_changed'] = True
-                health_result['old_status'] = old_status
-                health_result['new_status'] = health_result['status']
+                health_result['old_status'] = change['old_status']
+                health_result['new_status'] = change['new_status']
                 logger.info(f"📊 节点 {node_id} 健康状态更新: {health_result['status']} (分数: {health_result['health_score']})")
             
         except Exception as e:
@@ -306,6 +257,7 @@ if __name__ == "__main__":
             # 单次检查模式
             monitor = AutoHealthMonitor()
             monitor.check_all_nodes()
+            monitor.writer.stop()
             print("✅ 单次健康检查完成")
     else:
         print("用法:")
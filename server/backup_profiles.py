@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+备份方案 (backup profiles) - 按 include/exclude 规则和路径容量上限挑选要打包的文件
+
+内置方案:
+  config  仅配置 (openclaw.json、agent配置、凭据、定时任务)，每小时备份也只有几KB
+  bots    配置 + agents + workspace，不含会话记录
+  full    整个 ocPath，跳过 node_modules/.git/缓存/日志等可再生数据
+
+注册表可以在顶层 backupProfiles 中覆盖或新增方案，节点的 backupProfile 字段指定默认方案:
+  "backupProfiles": {
+    "bots": {"exclude": ["agents/*/sessions/**"], "caps": {"workspace-*/memory/**": "20M"}},
+    "lite": {"include": ["openclaw.json", "workspace-*/*.md"]}
+  }
+
+路径规则相对 ocPath: `*` 不跨目录，`**` 跨任意层目录；匹配目录的规则对其下所有文件生效。
+caps 为该规则匹配到的文件总大小上限，超出时优先保留最新修改的文件。
+"""
+
+import re
+import shlex
+
+DEFAULT_PROFILE = 'full'
+
+REGENERABLE = ['**/node_modules', '**/.git', '**/.cache', '**/__pycache__', '**/*.log', 'logs', '**/*.tmp']
+
+DEFAULT_PROFILES = {
+    'config': {
+        'description': '仅配置文件',
+        'include': ['*.json', 'agents/*/agent/*.json', 'credentials', 'cron', 'identity', 'devices'],
+        'exclude': ['**/*.log'],
+    },
+    'bots': {
+        'description': '配置 + agents + workspace (不含会话记录)',
+        'include': ['*.json', 'agents', 'workspace*', 'credentials', 'cron', 'identity', 'devices'],
+        'exclude': ['agents/*/sessions'] + REGENERABLE,
+    },
+    'full': {
+        'description': '整个 ocPath (跳过可再生数据)',
+        'include': ['**'],
+        'exclude': REGENERABLE,
+    },
+}
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_size(value):
+    """'20M' / '512K' / 1048576 -> 字节数"""
+    if isinstance(value, int):
+        return value
+    m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*', str(value), re.IGNORECASE)
+    if not m:
+        raise ValueError(f"无法解析大小: {value}")
+    return int(float(m.group(1)) * _UNITS[m.group(2).upper()])
+
+
+def format_size(size):
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.1f}G"
+    if size >= 1024 ** 2:
+        return f"{size / 1024 ** 2:.1f}M"
+    if size >= 1024:
+        return f"{size / 1024:.0f}K"
+    return f"{size}B"
+
+
+def compile_glob(pattern):
+    """路径 glob -> 正则；规则同时匹配该路径下的所有文件"""
+    pattern = pattern.strip('/')
+    out, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+            continue
+        out.append('[^/]*' if c == '*' else '[^/]' if c == '?' else re.escape(c))
+        i += 1
+    return re.compile(''.join(out) + '(?:/.*)?$')
+
+
+def load_profiles(registry=None):
+    """内置方案 + 注册表 backupProfiles（同名字段覆盖）"""
+    profiles = {name: dict(p) for name, p in DEFAULT_PROFILES.items()}
+    for name, custom in ((registry or {}).get('backupProfiles') or {}).items():
+        profiles[name] = {**profiles.get(name, {'include': ['**']}), **custom}
+    return profiles
+
+
+def resolve_profile(name, registry=None, node=None):
+    """按名称取方案；未指定时用节点的 backupProfile，再退回 full"""
+    profiles = load_profiles(registry)
+    name = name or (node or {}).get('backupProfile') or DEFAULT_PROFILE
+    if name not in profiles:
+        raise ValueError(f"未知备份方案: {name} (可用: {', '.join(profiles)})")
+    return name, profiles[name]
+
+
+def list_command(root):
+    """远程列出 root 下的文件: <大小> <mtime> <相对路径>\\0"""
+    return (f"cd {shlex.quote(root)} && find . -mindepth 1 \\( -type f -o -type l \\) "
+            f"-printf '%s %T@ %P\\0'")
+
+
+def parse_listing(output):
+    entries = []
+    for record in output.split('\0'):
+        if not record.strip():
+            continue
+        size, mtime, path = record.split(' ', 2)
+        entries.append((path, int(size), float(mtime)))
+    return entries
+
+
+def select_files(entries, profile):
+    """按方案筛选文件，返回 (选中的相对路径列表, 统计)
+
+    统计: files/bytes (选中)、excluded_files/excluded_bytes (规则排除)、
+    capped_files/capped_bytes (超出容量上限)、by_dir (选中文件按顶层目录的字节数)
+    """
+    include = [compile_glob(p) for p in profile.get('include', ['**'])]
+    exclude = [compile_glob(p) for p in profile.get('exclude', [])]
+    caps = [(compile_glob(p), parse_size(limit)) for p, limit in (profile.get('caps') or {}).items()]
+
+    stats = {'files': 0, 'bytes': 0, 'excluded_files': 0, 'excluded_bytes': 0,
+             'capped_files': 0, 'capped_bytes': 0, 'by_dir': {}}
+    used = [0] * len(caps)
+    selected = []
+    # 最新的文件优先占用容量
+    for path, size, _ in sorted(entries, key=lambda e: -e[2]):
+        if not any(r.match(path) for r in include) or any(r.match(path) for r in exclude):
+            stats['excluded_files'] += 1
+            stats['excluded_bytes'] += size
+            continue
+        hits = [i for i, (r, _) in enumerate(caps) if r.match(path)]
+        if any(used[i] + size > caps[i][1] for i in hits):
+            stats['capped_files'] += 1
+            stats['capped_bytes'] += size
+            continue
+        for i in hits:
+            used[i] += size
+        selected.append(path)
+        stats['files'] += 1
+        stats['bytes'] += size
+        top = path.split('/', 1)[0] if '/' in path else '.'
+        stats['by_dir'][top] = stats['by_dir'].get(top, 0) + size
+    selected.sort()
+    return selected, stats
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Bot 清单缓存 - 控制端缓存各节点 openclaw.json 及每个 agent 配置的解析结果
+
+刷新时只做一次远程 stat 批量查询 (大小 + inode + 纳秒 mtime)，与缓存不一致的文件再用一次远程调用批量读取，
+内容 sha256 未变（只是 touch）时沿用已解析的结果；什么都没变时不读取任何配置文件。
+刷新结果同步到 OCM 数据库 bots 表，Web UI 直接读表即可，不必访问节点。
+
+FleetIndex 在全舰队 Bot 列表上建立 id/name/model/channel/account 倒排索引，
+find-bot 直接查索引，不访问任何节点。
+
+缓存文件: OCM_INVENTORY_CACHE (默认 ~/.ocm/bot-inventory.json)，
+旁边的 <名称>-fleet.json 只含各节点 Bot 列表，供 FleetIndex 加载
+"""
+
+import base64
+import fnmatch
+import hashlib
+import json
+import os
+import shlex
+import sqlite3
+import sys
+import threading
+import time
+
+CACHE_PATH = os.environ.get('OCM_INVENTORY_CACHE', os.path.expanduser('~/.ocm/bot-inventory.json'))
+INDEX_FIELDS = ('id', 'name', 'model', 'channel', 'account')
+MARK = '==OCM-FILE=='
+
+
+def index_path(cache_path=CACHE_PATH):
+    root, _ = os.path.splitext(cache_path)
+    return f"{root}-fleet.json"
+
+
+def stat_command(oc_path):
+    """列出 openclaw.json 和所有 agent 配置的 <大小> <inode> <纳秒 mtime> <相对路径>
+
+    只用大小 + 整秒 mtime 时，同一秒内等长的修改会被漏掉；remote_file 以 rename 写入，inode 必变
+    """
+    return (f"cd {shlex.quote(oc_path)} 2>/dev/null && stat -c '%s %i %.9Y %n' openclaw.json "
+            f"agents/*/agent/openclaw.json 2>/dev/null; true")
+
+
+def read_command(oc_path, paths):
+    """一次读取多个文件 (base64，每个文件前一行标记)"""
+    files = ' '.join(shlex.quote(p) for p in paths)
+    return (f"cd {shlex.quote(oc_path)} && for f in {files}; do echo \"{MARK} $f\"; "
+            f"base64 -w0 \"$f\" 2>/dev/null; echo; done")
+
+
+def parse_stat(output):
+    files = {}
+    for line in output.splitlines():
+        parts = line.split(' ', 3)
+        if len(parts) == 4 and parts[0].isdigit() and parts[1].isdigit():
+            files[parts[3]] = {'size': int(parts[0]), 'inode': int(parts[1]), 'mtime': parts[2]}
+    return files
+
+
+def _changed(cached, st):
+    return not cached or any(cached.get(k) != st[k] for k in ('size', 'inode', 'mtime'))
+
+
+def parse_read(output):
+    contents, current = {}, None
+    for line in output.splitlines():
+        if line.startswith(MARK + ' '):
+            current = line[len(MARK) + 1:]
+            contents[current] = b''
+        elif current is not None and line:
+            contents[current] = base64.b64decode(line)
+    return contents
+
+
+def build_bots(config, agent_configs):
+    """由 openclaw.json 和各 agent 配置生成 Bot 列表 (与 bot-list/status 的展示字段一致)"""
+    channel_map, account_map = {}, {}
+    for binding in config.get('bindings', []):
+        agent_id = binding.get('agentId', '')
+        channel = binding.get('match', {}).get('channel', '')
+        if agent_id and channel:
+            channel_map[agent_id] = channel
+        if agent_id and binding.get('match', {}).get('accountId'):
+            account_map[agent_id] = binding['match']['accountId']
+    default_model = config.get('agents', {}).get('defaults', {}).get('model', {}).get('primary', '')
+
+    bots = []
+    for agent in config.get('agents', {}).get('list', []):
+        aid = agent.get('id', '?')
+        name, model, channel = aid, agent.get('model') or default_model or '?', channel_map.get(aid, '?')
+        acfg = agent_configs.get(aid)
+        if isinstance(acfg, dict):
+            name = acfg.get('name', aid)
+            model = acfg.get('llm', {}).get('model') or model
+            channels = acfg.get('channels', [])
+            if channels:
+                channel = channels[0].get('type', channel)
+        bots.append({'id': aid, 'name': name, 'model': model, 'channel': channel,
+                     'account': account_map.get(aid, ''), 'workspace': agent.get('workspace', '')})
+    return bots
+
+
+class BotInventory:
+    """run(node, command) -> (ok, stdout, stderr)，即 ocm-nodes.py 的 ssh_cmd"""
+
+    def __init__(self, run, cache_path=CACHE_PATH, db_path=None):
+        self.run = run
+        self.cache_path = cache_path
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._cache = None
+
+    # --- 缓存文件 ---
+    @property
+    def cache(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_path) as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.cache, f, ensure_ascii=False)
+        os.replace(tmp, self.cache_path)
+        # 只含 Bot 列表的精简文件，供 FleetIndex 快速加载
+        fleet = {node_id: entry['bots'] for node_id, entry in self.cache.items()}
+        with open(tmp, 'w') as f:
+            json.dump(fleet, f, ensure_ascii=False)
+        os.replace(tmp, index_path(self.cache_path))
+
+    def cached(self, node_id):
+        """不访问节点，直接返回缓存的 Bot 列表 (没有缓存时为 None)"""
+        entry = self.cache.get(node_id)
+        return entry['bots'] if entry else None
+
+    # --- 增量刷新 ---
+    def refresh(self, node):
+        """stat 比对后只重新读取变化的文件，返回 (bots, 统计) ；节点不可达时抛出 IOError"""
+        bots, stats = self._refresh(node)
+        with self._lock:
+            self._save()
+        return bots, stats
+
+    def refresh_many(self, nodes, workers=16):
+        """并行刷新多个节点，最后只写一次缓存。返回 {node_id: 统计或错误字符串}"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        def one(node):
+            try:
+                return self._refresh(node)[1]
+            except IOError as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(len(nodes), workers))) as pool:
+            results = dict(zip([n['id'] for n in nodes], pool.map(one, nodes)))
+        with self._lock:
+            self._save()
+        return results
+
+    def _refresh(self, node):
+        # 远程调用不持锁，多个节点可以并行刷新
+        with self._lock:
+            files = dict((self.cache.get(node['id']) or {}).get('files', {}))
+        ok, out, err = self.run(node, stat_command(node['ocPath']))
+        if not ok:
+            raise IOError(err or '无法获取文件状态')
+        current = parse_stat(out)
+        if 'openclaw.json' not in current:
+            raise IOError('无法读取 openclaw.json')
+        changed = [p for p, st in current.items() if _changed(files.get(p), st)]
+        removed = [p for p in files if p not in current]
+        stats = {'checked': len(current), 'read': len(changed), 'reparsed': 0, 'removed': len(removed)}
+
+        if changed:
+            ok, out, err = self.run(node, read_command(node['ocPath'], changed))
+            if not ok:
+                raise IOError(err or '读取配置失败')
+            for path, data in parse_read(out).items():
+                digest = hashlib.sha256(data).hexdigest()
+                previous = files.get(path)
+                if previous and previous.get('sha256') == digest:
+                    files[path] = {**previous, **current[path]}  # 只是 touch，沿用解析结果
+                    continue
+                try:
+                    parsed = json.loads(data)
+                except ValueError:
+                    parsed = None
+                files[path] = {**current[path], 'sha256': digest, 'data': parsed}
+                stats['reparsed'] += 1
+        for path in removed:
+            del files[path]
+        if (files.get('openclaw.json') or {}).get('data') is None:
+            # 解析失败 (如写到一半、手改多了逗号) 不能当成没有 agent: 保留上次的结果，不同步数据库
+            raise IOError('openclaw.json 解析失败')
+
+        with self._lock:
+            entry = self.cache.setdefault(node['id'], {'files': {}, 'bots': []})
+            rebuild = changed or removed or 'refreshed_at' not in entry
+            entry['files'] = files
+            if rebuild:
+                config = (files.get('openclaw.json') or {}).get('data') or {}
+                agent_configs = {p.split('/')[1]: f.get('data') for p, f in files.items() if p.startswith('agents/')}
+                entry['bots'] = build_bots(config, agent_configs)
+            entry['refreshed_at'] = int(time.time())
+            bots = entry['bots']
+        if rebuild:
+            self._sync_db(node['id'], bots)
+        return bots, stats
+
+    def invalidate(self, node_id):
+        """配置被本工具改写后调用，下一次刷新重新读取"""
+        with self._lock:
+            if self.cache.pop(node_id, None) is not None:
+                self._save()
+
+    # --- 数据库同步 ---
+    def _sync_db(self, node_id, bots):
+        """按 (node_id, agent_id) 更新 bots 表：新增、修改、删除已不存在的 agent"""
+        if not self.db_path or not os.path.isfile(self.db_path):
+            return
+        db = sqlite3.connect(self.db_path, timeout=10)
+        try:
+            columns = {row[1] for row in db.execute("PRAGMA table_info(bots)")}
+            if not columns:
+                return
+            if 'agent_id' not in columns:
+                # schema.sql 之前建的旧库没有该列时补上
+                db.execute("ALTER TABLE bots ADD COLUMN agent_id TEXT")
+                columns.add('agent_id')
+            # 不同版本的 bots 表列名不同 (schema.sql / sync-agents.js)，只写存在的列
+            field_map = {'bot_name': 'name', 'name': 'name', 'platform': 'channel', 'model': 'model',
+                         'workspace_path': 'workspace', 'workspace': 'workspace'}
+            fields = [c for c in field_map if c in columns]
+            now = int(time.time() * 1000)
+            existing = {row[0]: row[1] for row in
+                        db.execute("SELECT agent_id, rowid FROM bots WHERE node_id = ? AND agent_id IS NOT NULL", (node_id,))}
+            self._adopt_rows(db, node_id, bots, columns, existing)
+            for bot in bots:
+                values = [bot[field_map[c]] for c in fields]
+                if bot['id'] in existing:
+                    sets = [f"{c} = ?" for c in fields] + (['updated_at = ?'] if 'updated_at' in columns else [])
+                    db.execute(f"UPDATE bots SET {', '.join(sets)} WHERE rowid = ?",
+                               values + ([now] if 'updated_at' in columns else []) + [existing[bot['id']]])
+                else:
+                    extra = {'node_id': node_id, 'agent_id': bot['id'], 'status': 'running',
+                             'created_at': now, 'updated_at': now}
+                    extra = {c: v for c, v in extra.items() if c in columns}
+                    cols = fields + list(extra)
+                    db.execute(f"INSERT INTO bots ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+                               values + list(extra.values()))
+            gone = [aid for aid in existing if aid not in {b['id'] for b in bots}]
+            db.executemany("DELETE FROM bots WHERE node_id = ? AND agent_id = ?", [(node_id, aid) for aid in gone])
+            db.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ bots 表同步失败: {e}", file=sys.stderr)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _adopt_rows(db, node_id, bots, columns, existing):
+        """index.js / enhanced-bot-creation-api 建的行没有 agent_id: 按名称或 workspace 认领并回填，避免重复插入"""
+        name_col = next((c for c in ('bot_name', 'name') if c in columns), None)
+        ws_col = next((c for c in ('workspace_path', 'workspace') if c in columns), None)
+        if not name_col and not ws_col:
+            return
+        select = ', '.join(c or 'NULL' for c in (name_col, ws_col))
+        rows = db.execute(f"SELECT rowid, {select} FROM bots WHERE node_id = ? AND agent_id IS NULL ORDER BY rowid",
+                          (node_id,)).fetchall()
+        for bot in bots:
+            if bot['id'] in existing:
+                continue
+            names = {str(v).lower().lstrip('@') for v in (bot['id'], bot.get('name')) if v}
+            for row in rows:
+                rowid, name, workspace = row
+                if (name and str(name).lower().lstrip('@') in names) or \
+                        (workspace and str(workspace).rstrip('/').endswith(f"/workspace-{bot['id']}")):
+                    db.execute("UPDATE bots SET agent_id = ? WHERE rowid = ?", (bot['id'], rowid))
+                    existing[bot['id']] = rowid
+                    rows.remove(row)
+                    break
+
+
+class FleetIndex:
+    """全舰队 Bot 倒排索引: 字段值 (小写) -> {(node_id, bot_id)}；name 另按词建索引"""
+
+    def __init__(self, fleet):
+        self.bots = {}
+        self.index = {field: {} for field in INDEX_FIELDS}
+        self.words = {}
+        for node_id, bots in fleet.items():
+            for bot in bots:
+                key = (node_id, bot['id'])
+                self.bots[key] = dict(bot, node=node_id)
+                for field in INDEX_FIELDS:
+                    value = str(bot.get(field) or '').lower()
+                    if value:
+                        self.index[field].setdefault(value, set()).add(key)
+                for word in str(bot.get('name') or '').lower().split():
+                    self.words.setdefault(word, set()).add(key)
+
+    @classmethod
+    def load(cls, cache_path=CACHE_PATH):
+        try:
+            with open(index_path(cache_path)) as f:
+                return cls(json.load(f))
+        except (OSError, ValueError):
+            return cls({})
+
+    def _lookup(self, field, pattern):
+        """精确值直接查表；含 * ? [ 时按 glob 匹配索引键 (键数远小于 Bot 数)"""
+        pattern = pattern.lower()
+        table = self.index[field]
+        if not any(c in pattern for c in '*?['):
+            hits = set(table.get(pattern, ()))
+            if field == 'name':
+                hits |= self.words.get(pattern, set())
+            return hits
+        hits = set()
+        for value in fnmatch.filter(table, pattern):
+            hits |= table[value]
+        return hits
+
+    def search(self, node=None, **filters):
+        """各字段过滤条件取交集，node 为节点 id glob；无条件时返回全部"""
+        keys = None
+        for field, pattern in filters.items():
+            if pattern:
+                hits = self._lookup(field, pattern)
+                keys = hits if keys is None else keys & hits
+        if keys is None:
+            keys = set(self.bots)
+        if node:
+            keys = {k for k in keys if fnmatch.fnmatch(k[0], node)}
+        return [self.bots[k] for k in sorted(keys)]
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Bot 批量清单 (bot-apply) - 按节点描述要新增/修改/删除的 Bot，每个节点:
+  - 所有 workspace 模板打进一个 tar 流，一次远程调用解包
+  - 所有配置变更在内存中应用到 openclaw.json，只写一次
+  - Gateway 只加载一次新配置 (优先热重载，见 gateway_reload)
+
+清单格式 (JSON):
+  {
+    "defaults": {"model": "anthropic/claude-opus-4-6", "allowFrom": ["7996447774"]},
+    "nodes": {
+      "pc-a": {
+        "add":    [{"id": "sales", "name": "Sales", "token": "123:abc", "soul": "...", "model": "..."}],
+        "update": [{"id": "ops", "model": "openai/gpt-4o", "soul": "..."}],
+        "delete": ["old-bot"]
+      }
+    }
+  }
+
+add 时已存在的 workspace 文件不会被覆盖 (tar --skip-old-files)；update 指定 soul 时只重写 SOUL.md。
+bot-add / bot-delete 也复用这里的模板和配置变更函数。
+"""
+
+import copy
+import io
+import json
+import shlex
+import tarfile
+import time
+
+DEFAULT_MODEL = 'anthropic/claude-opus-4-6'
+DEFAULT_ALLOW_FROM = ['7996447774']
+ACTIONS = ('add', 'update', 'delete')
+
+
+def templates(name, soul=None):
+    """新 Bot workspace 的模板文件 [(文件名, 内容)]"""
+    soul = soul or f'{name}, an AI assistant'
+    return [
+        ('SOUL.md', f"# {name}\n\n{soul}\n\n## 核心特质\n- 友善、专业、乐于助人\n- 对话自然流畅\n- 精准回答问题\n"),
+        ('AGENTS.md', f"# AGENTS.md - {name} Workspace\n\n## Every Session\n1. Read SOUL.md\n2. Read memory/ for recent context\n"),
+        ('TOOLS.md', f"# TOOLS.md - {name}\n"),
+        ('MEMORY.md', "# Memory\n\nNo memories yet.\n"),
+        ('USER.md', "# User\n\nManaged by Linou via OCM.\n"),
+    ]
+
+
+def template_tar(adds, souls=()):
+    """把多个 Bot 的目录和模板打成一个 tar (路径相对 ocPath)
+
+    adds: 新增的 Bot 列表 (workspace-<id>/ 全套模板 + agents/<id>/agent/)
+    souls: 只重写 SOUL.md 的 Bot 列表 (update 指定了 soul)
+    """
+    buf = io.BytesIO()
+    now = time.time()
+    with tarfile.open(fileobj=buf, mode='w', format=tarfile.GNU_FORMAT) as tar:
+        def add_dir(path):
+            info = tarfile.TarInfo(path)
+            info.type, info.mode, info.mtime = tarfile.DIRTYPE, 0o755, now
+            tar.addfile(info)
+
+        def add_file(path, content):
+            data = content.encode()
+            info = tarfile.TarInfo(path)
+            info.size, info.mode, info.mtime = len(data), 0o644, now
+            tar.addfile(info, io.BytesIO(data))
+
+        for bot in adds:
+            workspace = f"workspace-{bot['id']}"
+            for path in (workspace, f"{workspace}/memory", f"agents/{bot['id']}", f"agents/{bot['id']}/agent"):
+                add_dir(path)
+            for fname, content in templates(bot.get('name') or bot['id'], bot.get('soul')):
+                add_file(f"{workspace}/{fname}", content)
+        for bot in souls:
+            add_file(f"workspace-{bot['id']}/SOUL.md", templates(bot.get('name') or bot['id'], bot['soul'])[0][1])
+    return buf.getvalue()
+
+
+def extract_command(oc_path, souls=()):
+    """在 ocPath 下解包模板 tar；update 的 SOUL.md 先删除再解包，其余已有文件保持不变"""
+    rm = ' '.join(shlex.quote(f"workspace-{bot['id']}/SOUL.md") for bot in souls)
+    return f"cd {shlex.quote(oc_path)} && {f'rm -f {rm} && ' if rm else ''}tar xf - --skip-old-files"
+
+
+def empty_config(node, model=DEFAULT_MODEL):
+    return {
+        'agents': {'list': [], 'defaults': {'model': {'primary': model}}},
+        'channels': {'telegram': {'enabled': True, 'accounts': {}}},
+        'bindings': [],
+        'gateway': {'port': node.get('gatewayPort', 18789), 'mode': 'local', 'bind': 'lan'},
+    }
+
+
+def _set_account(config, bot, allow_from):
+    tg = config.setdefault('channels', {}).setdefault('telegram', {})
+    tg['enabled'] = True
+    tg.setdefault('dmPolicy', 'allowlist')
+    tg.setdefault('groupPolicy', 'allowlist')
+    tg.setdefault('streamMode', 'partial')
+    account = tg.setdefault('accounts', {}).setdefault(bot['id'], {})
+    account.update({'name': bot.get('name') or account.get('name') or bot['id'], 'dmPolicy': 'allowlist',
+                    'botToken': bot['token'], 'allowFrom': bot.get('allowFrom') or allow_from,
+                    'groupPolicy': 'allowlist', 'streamMode': 'partial'})
+    config.setdefault('plugins', {}).setdefault('entries', {})['telegram'] = {'enabled': True}
+    config['bindings'] = [b for b in config.get('bindings', []) if b.get('agentId') != bot['id']]
+    config['bindings'].append({'agentId': bot['id'], 'match': {'channel': 'telegram', 'accountId': bot['id']}})
+
+
+def add_bot(config, oc_path, bot, allow_from=DEFAULT_ALLOW_FROM):
+    """agents.list 条目 (已有则替换) + Telegram account + binding"""
+    config.pop('version', None)
+    entry = {'id': bot['id'], 'workspace': f"{oc_path}/workspace-{bot['id']}", 'agentDir': f"agents/{bot['id']}/agent"}
+    if bot.get('model'):
+        entry['model'] = bot['model']
+    agents = config.setdefault('agents', {})
+    agents['list'] = [a for a in agents.get('list', []) if a.get('id') != bot['id']] + [entry]
+    config['bindings'] = [b for b in config.get('bindings', []) if b.get('agentId') != bot['id']]
+    if bot.get('token'):
+        _set_account(config, bot, allow_from)
+
+
+def update_bot(config, bot, allow_from=DEFAULT_ALLOW_FROM):
+    """修改已有 Bot 的 model / name / token，未给出的字段保持不变"""
+    entry = next((a for a in config.get('agents', {}).get('list', []) if a.get('id') == bot['id']), None)
+    if entry is None:
+        raise KeyError(bot['id'])
+    if bot.get('model'):
+        entry['model'] = bot['model']
+    account = config.get('channels', {}).get('telegram', {}).get('accounts', {}).get(bot['id'])
+    if bot.get('token'):
+        _set_account(config, bot, allow_from)
+    elif account is not None and bot.get('name'):
+        account['name'] = bot['name']
+
+
+def remove_bot(config, bot_id):
+    """移除 agents.list 条目、Telegram account 和 binding"""
+    agents = config.setdefault('agents', {})
+    agents['list'] = [a for a in agents.get('list', []) if a.get('id') != bot_id]
+    config.get('channels', {}).get('telegram', {}).get('accounts', {}).pop(bot_id, None)
+    config['bindings'] = [b for b in config.get('bindings', []) if b.get('agentId') != bot_id]
+
+
+def load_manifest(path):
+    """读取并校验清单，返回 {'defaults': {...}, 'nodes': {node_id: {'add': [], 'update': [], 'delete': []}}}"""
+    with open(path) as f:
+        manifest = json.load(f)
+    nodes = manifest.get('nodes')
+    if not isinstance(nodes, dict) or not nodes:
+        raise ValueError("清单缺少 nodes")
+    result = {}
+    for node_id, ops in nodes.items():
+        unknown = set(ops) - set(ACTIONS)
+        if unknown:
+            raise ValueError(f"{node_id}: 未知操作 {', '.join(sorted(unknown))} (可用: {', '.join(ACTIONS)})")
+        ops = {action: list(ops.get(action) or []) for action in ACTIONS}
+        ops['delete'] = [b if isinstance(b, str) else b.get('id') for b in ops['delete']]
+        seen = set()
+        for action in ACTIONS:
+            for bot in ops[action]:
+                bot_id = bot if action == 'delete' else bot.get('id') if isinstance(bot, dict) else None
+                if not bot_id:
+                    raise ValueError(f"{node_id}: {action} 条目缺少 id")
+                if bot_id in seen:
+                    raise ValueError(f"{node_id}: {bot_id} 出现在多个操作中")
+                seen.add(bot_id)
+        result[node_id] = ops
+    return {'defaults': manifest.get('defaults') or {}, 'nodes': result}
+
+
+def plan(config, ops):
+    """对照节点当前配置检查清单，返回问题列表 (空表示可以执行)"""
+    existing = {a.get('id') for a in config.get('agents', {}).get('list', [])}
+    problems = []
+    for bot in ops['update']:
+        if bot['id'] not in existing:
+            problems.append(f"update {bot['id']}: 节点上不存在")
+    for bot_id in ops['delete']:
+        if bot_id not in existing:
+            problems.append(f"delete {bot_id}: 节点上不存在")
+    return problems
+
+
+def apply(config, oc_path, ops, defaults=None, stage=None):
+    """在内存中对 config 应用一个节点的全部变更，返回变更摘要
+
+    stage(before, after, label): 每个 Bot 的变更应用后回调 (如 ConfigEditor.edit 暂存为单独的补丁)
+    """
+    defaults = defaults or {}
+    allow_from = defaults.get('allowFrom') or DEFAULT_ALLOW_FROM
+    existing = {a.get('id') for a in config.get('agents', {}).get('list', [])}
+    summary = {'added': [], 'replaced': [], 'updated': [], 'deleted': []}
+    changes = [('add', bot) for bot in ops['add']] + [('update', bot) for bot in ops['update']] + \
+              [('delete', {'id': bot_id}) for bot_id in ops['delete']]
+    for action, bot in changes:
+        before = copy.deepcopy(config) if stage else None
+        if action == 'add':
+            bot = {'model': defaults.get('model'), **bot}
+            add_bot(config, oc_path, bot, allow_from)
+            summary['replaced' if bot['id'] in existing else 'added'].append(bot['id'])
+        elif action == 'update':
+            update_bot(config, bot, allow_from)
+            summary['updated'].append(bot['id'])
+        else:
+            remove_bot(config, bot['id'])
+            summary['deleted'].append(bot['id'])
+        if stage:
+            stage(before, config, f"bot-apply {action} {bot['id']}")
+    return summary
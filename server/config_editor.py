@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+节点配置编辑层 - 以 JSON-patch 表达 openclaw.json / auth-profiles.json 的修改
+
+  editor = ConfigEditor(node, transport)
+  editor.edit(before, after, '添加 bot xxx')   # 对比生成补丁，暂存
+  editor.stage(ops, '...')                     # 或直接暂存补丁
+  editor.commit()                              # 同一文件的所有暂存补丁合并为一次写入
+
+提交时整个补丁经 stdin 发到节点，由 `python3 -` 在节点上加锁、应用、fsync、rename，
+一次远程调用，只传输补丁和反向补丁；节点没有 python3 时退回为
+remote_file 读取 -> 本地应用 -> 原子写回 (带 sha256 并发检查，冲突时重读再应用一次)。
+补丁中的 test 操作保证别处 (Web UI / 其他 CLI) 改过的部分不会被静默覆盖，
+冲突时抛出 PatchConflict。
+
+每次提交记录在 OCM_CONFIG_HISTORY (默认 ~/.ocm/config-history/<节点>.jsonl)，
+含补丁与反向补丁 (其中有明文 token，目录 0700、文件 0600)；undo() 应用最近一次未撤销提交的反向补丁。
+"""
+
+import copy
+import datetime
+import io
+import json
+import os
+import time
+
+import remote_file
+from config_patch import CONFLICT_RC, PatchConflict, apply_patch, make_patch, remote_program
+
+HISTORY_DIR = os.environ.get('OCM_CONFIG_HISTORY', os.path.expanduser('~/.ocm/config-history'))
+NO_PYTHON_RC = 127
+
+
+class ConfigEditor:
+    """一个节点上的配置编辑会话: 按文件暂存补丁，commit() 时每个文件只写一次"""
+
+    def __init__(self, node, transport, path=None):
+        self.node = node
+        self.transport = transport
+        self.path = path or f"{node['ocPath']}/openclaw.json"
+        self.pending = {}   # path -> [(label, ops)]
+
+    def stage(self, ops, label='', path=None):
+        if ops:
+            self.pending.setdefault(path or self.path, []).append((label, ops))
+        return ops
+
+    def edit(self, before, after, label='', path=None):
+        """暂存把 before 改成 after 的补丁，返回补丁 (补丁中的值是副本，之后继续修改 after 不影响)"""
+        return self.stage(copy.deepcopy(make_patch(before, after)), label, path)
+
+    def commit(self):
+        """提交全部暂存补丁，返回 [{'path', 'ops', 'bytes', 'mode', 'after'}]；冲突时抛出 PatchConflict"""
+        results = []
+        for path, entries in list(self.pending.items()):
+            ops = [op for _, patch in entries for op in patch]
+            labels = [label for label, _ in entries if label]
+            start = time.time()
+            result = self.apply(path, ops)
+            result.update({'path': path, 'ops': len(ops), 'seconds': round(time.time() - start, 3)})
+            record(self.node['id'], path, labels, ops, result.pop('inverse'), result)
+            del self.pending[path]
+            results.append(result)
+        return results
+
+    def apply(self, path, ops):
+        """立即应用一个补丁 (不经暂存、不记历史)，返回结果含反向补丁 inverse"""
+        result = self._apply_remote(path, ops)
+        return result if result is not None else self._apply_local(path, ops)
+
+    def _apply_remote(self, path, ops):
+        """节点上应用补丁；节点没有 python3 时返回 None"""
+        program = remote_program(path, ops)
+        sink = io.BytesIO()
+        rc, err = self.transport.exec_stream('python3 -', sink, input=program, timeout=60)
+        if rc == NO_PYTHON_RC:
+            return None
+        if rc == CONFLICT_RC:
+            raise PatchConflict(f"{path}: {(err or '').strip()}")
+        if rc != 0:
+            lines = (err or '').strip().splitlines()
+            raise IOError(lines[-1] if lines else f"补丁应用失败: {path}")
+        out = json.loads(sink.getvalue().decode().strip().splitlines()[-1])
+        return {'mode': 'remote', 'bytes': len(program) + len(sink.getvalue()), 'before': out['before'],
+                'after': out['after'], 'inverse': out['inverse']}
+
+    def _apply_local(self, path, ops):
+        for attempt in range(2):
+            data, version = remote_file.read(self.transport, path)
+            if data is None:
+                raise IOError(f"文件不存在: {path}")
+            before = json.loads(data)
+            after = apply_patch(before, ops)
+            content = json.dumps(after, indent=2, ensure_ascii=False).encode()
+            try:
+                digest = remote_file.write(self.transport, path, content, expect=version)
+            except remote_file.WriteConflict:
+                if attempt:
+                    raise
+                continue  # 读取后被改过: 重读后再应用一次，补丁的 test 决定是否冲突
+            return {'mode': 'local', 'bytes': len(data) + len(content), 'before': version, 'after': digest,
+                    'inverse': make_patch(after, before)}
+
+
+# --- 历史与撤销 ---
+def _history_path(node_id):
+    return os.path.join(HISTORY_DIR, f"{node_id}.jsonl")
+
+
+def record(node_id, path, labels, ops, inverse, result, undo_of=None):
+    """追加一条历史；补丁里有 botToken / 认证 token 等明文，目录 0700、文件 0600"""
+    os.makedirs(HISTORY_DIR, mode=0o700, exist_ok=True)
+    os.chmod(HISTORY_DIR, 0o700)
+    entry = {
+        'id': datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f'),
+        'path': path,
+        'labels': labels,
+        'patch': ops,
+        'inverse': inverse,
+        'before': result.get('before'),
+        'after': result.get('after'),
+        'mode': result.get('mode'),
+        'bytes': result.get('bytes'),
+    }
+    if undo_of:
+        entry['undo_of'] = undo_of
+    fd = os.open(_history_path(node_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    os.fchmod(fd, 0o600)  # 之前版本建的文件和目录是 0644 / 0755
+    with os.fdopen(fd, 'a') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+    return entry
+
+
+def history(node_id):
+    try:
+        with open(_history_path(node_id)) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except OSError:
+        return []
+
+
+def undoable(node_id):
+    """按时间倒序返回尚未撤销的提交 (撤销本身不计入)"""
+    entries = history(node_id)
+    undone = {e['undo_of'] for e in entries if e.get('undo_of')}
+    return [e for e in reversed(entries) if not e.get('undo_of') and e['id'] not in undone]
+
+
+def undo(node, transport, entry):
+    """应用一次提交的反向补丁；之后该处又被修改过则抛出 PatchConflict"""
+    result = ConfigEditor(node, transport, entry['path']).apply(entry['path'], entry['inverse'])
+    record(node['id'], entry['path'], [f"撤销 {entry['id']}"], entry['inverse'], result.pop('inverse'), result,
+           undo_of=entry['id'])
+    return result
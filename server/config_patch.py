@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+openclaw.json 的 JSON-patch (RFC 6902) 引擎
+
+  make_patch(old, new)   对比两个配置，生成 add/remove/replace 操作；
+                         每个 remove/replace 以及对数组元素的修改前都带一个 test，
+                         记录修改前的值，用于在别处已改动的配置上检测冲突
+  apply_patch(doc, ops)  应用补丁，返回新文档 (不修改输入)；test 失败抛出 PatchConflict。
+                         数组元素的 test 失败时 (如别处在前面插入/删除了 agent 导致下标变化)
+                         先在数组中按值查找该元素，找到则把随后的操作改到新下标继续
+
+本模块只依赖标准库，可以整个作为脚本经 stdin 发送到节点 (`python3 -`) 在节点上应用补丁，
+只传输补丁本身而不必下载、上传整个配置，见 remote_program() / config_editor。
+"""
+
+import copy
+import difflib
+import json
+
+CONFLICT_RC = 45
+
+
+class PatchConflict(ValueError):
+    """补丁与当前配置冲突 (test 不通过或路径不存在)"""
+
+
+def escape(token):
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def parse_pointer(path):
+    if path == '':
+        return []
+    if not path.startswith('/'):
+        raise PatchConflict(f"无效路径: {path}")
+    return [t.replace('~1', '/').replace('~0', '~') for t in path[1:].split('/')]
+
+
+def _index(container, token, path, allow_end=False):
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit():
+        raise PatchConflict(f"数组下标无效: {path}")
+    i = int(token)
+    if i > len(container) or (i == len(container) and not allow_end):
+        raise PatchConflict(f"数组下标越界: {path}")
+    return i
+
+
+def _resolve(doc, tokens, path):
+    node = doc
+    for token in tokens:
+        if isinstance(node, list):
+            node = node[_index(node, token, path)]
+        elif isinstance(node, dict) and token in node:
+            node = node[token]
+        else:
+            raise PatchConflict(f"路径不存在: {path}")
+    return node
+
+
+def _get(doc, path):
+    return _resolve(doc, parse_pointer(path), path)
+
+
+def _add(doc, path, value):
+    tokens = parse_pointer(path)
+    if not tokens:
+        return value
+    parent = _resolve(doc, tokens[:-1], path)
+    if isinstance(parent, list):
+        # 追加位置越界时退化为追加到末尾 (并发修改后数组变短)
+        token = tokens[-1]
+        i = len(parent) if token == '-' or (token.isdigit() and int(token) > len(parent)) else \
+            _index(parent, token, path, allow_end=True)
+        parent.insert(i, value)
+    elif isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    else:
+        raise PatchConflict(f"父节点不是对象或数组: {path}")
+    return doc
+
+
+def _remove(doc, path):
+    tokens = parse_pointer(path)
+    parent = _resolve(doc, tokens[:-1], path)
+    if isinstance(parent, list):
+        return parent.pop(_index(parent, tokens[-1], path))
+    if isinstance(parent, dict) and tokens[-1] in parent:
+        return parent.pop(tokens[-1])
+    raise PatchConflict(f"路径不存在: {path}")
+
+
+def _relocate(doc, path, value):
+    """数组元素 test 失败时按值查找该元素，返回新路径；找不到或不唯一返回 None"""
+    tokens = parse_pointer(path)
+    if not tokens or not tokens[-1].isdigit():
+        return None
+    try:
+        parent = _resolve(doc, tokens[:-1], path)
+    except PatchConflict:
+        return None
+    if not isinstance(parent, list):
+        return None
+    hits = [i for i, item in enumerate(parent) if item == value]
+    if len(hits) != 1:
+        return None
+    return '/'.join(path.split('/')[:-1] + [str(hits[0])])
+
+
+def apply_patch(doc, ops):
+    """按顺序应用补丁操作，返回新文档；任何一步失败整体放弃 (输入不变)"""
+    doc = copy.deepcopy(doc)
+    remap = None  # (旧前缀, 新前缀): 上一个 test 被重新定位后，随后的操作跟着改路径
+    for op in ops:
+        kind, path = op['op'], op['path']
+        if remap and kind != 'test' and (path == remap[0] or path.startswith(remap[0] + '/')):
+            path = remap[1] + path[len(remap[0]):]
+        if kind == 'test':
+            remap = None
+            try:
+                ok = _get(doc, path) == op['value']
+            except PatchConflict:
+                ok = False
+            if not ok:
+                moved = _relocate(doc, path, op['value'])
+                if moved is None:
+                    raise PatchConflict(f"{path} 已被修改")
+                remap = (path, moved)
+        elif kind == 'add':
+            doc = _add(doc, path, copy.deepcopy(op['value']))
+        elif kind == 'remove':
+            _remove(doc, path)
+        elif kind == 'replace':
+            if parse_pointer(path):
+                _remove(doc, path)
+            doc = _add(doc, path, copy.deepcopy(op['value']))
+        elif kind in ('move', 'copy'):
+            value = _remove(doc, op['from']) if kind == 'move' else copy.deepcopy(_get(doc, op['from']))
+            doc = _add(doc, path, value)
+        else:
+            raise PatchConflict(f"不支持的操作: {kind}")
+    return doc
+
+
+def _key(item):
+    return json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+def make_patch(old, new, path=''):
+    """生成把 old 变成 new 的补丁 (带 test 保护)"""
+    if old == new:
+        return []
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            sub = f"{path}/{escape(key)}"
+            if key not in new:
+                ops += [{'op': 'test', 'path': sub, 'value': old[key]}, {'op': 'remove', 'path': sub}]
+            else:
+                ops += make_patch(old[key], new[key], sub)
+        for key in new:
+            if key not in old:
+                ops.append({'op': 'add', 'path': f"{path}/{escape(key)}", 'value': new[key]})
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        return _list_patch(old, new, path)
+    return [{'op': 'test', 'path': path, 'value': old}, {'op': 'replace', 'path': path, 'value': new}]
+
+
+def _list_patch(old, new, path):
+    """数组按元素内容对齐 (difflib)，插入/删除不影响未改动的元素；下标按已生成的操作累计偏移"""
+    ops, shift = [], 0
+    matcher = difflib.SequenceMatcher(None, [_key(x) for x in old], [_key(x) for x in new], autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        common = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+        # 同一位置新旧元素一一对应时在元素内部细化 (如只改了某个 agent 的 model)
+        for k in range(common):
+            sub = f"{path}/{i1 + k + shift}"
+            inner = make_patch(old[i1 + k], new[j1 + k], sub)
+            if inner and inner[0]['path'] != sub:
+                inner.insert(0, {'op': 'test', 'path': sub, 'value': old[i1 + k]})
+            ops += inner
+        for k in range(i1 + common, i2):
+            sub = f"{path}/{i1 + common + shift}"
+            ops += [{'op': 'test', 'path': sub, 'value': old[k]}, {'op': 'remove', 'path': sub}]
+        shift -= (i2 - i1 - common)
+        for k in range(j1 + common, j2):
+            index = i2 + shift if i2 < len(old) else '-'
+            ops.append({'op': 'add', 'path': f"{path}/{index}", 'value': new[k]})
+            shift += 1
+    return ops
+
+
+# --- 节点端执行 ---
+def remote_program(path, ops):
+    """发送给节点 `python3 -` 的程序: 本模块源码 + 对 path 应用 ops"""
+    with open(__file__) as f:
+        source = f.read()
+    return (f"{source}\n\n_remote_main({json.dumps(path)}, json.loads({json.dumps(json.dumps(ops))}))\n").encode()
+
+
+def _remote_main(path, ops):
+    """在节点上: 加锁 -> 读取 -> 应用补丁 -> 临时文件 fsync -> rename，输出前后 sha256 和反向补丁"""
+    import fcntl
+    import hashlib
+    import os
+    import sys
+    path = os.path.expanduser(path)
+    lock = os.path.join(os.environ.get('TMPDIR', '/tmp'),
+                        f"ocm-{os.getuid()}-{hashlib.sha256(path.encode()).hexdigest()[:16]}.lock")
+    with open(lock, 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        with open(path, 'rb') as f:
+            raw = f.read()
+        before = json.loads(raw)
+        try:
+            after = apply_patch(before, ops)
+        except PatchConflict as e:
+            print(e, file=sys.stderr)
+            sys.exit(CONFLICT_RC)
+        data = json.dumps(after, indent=2, ensure_ascii=False).encode()
+        directory = os.path.dirname(path)
+        tmp = os.path.join(directory, f".{os.path.basename(path)}.ocm-tmp.{os.getpid()}")
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp, path)
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    print(json.dumps({'before': hashlib.sha256(raw).hexdigest(), 'after': hashlib.sha256(data).hexdigest(),
+                      'inverse': make_patch(after, before)}, ensure_ascii=False))
@@ -33,6 +33,7 @@ CREATE TABLE IF NOT EXISTS backups (
   file_count INTEGER,
   total_size INTEGER,           -- bytes
   note TEXT,
+  content_stats TEXT,           -- JSON: 原始字节数、按顶层目录字节数、备份方案
   created_at INTEGER,
   FOREIGN KEY (node_id) REFERENCES nodes(id)
 );
@@ -94,6 +95,7 @@ CREATE TABLE IF NOT EXISTS bots (
   cron_count INTEGER DEFAULT 0,
   model TEXT,                      -- 当前使用的模型
   openclaw_url TEXT,               -- 节点的OpenClaw web界面URL
+  agent_id TEXT,                   -- openclaw.json agents.list[].id (bot_inventory 按此同步)
   created_at INTEGER DEFAULT (strftime('%s','now') * 1000),
   updated_at INTEGER DEFAULT (strftime('%s','now') * 1000),
   FOREIGN KEY (node_id) REFERENCES nodes(id)
@@ -109,6 +111,7 @@ CREATE INDEX IF NOT EXISTS idx_events_created_at ON events(created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_events_severity ON events(severity);
 CREATE INDEX IF NOT EXISTS idx_api_keys_node_id ON api_keys(node_id);
 CREATE INDEX IF NOT EXISTS idx_bots_node_id ON bots(node_id);
+CREATE INDEX IF NOT EXISTS idx_bots_node_agent ON bots(node_id, agent_id);
 
 -- 优化部署流水线
 CREATE TABLE IF NOT EXISTS optimizations (
@@ -12,6 +12,8 @@ import paramiko
 from datetime import datetime
 import requests
 
+import readiness
+
 class EnhancedNodeInstaller:
     def __init__(self):
         self.supported_environments = {
@@ -305,8 +307,12 @@ EOF''',
             stdin, stdout, stderr = ssh.exec_command('systemctl --user start openclaw-gateway')
             exit_status = stdout.channel.recv_exit_status()
             
-            # 等待启动
-            time.sleep(10)
+            # 等待启动：轮询服务状态和Gateway端口，就绪即继续
+            ready, elapsed, probe = readiness.wait_ready(
+                readiness.ssh_runner(ssh), node_info.get('gatewayPort', 18789),
+                timeout=self.verification_timeout, require_http=False
+            )
+            print(f"Gateway就绪: {elapsed:.1f}s" if ready else f"Gateway等待超时: {readiness.describe(probe)}")
             
             # 验证进程
             stdin, stdout, stderr = ssh.exec_command('ps aux | grep openclaw | grep -v grep')
@@ -322,6 +328,7 @@ EOF''',
             
             return {
                 'success': bool(process_info and port_info and 'API_FAILED' not in api_response),
+                'ready_seconds': round(elapsed, 1),
                 'status': {
                     'process_running': bool(process_info),
                     'port_listening': bool(port_info),
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Gateway 配置生效策略 - 优先热重载，不支持时退回重启，并实测每次的服务中断窗口
+
+策略:
+  signal   systemctl --user kill -s SIGUSR1 (Gateway 进程内重新加载配置，进程和其他 Bot 的连接保持)
+  api      POST http://127.0.0.1:<gatewayPort><reloadApi> (节点配置了 reloadApi 路径时才使用)
+  restart  systemctl --user restart (所有 Bot 断开重连)
+
+默认只用 restart。signal / api 只有节点字段 reloadStrategy 明确列出 (如 "signal,restart") 时才尝试:
+PID 不变、端口可用只说明进程还活着，并不能证明 Gateway 重新读取了 openclaw.json
+(Node.js 进程没有 SIGUSR1 处理函数时，该信号只会打开调试器)，
+所以只应在确认过该节点 Gateway 版本支持热重载后再为其开启。restart 总是最后的兜底。
+
+触发和测量在节点上一次远程执行完成: 触发后每 50ms 探测 Gateway 端口，记录端口
+不可用到重新可用的时间，不受 SSH 往返延迟影响。热重载后 MainPID 变了，说明进程
+并不处理该信号 (被终止后由 systemd 拉起)，记为该节点不支持，之后直接跳过。
+
+每个节点 × 策略的次数、失败数、平均/最大中断写入 OCM_RELOAD_STATS (默认 ~/.ocm/reload-stats.json)。
+"""
+
+import json
+import os
+import shlex
+import threading
+import time
+
+SERVICE = 'openclaw-gateway'
+STRATEGIES = ('signal', 'api', 'restart')
+DEFAULT_ORDER = 'restart'
+STATS_PATH = os.environ.get('OCM_RELOAD_STATS', os.path.expanduser('~/.ocm/reload-stats.json'))
+SETTLE_MS = 3000      # 热重载触发后这段时间内端口一直可用，视为无中断
+MARK = 'OCM-RELOAD'
+
+_stats_lock = threading.Lock()
+
+
+def _trigger(strategy, node, service, port):
+    if strategy == 'signal':
+        return f'[ "${{pid0:-0}}" != 0 ] && systemctl --user kill -s SIGUSR1 --kill-who=main {service}'
+    if strategy == 'api':
+        url = shlex.quote(f"http://127.0.0.1:{port}{node['reloadApi']}")
+        return (f"curl -s -o /dev/null -m 5 -X POST -w '%{{http_code}}' {url} | grep -q '^2'")
+    return f"systemctl --user restart {service}"
+
+
+def measure_command(strategy, node, service=SERVICE, port=18789, timeout=60):
+    """触发策略并在节点上测量中断窗口，输出一行: OCM-RELOAD trc= pid0= pid1= state= t0= first= down= back= end="""
+    script = (
+        f"svc={service}; port={port}; "
+        f"now() {{ date +%s%3N; }}; "
+        f"up() {{ (exec 3<>/dev/tcp/127.0.0.1/$port) 2>/dev/null; }}; "
+        f"pid0=$(systemctl --user show -p MainPID --value $svc 2>/dev/null); "
+        f"t0=$(now); "
+        f"( {_trigger(strategy, node, service, port)} ) >/dev/null 2>&1; trc=$?; "
+        f"first=; down=; back=; "
+        f"if [ $trc = 0 ] || [ {strategy} = restart ]; then "
+        f"while :; do t=$(now); "
+        f"if up; then [ -z \"$first\" ] && first=$t; [ -n \"$down\" ] && {{ back=$t; break; }}; "
+        f"[ $((t - t0)) -ge {SETTLE_MS} ] && break; "
+        f"else [ -z \"$down\" ] && down=$t; fi; "
+        f"[ $((t - t0)) -ge {timeout * 1000} ] && break; sleep 0.05; done; fi; "
+        f"pid1=$(systemctl --user show -p MainPID --value $svc 2>/dev/null); "
+        f"state=$(systemctl --user is-active $svc 2>/dev/null); "
+        f"echo \"{MARK} trc=$trc pid0=${{pid0:-0}} pid1=${{pid1:-0}} state=${{state:-unknown}} "
+        f"t0=$t0 first=$first down=$down back=$back end=$(now)\""
+    )
+    return f"bash -c {shlex.quote(script)}"
+
+
+def parse_measure(output):
+    line = next((l for l in reversed(output.splitlines()) if l.startswith(MARK)), '')
+    fields = dict(kv.split('=', 1) for kv in line.split()[1:] if '=' in kv)
+    return {k: (int(v) if v.lstrip('-').isdigit() else v or None) for k, v in fields.items()}
+
+
+def evaluate(strategy, m):
+    """由测量结果判断: outcome (reloaded/restarted/skipped/failed) 与中断毫秒数"""
+    if m and strategy != 'restart' and not m.get('pid0'):
+        return 'skipped', None   # 服务未运行，热重载无从谈起
+    if not m or m.get('state') != 'active' or (m.get('trc') not in (0, None) and strategy != 'restart'):
+        return 'failed', None
+    restarted = strategy == 'restart' or m.get('pid0') != m.get('pid1')
+    if m.get('down') and not m.get('back'):
+        return 'failed', None
+    if restarted:
+        # 重启从触发时刻起就已中断，到端口重新可用为止
+        recovered = m.get('back') or m.get('first')
+        return ('restarted', recovered - m['t0']) if recovered else ('failed', None)
+    return 'reloaded', (m['back'] - m['down']) if m.get('down') else 0
+
+
+# --- 统计 ---
+def load_stats():
+    try:
+        with open(STATS_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _record(node_id, strategy, outcome, interruption_ms):
+    with _stats_lock:
+        stats = load_stats()
+        entry = stats.setdefault(node_id, {}).setdefault(strategy, {
+            'count': 0, 'failures': 0, 'total_ms': 0, 'max_ms': 0, 'last_ms': None, 'unsupported': False})
+        entry['count'] += 1
+        if outcome == 'failed':
+            entry['failures'] += 1
+        else:
+            entry['total_ms'] += interruption_ms
+            entry['max_ms'] = max(entry['max_ms'], interruption_ms)
+            entry['last_ms'] = interruption_ms
+        if strategy != 'restart' and outcome == 'restarted':
+            entry['unsupported'] = True
+        entry['updated_at'] = int(time.time())
+        os.makedirs(os.path.dirname(STATS_PATH), exist_ok=True)
+        tmp = f"{STATS_PATH}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(stats, f, indent=2)
+        os.replace(tmp, STATS_PATH)
+
+
+def plan(node):
+    """节点可用的策略顺序 (reloadStrategy 中去掉未配置 api 的、已判定不支持的)，restart 兜底"""
+    order = node.get('reloadStrategy') or DEFAULT_ORDER
+    order = [s.strip() for s in (order if isinstance(order, list) else order.split(',')) if s.strip() in STRATEGIES]
+    known = load_stats().get(node['id'], {})
+    order = [s for s in order if s == 'restart' or not known.get(s, {}).get('unsupported')]
+    order = [s for s in order if s != 'api' or node.get('reloadApi')]
+    return [s for s in order if s != 'restart'] + ['restart']
+
+
+def apply_config(run, node, timeout=60, strategies=None):
+    """让节点 Gateway 加载新配置: 按策略顺序尝试，成功即停止
+
+    run(command, timeout) -> (ok, stdout, stderr)
+    返回 {'ok', 'strategy', 'outcome', 'interruption_ms', 'attempts': [...]}
+    """
+    service = node.get('serviceName') or node.get('service_name') or SERVICE
+    port = node.get('gatewayPort', 18789)
+    attempts = []
+    for strategy in strategies or plan(node):
+        _, out, err = run(measure_command(strategy, node, service, port, timeout), timeout + 30)
+        outcome, interruption = evaluate(strategy, parse_measure(out))
+        if outcome != 'skipped':
+            _record(node['id'], strategy, outcome, interruption)
+        attempts.append({'strategy': strategy, 'outcome': outcome, 'interruption_ms': interruption})
+        if outcome in ('reloaded', 'restarted'):
+            return {'ok': True, 'strategy': strategy, 'outcome': outcome, 'interruption_ms': interruption,
+                    'attempts': attempts}
+    return {'ok': False, 'strategy': None, 'outcome': 'failed', 'interruption_ms': None, 'attempts': attempts}
+
+
+def describe(result):
+    """'热重载 (signal), 中断 0.00s' / '重启 (restart), 中断 3.21s' / 'signal 未生效 → 重启 ...'"""
+    if not result['ok']:
+        return '全部策略失败: ' + ', '.join(a['strategy'] for a in result['attempts'])
+    if result['outcome'] == 'reloaded':
+        label = f"热重载 ({result['strategy']})"
+    elif result['strategy'] == 'restart':
+        label = '重启 (restart)'
+    else:
+        label = f"重启 ({result['strategy']} 导致进程重启，已标记为不支持)"
+    text = f"{label}, 中断 {result['interruption_ms'] / 1000:.2f}s"
+    failed = [a['strategy'] for a in result['attempts'][:-1]]
+    return f"{'/'.join(failed)} 未生效 → {text}" if failed else text
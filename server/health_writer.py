@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+健康检查结果的单写者批量持久化
+一个专用写线程独占 SQLite 连接，每个检查周期的结果在一个 WAL 事务中批量写入；
+只有状态变化、指标越过死区或心跳到期时才写行，状态变化同时记入 events 表。
+比较对象是事务内重新读取的当前行 (接收端点、其他监控进程、UI 也会改 nodes 表)，
+而不是本进程上次写入的内容
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# 预编译语句：整个周期复用同一条 SQL，由 sqlite3 的语句缓存保持已 prepare 状态
+UPDATE_NODE_SQL = """
+    UPDATE nodes SET
+        status = ?,
+        openclaw_version = COALESCE(?, openclaw_version),
+        cpu_usage = ?,
+        ram_usage = ?,
+        disk_usage = ?,
+        last_seen_at = ?,
+        last_score = ?,
+        last_score_at = ?,
+        updated_at = ?
+    WHERE id = ?
+"""
+
+HEARTBEAT_SQL = "UPDATE nodes SET last_seen_at = ? WHERE id = ?"
+
+INSERT_EVENT_SQL = """
+    INSERT INTO events (node_id, type, severity, message, details, created_at)
+    VALUES (?, 'health', ?, ?, ?, ?)
+"""
+
+# 指标死区：变化小于该值时不重写整行
+DEFAULT_DEADBANDS = {
+    'cpu_usage': 5.0,
+    'ram_usage': 5.0,
+    'disk_usage': 1.0,
+    'last_score': 5,
+}
+DEFAULT_HEARTBEAT_SECONDS = 300  # last_seen_at 最长刷新间隔，需小于Bot就绪判定的过期时间(600秒)
+
+STATUS_SEVERITY = {
+    'online': 'info', 'healthy': 'info',
+    'warning': 'warn', 'unstable': 'warn', 'degraded': 'warn',
+    'critical': 'error', 'offline': 'error', 'error': 'error',
+}
+
+_STOP = object()
+
+
+class PersistGate:
+    """记住每个节点当前落库的状态 (每个周期从数据库刷新)，决定本次结果是否需要写入"""
+
+    def __init__(self, deadbands=None, heartbeat_seconds=DEFAULT_HEARTBEAT_SECONDS):
+        self.deadbands = dict(DEFAULT_DEADBANDS, **(deadbands or {}))
+        self.heartbeat_ms = heartbeat_seconds * 1000
+        self.persisted = {}  # node_id -> {status, openclaw_version, cpu_usage, ..., last_seen_at}
+
+    def known(self, node_id):
+        return node_id in self.persisted
+
+    def remember(self, node_id, row):
+        self.persisted[node_id] = dict(row)
+
+    def plan(self, node_id, row, now_ms):
+        """返回 ('full'|'heartbeat'|None, 是否状态变化)"""
+        old = self.persisted.get(node_id)
+        if old is None:
+            return 'full', False
+        transition = old.get('status') != row['status']
+        if transition:
+            return 'full', True
+        if row['openclaw_version'] is not None and row['openclaw_version'] != old.get('openclaw_version'):
+            return 'full', False
+        for key, band in self.deadbands.items():
+            if abs((row.get(key) or 0) - (old.get(key) or 0)) >= band:
+                return 'full', False
+        if now_ms - (old.get('last_seen_at') or 0) >= self.heartbeat_ms:
+            return 'heartbeat', False
+        return None, False
+
+
+class HealthResultWriter:
+    """健康结果写入器 - 探测线程只提交结果，数据库锁只由写线程持有"""
+
+    def __init__(self, db_path, busy_timeout_ms=5000, deadbands=None,
+                 heartbeat_seconds=DEFAULT_HEARTBEAT_SECONDS):
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.gate = PersistGate(deadbands, heartbeat_seconds)
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        """启动写线程"""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._thread = threading.Thread(target=self._run, name='health-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10):
+        """停止写线程（会先写完已提交的批次）"""
+        if not self._thread:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def write_cycle(self, results):
+        """提交一个周期的结果 {node_id: health_result}，返回 Future -> 状态变化列表"""
+        future = Future()
+        if not self._thread or not self._thread.is_alive():
+            self.start()
+        self._queue.put((dict(results), future))
+        return future
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _run(self):
+        conn = None
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            results, future = item
+            try:
+                if conn is None:
+                    conn = self._connect()
+                future.set_result(self._flush(conn, results))
+            except Exception as e:
+                logger.error(f"❌ 批量写入健康结果失败: {str(e)}")
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+                future.set_exception(e)
+        if conn is not None:
+            conn.close()
+
+    def _flush(self, conn, results):
+        """写入整个周期里需要落库的结果
+
+        先不加锁读取当前行比较；没有要写的行 (大多数周期) 就不取 SQLite 写锁，不与 Express 竞争。
+        有要写的行时在 BEGIN IMMEDIATE 下重新读取比较，然后在同一事务中写入
+        """
+        if not results:
+            return []
+
+        now_ms = int(time.time() * 1000)
+        full_rows, heartbeat_rows, _, _, _ = self._plan(conn, results, now_ms)
+        if not full_rows and not heartbeat_rows:
+            logger.debug(f"健康结果落库: 全部 {len(results)} 行跳过")
+            return []
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # 写锁下重新读取比较，读取之后别处的修改也算在内
+            full_rows, heartbeat_rows, event_rows, persisted, changes = self._plan(conn, results, now_ms)
+            if full_rows:
+                conn.executemany(UPDATE_NODE_SQL, full_rows)
+            if heartbeat_rows:
+                conn.executemany(HEARTBEAT_SQL, heartbeat_rows)
+            if event_rows:
+                conn.executemany(INSERT_EVENT_SQL, event_rows)
+
+        # 事务提交成功后才更新内存中的已落库状态
+        for node_id, row in persisted.items():
+            self.gate.remember(node_id, row)
+        logger.debug(f"健康结果落库: {len(full_rows)} 行更新, {len(heartbeat_rows)} 行心跳, "
+                     f"{len(results) - len(full_rows) - len(heartbeat_rows)} 行跳过")
+        return changes
+
+    def _plan(self, conn, results, now_ms):
+        """重新读取本周期节点的当前行 (一次查询)，别处改过的状态也能被纠正；返回要写的行、事件和状态变化"""
+        full_rows, heartbeat_rows, event_rows = [], [], []
+        persisted, changes = {}, []
+        node_ids = list(results)
+        placeholders = ','.join('?' * len(node_ids))
+        for row in conn.execute(
+            f"SELECT id, status, openclaw_version, cpu_usage, ram_usage, disk_usage, "
+            f"last_score, last_seen_at FROM nodes WHERE id IN ({placeholders})", node_ids
+        ):
+            self.gate.remember(row[0], {
+                'status': row[1], 'openclaw_version': row[2], 'cpu_usage': row[3],
+                'ram_usage': row[4], 'disk_usage': row[5], 'last_score': row[6],
+                'last_seen_at': row[7],
+            })
+
+        for node_id, health_result in results.items():
+            details = health_result.get('details', {})
+            row = {
+                'status': health_result['status'],
+                'openclaw_version': details.get('openclaw_version'),
+                'cpu_usage': details.get('cpu_usage', 0),
+                'ram_usage': details.get('memory_usage', 0),
+                'disk_usage': details.get('disk_usage', 0),
+                'last_score': health_result['health_score'],
+                'last_seen_at': now_ms,
+            }
+            action, transition = self.gate.plan(node_id, row, now_ms)
+
+            if action == 'full':
+                full_rows.append((
+                    row['status'], row['openclaw_version'], row['cpu_usage'], row['ram_usage'],
+                    row['disk_usage'], now_ms, row['last_score'], now_ms, now_ms, node_id,
+                ))
+                persisted[node_id] = row
+            elif action == 'heartbeat':
+                heartbeat_rows.append((now_ms, node_id))
+                persisted[node_id] = dict(self.gate.persisted[node_id], last_seen_at=now_ms)
+
+            if transition:
+                old_status = self.gate.persisted[node_id]['status']
+                change = {
+                    'node_id': node_id,
+                    'old_status': old_status,
+                    'new_status': row['status'],
+                    'health_score': row['last_score'],
+                }
+                changes.append(change)
+                event_rows.append((
+                    node_id,
+                    STATUS_SEVERITY.get(row['status'], 'warn'),
+                    f"节点状态变化: {old_status} → {row['status']} (分数: {row['last_score']})",
+                    json.dumps(change, ensure_ascii=False),
+                    now_ms,
+                ))
+        return full_rows, heartbeat_rows, event_rows, persisted, changes
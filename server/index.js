@@ -5,6 +5,8 @@ const TokenManager = require('./token-manager');
 const ocmNodesRouter = require("./ocm-nodes-api");
 const cors = require('cors');
 const path = require('path');
+const fs = require('fs');
+const os = require('os');
 const Database = require('better-sqlite3');
 
 const app = express();
@@ -216,6 +218,135 @@ app.put('/api/nodes/:id', (req, res) => {
   }
 });
 
+// 节点推送采集代理 (ocm-agent.py) 的批量上报入口
+const ingestUpdateNode = db.prepare(`
+  UPDATE nodes
+  SET status = ?, cpu_usage = ?, ram_usage = ?, disk_usage = ?, last_seen_at = ?, updated_at = ?
+  WHERE id = ?
+`);
+const ingestInsertEvent = db.prepare(`
+  INSERT INTO events (node_id, type, severity, message, details, created_at)
+  VALUES (?, 'health', ?, ?, ?, ?)
+`);
+
+function agentStateToStatus(state) {
+  if (!state) return 'unknown';
+  if (state.gateway === 'active' && state.port) return 'online';
+  if (state.gateway === 'active') return 'unstable';
+  return 'offline';
+}
+
+// node-health-monitor 的Bot就绪缓存 (与 node-health-monitor.py 同一文件、同样 0600)
+const READINESS_CACHE = process.env.OCM_READINESS_CACHE || path.join(os.homedir(), '.ocm', 'readiness-cache.json');
+// 跨进程锁: 与 node-health-monitor.py 约定 <缓存>.lock 以 O_EXCL 创建、持有者删除，超过5秒视为残留
+const READINESS_LOCK_STALE_MS = 5000;
+
+function withReadinessLock(fn) {
+  const lock = `${READINESS_CACHE}.lock`;
+  const pause = new Int32Array(new SharedArrayBuffer(4));
+  for (;;) {
+    try {
+      fs.closeSync(fs.openSync(lock, 'wx', 0o600));
+      break;
+    } catch (e) {
+      if (e.code !== 'EEXIST') throw e;
+    }
+    try {
+      if (Date.now() - fs.statSync(lock).mtimeMs > READINESS_LOCK_STALE_MS) {
+        fs.unlinkSync(lock); // 持有者异常退出留下的锁
+        continue;
+      }
+    } catch (e) {
+      continue; // 锁刚被释放
+    }
+    Atomics.wait(pause, 0, 0, 10); // 持锁区间只有几毫秒，同步等待即可
+  }
+  try {
+    return fn();
+  } finally {
+    try { fs.unlinkSync(lock); } catch (e) { /* 已被当作残留清理 */ }
+  }
+}
+
+function invalidateReadiness(nodeIds) {
+  if (!nodeIds.length || !fs.existsSync(READINESS_CACHE)) return;
+  // 读-改-写在锁内完成，否则监控进程同时写回旧内容会把这里的删除覆盖掉
+  withReadinessLock(() => {
+    let cache;
+    try {
+      cache = JSON.parse(fs.readFileSync(READINESS_CACHE, 'utf8'));
+    } catch (e) {
+      return; // 没有缓存文件 (或内容损坏，监控进程下次写入时会重建)
+    }
+    if (!nodeIds.some(id => id in cache)) return;
+    nodeIds.forEach(id => delete cache[id]);
+    const tmp = `${READINESS_CACHE}.${process.pid}.tmp`;
+    fs.writeFileSync(tmp, JSON.stringify(cache), { mode: 0o600 });
+    fs.renameSync(tmp, READINESS_CACHE);
+  });
+}
+
+const ingestReports = db.transaction((reports) => {
+  let accepted = 0;
+  const changedNodes = new Set();
+  for (const report of reports) {
+    const samples = Array.isArray(report.samples) ? report.samples : [];
+    const fields = report.fields || ['ts', 'cpu', 'mem', 'disk', 'load1'];
+    const last = samples.length ? samples[samples.length - 1] : null;
+    const sample = last ? Object.fromEntries(fields.map((f, i) => [f, last[i]])) : {};
+    const seenAt = sample.ts || Date.now();
+
+    const changed = ingestUpdateNode.run(
+      agentStateToStatus(report.state),
+      sample.cpu || 0,
+      sample.mem || 0,
+      sample.disk || 0,
+      seenAt,
+      Date.now(),
+      report.node
+    ).changes;
+    if (!changed) continue;
+    accepted++;
+
+    for (const [ts, gateway, port] of report.transitions || []) {
+      changedNodes.add(report.node);
+      const status = agentStateToStatus({ gateway, port });
+      ingestInsertEvent.run(
+        report.node,
+        status === 'online' ? 'info' : 'warn',
+        `节点状态变化: ${status} (gateway=${gateway}, port=${port ? 'open' : 'closed'})`,
+        JSON.stringify({ source: 'agent', gateway, port }),
+        ts
+      );
+    }
+  }
+  return { accepted, changedNodes: [...changedNodes] };
+});
+
+app.post('/api/ingest/node-reports', (req, res) => {
+  const expectedToken = process.env.OCM_INGEST_TOKEN;
+  if (expectedToken && req.get('X-OCM-Ingest-Token') !== expectedToken) {
+    return res.status(401).json({ error: 'invalid ingest token' });
+  }
+  const reports = (req.body && req.body.reports) || [];
+  if (!Array.isArray(reports)) {
+    return res.status(400).json({ error: 'reports must be an array' });
+  }
+  try {
+    const { accepted, changedNodes } = ingestReports(reports.filter(r => r && r.node));
+    // 状态变化时直接删除 node-health-monitor 缓存中这些节点的Bot就绪结论
+    try {
+      invalidateReadiness(changedNodes);
+    } catch (e) {
+      console.warn('就绪缓存失效失败:', e.message);
+    }
+    res.json({ success: true, accepted });
+  } catch (error) {
+    console.error('处理节点上报失败:', error);
+    res.status(500).json({ error: error.message });
+  }
+});
+
 // 查询节点安装状态
 app.get('/api/nodes/:id/install-status', (req, res) => {
   try {
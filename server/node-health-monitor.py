@@ -5,17 +5,75 @@
 """
 
 import json
+import math
 import time
 import requests
 import paramiko
 import threading
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import sqlite3
 import os
 
+from requests.adapters import HTTPAdapter
+
+import proc_sampler
+from health_writer import HealthResultWriter
+from openmetrics_exporter import MetricsRegistry, MetricsServer
+
+DEFAULT_GATEWAY_PORT = 18789  # OpenClaw默认端口
+
+# 本监控的细分状态 -> nodes.status 使用的状态 (与 auto-health-monitor、前端 NodeCard/Nodes 一致)
+DB_STATUS = {
+    'healthy': 'online',
+    'warning': 'unstable',
+    'unstable': 'unstable',
+    'degraded': 'error',     # SSH 可达但 Gateway/API 基本不可用
+    'offline': 'offline',
+    'error': 'error',
+}
+
+# 就绪结论中返回/缓存的节点字段 (不含 SSH 等连接信息)
+READINESS_NODE_FIELDS = ('id', 'name', 'host', 'status', 'last_score', 'last_seen_at')
+# 就绪缓存的跨进程锁 (与 index.js 约定: <缓存>.lock 以 O_EXCL 创建、持有者删除)，超过该秒数视为残留
+READINESS_LOCK_STALE_SECONDS = 5
+
+
+class LatencyWindow:
+    """滚动窗口内的延迟样本，提供 p50/p95/p99"""
+    
+    def __init__(self, max_samples=512, max_age_seconds=3600):
+        self.max_age_seconds = max_age_seconds
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+    
+    def record(self, latency_ms):
+        with self._lock:
+            self._samples.append((time.time(), latency_ms))
+    
+    def snapshot(self):
+        """返回窗口统计 {count, p50, p95, p99, max}"""
+        cutoff = time.time() - self.max_age_seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            values = sorted(ms for _, ms in self._samples)
+        if not values:
+            return {'count': 0, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+        
+        def pct(q):
+            return round(values[max(0, math.ceil(q * len(values)) - 1)], 1)
+        
+        return {'count': len(values), 'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99), 'max': round(values[-1], 1)}
+
 class NodeHealthMonitor:
-    def __init__(self):
+    def __init__(self, db_path=None):
         self.ocm_api_base = "http://192.168.3.33:8001/api"
+        # 健康结果直接写入OCM数据库（变化写入 + 状态变化事件），不经过 PUT /nodes/:id
+        self.db_path = db_path or os.environ.get(
+            'OCM_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'ocm.db'))
+        self.writer = HealthResultWriter(self.db_path)
         self.check_interval = 300  # 5分钟检查一次
         self.health_thresholds = {
             'cpu_warning': 80,      # CPU使用率警告
@@ -28,10 +86,73 @@ class NodeHealthMonitor:
         }
         self.running = False
         
+        # Bot就绪判定缓存：健康结果写入或状态变化时失效，跨进程共享（CLI ready 也可命中）
+        # index.js 的 ingest 端点直接删除其中的条目；读-改-写都在 <缓存>.lock 锁内，文件权限 0600，只存节点摘要字段
+        self.readiness_cache_path = os.environ.get('OCM_READINESS_CACHE',
+                                                   os.path.expanduser('~/.ocm/readiness-cache.json'))
+        self.readiness_stale_seconds = 600   # 健康结果有效期(秒)
+        self.readiness_retry_seconds = 30    # 状态过期等短期结论的缓存时间(秒)
+        self._readiness_lock = threading.Lock()
+        self._readiness_cache = {}
+        self._readiness_version = None
+        
+        # 长连接HTTP客户端：探测和OCM API调用复用连接池
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=0)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        self.latency_windows = {}  # node_id -> LatencyWindow
+        self._latency_lock = threading.Lock()
+        self._gateway_ports = None
+        
+        # OpenMetrics 指标：抓取方直接读 /metrics，无需访问SQLite
+        self.metrics_port = int(os.environ.get('OCM_METRICS_PORT', 9470))
+        self._pending_probes = 0
+        self._pending_lock = threading.Lock()
+        self._known_nodes = set()  # 上个周期节点列表中的节点，移出后删除其指标序列
+        self._init_metrics()
+        
+    def _init_metrics(self):
+        """注册导出的指标"""
+        m = self.metrics = MetricsRegistry()
+        self.m_cpu = m.gauge('ocm_node_cpu_usage_percent', 'Node CPU usage percent', ['node'])
+        self.m_ram = m.gauge('ocm_node_ram_usage_percent', 'Node memory usage percent', ['node'])
+        self.m_disk = m.gauge('ocm_node_disk_usage_percent', 'Node root filesystem usage percent', ['node'])
+        self.m_score = m.gauge('ocm_node_health_score', 'Node health score (0-100)', ['node'])
+        self.m_up = m.gauge('ocm_node_up', 'Node probe succeeded and status is not offline/error', ['node'])
+        self.m_latency = m.gauge('ocm_node_gateway_latency_seconds', 'Gateway /status latency percentiles',
+                                 ['node', 'quantile'])
+        self.m_probe_duration = m.histogram('ocm_probe_duration_seconds', 'Duration of a single health probe',
+                                            ['probe'])
+        self.m_probe_failures = m.counter('ocm_probe_failures', 'Failed health probes', ['node', 'probe'])
+        self.m_cycle = m.histogram('ocm_monitor_cycle_duration_seconds', 'Duration of a full check cycle',
+                                   buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+        self.m_last_cycle = m.gauge('ocm_monitor_last_cycle_timestamp_seconds', 'Unix time of the last finished cycle')
+        self.m_queue = m.gauge('ocm_monitor_queue_depth', 'Work waiting in the monitor', ['queue'])
+        
+        def collect_queues():
+            with self._pending_lock:
+                self.m_queue.set(self._pending_probes, queue='probes')
+            self.m_queue.set(self.writer._queue.qsize(), queue='db_writer')
+        m.on_collect(collect_queues)
+    
+    def start_metrics_server(self):
+        """启动本地 /metrics 端点（端口为0时禁用）"""
+        if not self.metrics_port:
+            return None
+        try:
+            server = MetricsServer(self.metrics, os.environ.get('OCM_METRICS_HOST', '127.0.0.1'), self.metrics_port).start()
+            print(f"📈 指标端点: http://{server.host}:{server.port}/metrics")
+            return server
+        except OSError as e:
+            print(f"⚠️ 指标端点启动失败: {str(e)}")
+            return None
+    
     def start_monitoring(self):
         """启动健康监控"""
         self.running = True
         print("🔍 启动节点健康监控...")
+        self.start_metrics_server()
         
         while self.running:
             try:
@@ -48,17 +169,22 @@ class NodeHealthMonitor:
         """检查所有节点"""
         try:
             # 获取所有节点
-            response = requests.get(f"{self.ocm_api_base}/nodes", timeout=10)
+            response = self.http.get(f"{self.ocm_api_base}/nodes", timeout=10)
             if response.status_code != 200:
                 print(f"❌ 无法获取节点列表: {response.status_code}")
                 return
             
             nodes = response.json()
             print(f"📋 开始检查 {len(nodes)} 个节点...")
+            self._forget_removed_nodes({node['id'] for node in nodes})
+            self._gateway_ports = None  # 每个周期重新读取注册表中的Gateway端口
             
             # 并行检查所有节点
+            cycle_start = time.time()
             threads = []
             results = {}
+            with self._pending_lock:
+                self._pending_probes = len(nodes)
             
             for node in nodes:
                 thread = threading.Thread(
@@ -74,6 +200,8 @@ class NodeHealthMonitor:
             
             # 处理检查结果
             self._process_health_results(results)
+            self.m_cycle.observe(time.time() - cycle_start)
+            self.m_last_cycle.set(time.time())
             
         except Exception as e:
             print(f"❌ 节点检查失败: {str(e)}")
@@ -85,16 +213,16 @@ class NodeHealthMonitor:
             print(f"🔍 检查节点: {node['name']} ({node['host']})")
             
             # 1. 网络连通性检查
-            connectivity = self._check_connectivity(node)
+            connectivity = self._timed_probe('connectivity', self._check_connectivity, node)
             
             # 2. OpenClaw服务检查
-            openclaw_status = self._check_openclaw_service(node)
+            openclaw_status = self._timed_probe('openclaw_service', self._check_openclaw_service, node)
             
             # 3. 系统资源检查
-            resources = self._check_system_resources(node)
+            resources = self._timed_probe('resources', self._check_system_resources, node)
             
             # 4. API响应检查
-            api_status = self._check_api_response(node)
+            api_status = self._timed_probe('api', self._check_api_response, node)
             
             # 5. 计算健康分数
             health_score = self._calculate_health_score(
@@ -126,6 +254,18 @@ class NodeHealthMonitor:
                 'checked_at': datetime.now().isoformat()
             }
             print(f"❌ {node['name']}: 检查失败 - {str(e)}")
+        finally:
+            with self._pending_lock:
+                self._pending_probes = max(0, self._pending_probes - 1)
+    
+    def _timed_probe(self, probe, check, node):
+        """执行单项探测并记录耗时/失败指标"""
+        start = time.time()
+        result = check(node)
+        self.m_probe_duration.observe(time.time() - start, probe=probe)
+        if 'error' in result or result.get('success') is False:
+            self.m_probe_failures.inc(node=node['id'], probe=probe)
+        return result
     
     def _check_connectivity(self, node):
         """检查网络连通性"""
@@ -207,41 +347,16 @@ class NodeHealthMonitor:
             }
     
     def _check_system_resources(self, node):
-        """检查系统资源"""
+        """检查系统资源（/proc 差值采样，一次远程执行）"""
         try:
             ssh = self._get_ssh_connection(node)
-            
-            # CPU使用率
-            stdin, stdout, stderr = ssh.exec_command(
-                "top -bn1 | grep 'Cpu(s)' | awk '{print $2}' | cut -d'%' -f1 | sed 's/[^0-9.]//g'"
-            )
-            cpu_usage = float(stdout.read().decode().strip() or 0)
-            
-            # 内存使用率
-            stdin, stdout, stderr = ssh.exec_command(
-                "free | grep Mem | awk '{printf(\"%.1f\", $3/$2 * 100.0)}'"
-            )
-            memory_usage = float(stdout.read().decode().strip() or 0)
-            
-            # 磁盘使用率
-            stdin, stdout, stderr = ssh.exec_command(
-                "df -h / | awk 'NR==2{print $5}' | cut -d'%' -f1"
-            )
-            disk_usage = float(stdout.read().decode().strip() or 0)
-            
-            # 负载平均值
-            stdin, stdout, stderr = ssh.exec_command('uptime | awk -F"load average:" \'{print $2}\'')
-            load_avg = stdout.read().decode().strip()
-            
+            resources = proc_sampler.to_resource_fields(proc_sampler.sample_via_ssh(ssh))
             ssh.close()
             
-            return {
-                'cpu_usage': cpu_usage,
-                'memory_usage': memory_usage,
-                'disk_usage': disk_usage,
-                'load_average': load_avg,
-                'status': self._get_resource_status(cpu_usage, memory_usage, disk_usage)
-            }
+            resources['status'] = self._get_resource_status(
+                resources['cpu_usage'], resources['memory_usage'], resources['disk_usage']
+            )
+            return resources
             
         except Exception as e:
             return {
@@ -250,29 +365,79 @@ class NodeHealthMonitor:
             }
     
     def _check_api_response(self, node):
-        """检查OpenClaw API响应"""
+        """检查OpenClaw API响应（超时/连接失败也计入延迟窗口，分位数才能反映最慢的探测）"""
+        timeout = self.health_thresholds['response_timeout']
+        start_time = time.time()
         try:
-            port = 18789  # OpenClaw默认端口
-            url = f"http://{node['host']}:{port}/status"
+            url = f"http://{node['host']}:{self._gateway_port(node)}/status"
             
-            start_time = time.time()
-            response = requests.get(url, timeout=self.health_thresholds['response_timeout'])
+            response = self.http.get(url, timeout=timeout)
             response_time = (time.time() - start_time) * 1000
+            self._latency_window(node['id']).record(response_time)
             
             return {
                 'success': response.status_code == 200,
                 'status_code': response.status_code,
                 'response_time_ms': response_time,
+                'latency': self._latency_window(node['id']).snapshot(),
                 'content': response.text[:500] if response.text else ''
             }
             
         except Exception as e:
+            response_time = (time.time() - start_time) * 1000
+            if isinstance(e, requests.Timeout):
+                response_time = max(response_time, timeout * 1000)
+            self._latency_window(node['id']).record(response_time)
             return {
                 'success': False,
                 'error': str(e),
-                'response_time_ms': None
+                'response_time_ms': response_time,
+                'latency': self._latency_window(node['id']).snapshot(),
             }
     
+    def _gateway_port(self, node):
+        """节点的Gateway端口：节点字段 > nodes-registry.json > 默认端口"""
+        port = node.get('gatewayPort') or node.get('gateway_port')
+        if port:
+            return int(port)
+        ports = self._gateway_ports
+        if ports is None:
+            ports = {}
+            registry_path = os.environ.get('OCM_NODES_REGISTRY') or os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), 'nodes-registry.json')
+            try:
+                with open(registry_path) as f:
+                    for n in json.load(f).get('nodes', []):
+                        if n.get('gatewayPort'):
+                            ports[n['id']] = int(n['gatewayPort'])
+            except (OSError, ValueError):
+                pass
+            self._gateway_ports = ports
+        return ports.get(node['id'], DEFAULT_GATEWAY_PORT)
+    
+    def _forget_removed_nodes(self, node_ids):
+        """节点已从节点列表中删除: 删掉它的指标序列和延迟窗口，否则会一直以最后的值导出"""
+        for node_id in self._known_nodes - node_ids:
+            self.metrics.remove(node=node_id)
+            with self._latency_lock:
+                self.latency_windows.pop(node_id, None)
+        self._known_nodes = set(node_ids)
+    
+    def _latency_window(self, node_id):
+        with self._latency_lock:
+            if node_id not in self.latency_windows:
+                self.latency_windows[node_id] = LatencyWindow()
+            return self.latency_windows[node_id]
+    
+    def get_latency_stats(self, node_id=None):
+        """Gateway延迟分位数 (p50/p95/p99)，不指定节点则返回全部"""
+        with self._latency_lock:
+            windows = dict(self.latency_windows)
+        if node_id is not None:
+            window = windows.get(node_id)
+            return window.snapshot() if window else LatencyWindow().snapshot()
+        return {nid: window.snapshot() for nid, window in windows.items()}
+    
     def _calculate_health_score(self, connectivity, openclaw_status, resources, api_status):
         """计算健康分数 (0-100)"""
         score = 0
@@ -360,15 +525,28 @@ class NodeHealthMonitor:
     def _process_health_results(self, results):
         """处理健康检查结果"""
         try:
-            # 更新数据库中的节点状态
+            # 整个周期一次落库：只有状态变化/指标越过死区/心跳到期的节点才会写行
+            batch = {
+                node_id: {
+                    'status': DB_STATUS.get(result['status'], 'unknown'),
+                    'health_score': result['health_score'],
+                    'details': result['resources'],
+                }
+                for node_id, result in results.items() if 'error' not in result
+            }
+            try:
+                for change in self.writer.write_cycle(batch).result():
+                    print(f"🔄 节点状态变化: {change['node_id']} {change['old_status']} -> {change['new_status']}")
+            except Exception as e:
+                print(f"❌ 更新节点状态失败: {str(e)}")
+            
+            self._update_node_metrics(results)
             for node_id, result in results.items():
-                if 'error' not in result:
-                    self._update_node_status(
-                        node_id,
-                        result['status'],
-                        result['health_score'],
-                        result['resources']
-                    )
+                if node_id in batch:
+                    # 用本次结果直接生成就绪结论，后续创建Bot无需再请求API
+                    self._prime_readiness(node_id, result)
+                else:
+                    self.invalidate_readiness(node_id)
             
             # 生成健康报告
             self._generate_health_report(results)
@@ -376,30 +554,22 @@ class NodeHealthMonitor:
         except Exception as e:
             print(f"处理健康结果失败: {str(e)}")
     
-    def _update_node_status(self, node_id, status, health_score, resources):
-        """更新节点状态到数据库"""
-        try:
-            update_data = {
-                'status': status,
-                'last_seen_at': int(time.time() * 1000),
-                'cpu_usage': resources.get('cpu_usage', 0),
-                'ram_usage': resources.get('memory_usage', 0),
-                'disk_usage': resources.get('disk_usage', 0),
-                'last_score': health_score,
-                'last_score_at': int(time.time() * 1000)
-            }
-            
-            response = requests.put(
-                f"{self.ocm_api_base}/nodes/{node_id}",
-                json=update_data,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                print(f"✅ 更新节点状态: {node_id} -> {status}")
-            
-        except Exception as e:
-            print(f"❌ 更新节点状态失败: {str(e)}")
+    def _update_node_metrics(self, results):
+        """用本周期结果刷新每节点指标"""
+        for node_id, result in results.items():
+            self.m_score.set(result.get('health_score', 0), node=node_id)
+            self.m_up.set(0 if result.get('status') in ('offline', 'error') else 1, node=node_id)
+            resources = result.get('resources') or {}
+            if 'error' not in resources and 'cpu_usage' in resources:
+                self.m_cpu.set(resources['cpu_usage'], node=node_id)
+                self.m_ram.set(resources['memory_usage'], node=node_id)
+                self.m_disk.set(resources['disk_usage'], node=node_id)
+            if 'error' in result:
+                self.m_probe_failures.inc(node=node_id, probe='check')
+        for node_id, stats in self.get_latency_stats().items():
+            if stats['count']:
+                for quantile in ('p50', 'p95', 'p99'):
+                    self.m_latency.set(stats[quantile] / 1000, node=node_id, quantile=f"0.{quantile[1:]}")
     
     def _generate_health_report(self, results):
         """生成健康报告"""
@@ -419,6 +589,13 @@ class NodeHealthMonitor:
             if result.get('status') not in ['healthy', 'warning']
         ]
         
+        latency = self.get_latency_stats()
+        if latency:
+            print("\\n⏱️ Gateway延迟 (p50/p95/p99 ms):")
+            for node_id, stats in latency.items():
+                if stats['count']:
+                    print(f"  {node_id}: {stats['p50']}/{stats['p95']}/{stats['p99']} (样本 {stats['count']})")
+        
         if problem_nodes:
             print("\\n⚠️ 问题节点:")
             for node_id, result in problem_nodes:
@@ -426,32 +603,163 @@ class NodeHealthMonitor:
                 print(f"  {node.get('name', node_id)}: {result.get('status', 'unknown')}")
     
     def check_node_ready_for_bot(self, node_id):
-        """检查节点是否准备好添加Bot"""
+        """检查节点是否准备好添加Bot（优先使用缓存的就绪结论）"""
+        cached = self._get_cached_readiness(node_id)
+        if cached is not None:
+            return cached
+        
         try:
-            response = requests.get(f"{self.ocm_api_base}/nodes/{node_id}", timeout=10)
+            response = self.http.get(f"{self.ocm_api_base}/nodes/{node_id}", timeout=10)
             if response.status_code != 200:
                 return {'ready': False, 'reason': '节点不存在或API错误'}
             
-            node = response.json()
-            
-            # 检查节点状态
-            if node.get('status') not in ['healthy', 'online']:
-                return {'ready': False, 'reason': f"节点状态不健康: {node.get('status')}"}
-            
-            # 检查最近的健康分数
-            last_score = node.get('last_score', 0)
-            if last_score < 70:
-                return {'ready': False, 'reason': f"健康分数过低: {last_score}/100"}
-            
-            # 检查最近的检查时间
-            last_seen = node.get('last_seen_at', 0)
-            if last_seen < (time.time() - 600) * 1000:  # 10分钟内
-                return {'ready': False, 'reason': '节点状态过期，请等待下次健康检查'}
-            
-            return {'ready': True, 'node': node}
+            return self._cache_readiness(node_id, response.json())
             
         except Exception as e:
             return {'ready': False, 'reason': f'检查失败: {str(e)}'}
+    
+    def check_nodes_ready_for_bot(self, node_ids):
+        """批量检查多个节点，未命中缓存的节点只请求一次节点列表"""
+        verdicts = {}
+        missing = []
+        for node_id in node_ids:
+            cached = self._get_cached_readiness(node_id)
+            if cached is not None:
+                verdicts[node_id] = cached
+            else:
+                missing.append(node_id)
+        
+        if missing:
+            try:
+                response = self.http.get(f"{self.ocm_api_base}/nodes", timeout=10)
+                nodes = {n['id']: n for n in response.json()} if response.status_code == 200 else {}
+                for node_id in missing:
+                    if node_id in nodes:
+                        verdicts[node_id] = self._cache_readiness(node_id, nodes[node_id])
+                    else:
+                        verdicts[node_id] = {'ready': False, 'reason': '节点不存在或API错误'}
+            except Exception as e:
+                for node_id in missing:
+                    verdicts[node_id] = {'ready': False, 'reason': f'检查失败: {str(e)}'}
+        
+        return verdicts
+    
+    def _evaluate_readiness(self, node):
+        """就绪判定阈值逻辑"""
+        # 检查节点状态
+        if node.get('status') not in ['healthy', 'online']:
+            return {'ready': False, 'reason': f"节点状态不健康: {node.get('status')}"}
+        
+        # 检查最近的健康分数
+        last_score = node.get('last_score') or 0
+        if last_score < 70:
+            return {'ready': False, 'reason': f"健康分数过低: {last_score}/100"}
+        
+        # 检查最近的检查时间
+        last_seen = node.get('last_seen_at') or 0
+        if last_seen < (time.time() - self.readiness_stale_seconds) * 1000:  # 10分钟内
+            return {'ready': False, 'reason': '节点状态过期，请等待下次健康检查'}
+        
+        return {'ready': True, 'node': {k: node.get(k) for k in READINESS_NODE_FIELDS}}
+    
+    def _cache_readiness(self, node_id, node):
+        """判定并缓存结论，有效期到健康结果过期为止"""
+        verdict = self._evaluate_readiness(node)
+        last_seen = (node.get('last_seen_at') or 0) / 1000
+        expires_at = last_seen + self.readiness_stale_seconds
+        if expires_at <= time.time():
+            expires_at = time.time() + self.readiness_retry_seconds
+        
+        with self._readiness_lock, self._readiness_file_lock():
+            self._load_readiness_cache()
+            self._readiness_cache[node_id] = {'verdict': verdict, 'expires_at': expires_at}
+            self._save_readiness_cache()
+        return verdict
+    
+    def _prime_readiness(self, node_id, result):
+        """由监控结果生成就绪结论"""
+        node = dict(result.get('node', {}))
+        node.update({
+            'status': result['status'],
+            'last_score': result['health_score'],
+            'last_seen_at': int(time.time() * 1000),
+        })
+        self._cache_readiness(node_id, node)
+    
+    def _get_cached_readiness(self, node_id):
+        with self._readiness_lock:
+            self._load_readiness_cache()
+            entry = self._readiness_cache.get(node_id)
+        if entry and entry['expires_at'] > time.time():
+            return entry['verdict']
+        return None
+    
+    def invalidate_readiness(self, node_id=None):
+        """使就绪缓存失效（节点状态变化时调用，node_id为空则全部失效）"""
+        with self._readiness_lock, self._readiness_file_lock():
+            self._load_readiness_cache()
+            if node_id is None:
+                self._readiness_cache.clear()
+            else:
+                self._readiness_cache.pop(node_id, None)
+            self._save_readiness_cache()
+    
+    @contextmanager
+    def _readiness_file_lock(self):
+        """跨进程互斥 (监控守护进程、CLI、index.js)，避免并发的读-改-写互相覆盖 (如丢掉 index.js 的失效)"""
+        lock_path = f"{self.readiness_cache_path}.lock"
+        os.makedirs(os.path.dirname(lock_path), mode=0o700, exist_ok=True)
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > READINESS_LOCK_STALE_SECONDS:
+                        os.unlink(lock_path)  # 持有者异常退出留下的锁
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.01)
+        os.close(fd)
+        try:
+            yield
+        finally:
+            try:
+                os.unlink(lock_path)
+            except OSError:
+                pass
+    
+    def _load_readiness_cache(self):
+        """文件有变化时重新加载（其他进程可能已写入新结论；写入都是 rename，inode 必变）"""
+        try:
+            st = os.stat(self.readiness_cache_path)
+        except OSError:
+            self._readiness_cache, self._readiness_version = {}, None
+            return
+        version = (st.st_ino, st.st_mtime_ns)
+        if version == self._readiness_version:
+            return
+        try:
+            with open(self.readiness_cache_path) as f:
+                self._readiness_cache = json.load(f)
+            self._readiness_version = version
+        except (OSError, ValueError):
+            self._readiness_cache = {}
+    
+    def _save_readiness_cache(self):
+        now = time.time()
+        self._readiness_cache = {k: v for k, v in self._readiness_cache.items() if v['expires_at'] > now}
+        try:
+            os.makedirs(os.path.dirname(self.readiness_cache_path), mode=0o700, exist_ok=True)
+            tmp_path = f"{self.readiness_cache_path}.{os.getpid()}.tmp"
+            with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+                json.dump(self._readiness_cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.readiness_cache_path)
+            st = os.stat(self.readiness_cache_path)
+            self._readiness_version = (st.st_ino, st.st_mtime_ns)
+        except OSError as e:
+            print(f"⚠️ 写入就绪缓存失败: {str(e)}")
 
 # CLI接口
 if __name__ == "__main__":
@@ -465,10 +773,16 @@ if __name__ == "__main__":
             monitor.check_all_nodes()
         elif sys.argv[1] == 'ready' and len(sys.argv) > 2:
             # 检查节点是否准备好添加Bot
-            result = monitor.check_node_ready_for_bot(sys.argv[2])
+            if len(sys.argv) > 3:
+                result = monitor.check_nodes_ready_for_bot(sys.argv[2:])
+            else:
+                result = monitor.check_node_ready_for_bot(sys.argv[2])
             print(json.dumps(result, indent=2, ensure_ascii=False))
+        elif sys.argv[1] == 'invalidate':
+            # 节点状态变化后使就绪缓存失效
+            monitor.invalidate_readiness(sys.argv[2] if len(sys.argv) > 2 else None)
         else:
-            print("用法: python3 node-health-monitor.py [check|ready <node_id>]")
+            print("用法: python3 node-health-monitor.py [check|ready <node_id> [node_id...]|invalidate [node_id]]")
     else:
         # 持续监控模式
         monitor.start_monitoring()
\ No newline at end of file
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+共享节点清单与SSH会话缓存
+节点信息来自 nodes-registry.json（与 ocm-nodes.py 相同的查找顺序），注册表中没有的节点
+再从 OCM 数据库 nodes 表补充；SessionCache 按节点缓存已认证的 paramiko 连接，
+备份/还原/运维模块共用，同一流程中的诊断→还原→验证只建立一次连接
+
+认证: 注册表 sshPassword 字段 > 环境变量 NODE_SSH_PASSWORD > SSH密钥/agent
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+
+from ocm_transport import ParamikoTransport
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(SCRIPT_DIR, 'db', 'ocm.db')
+SERVICE_NAME = 'openclaw-gateway'
+
+
+def find_registry():
+    """查找 nodes-registry.json，找不到返回 None"""
+    candidates = [
+        os.path.join(os.getcwd(), 'nodes-registry.json'),
+        os.path.join(SCRIPT_DIR, 'nodes-registry.json'),
+        os.path.expanduser('~/.openclaw/workspace-main/nodes-registry.json'),
+        os.environ.get('OCM_NODES_REGISTRY', ''),
+    ]
+    for path in candidates:
+        if path and os.path.isfile(path):
+            return path
+    return None
+
+
+def _with_legacy_keys(node):
+    """补充旧模块使用的字段名 (user/password/openclaw_dir/config_path/service_name)"""
+    node = dict(node)
+    node.setdefault('sshPort', 22)
+    node.setdefault('gatewayPort', 18789)
+    node['user'] = node.get('sshUser')
+    node['password'] = node.get('sshPassword') or os.environ.get('NODE_SSH_PASSWORD')
+    node['openclaw_dir'] = node.get('ocPath')
+    node['config_path'] = f"{node.get('ocPath')}/openclaw.json"
+    node['service_name'] = node.get('serviceName', SERVICE_NAME)
+    return node
+
+
+class NodeInventory:
+    """节点清单 - 支持 `node_id in inventory` 和 `inventory[node_id]`"""
+
+    def __init__(self, registry_path=None, db_path=DEFAULT_DB_PATH):
+        self.registry_path = registry_path or find_registry()
+        self.db_path = db_path
+        self._nodes = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        nodes = {}
+        if self.db_path and os.path.isfile(self.db_path):
+            try:
+                db = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+                try:
+                    for row in db.execute("SELECT id, name, host, port, ssh_user, openclaw_path FROM nodes"):
+                        nodes[row[0]] = {'id': row[0], 'name': row[1], 'host': row[2], 'sshPort': row[3] or 22,
+                                         'sshUser': row[4], 'ocPath': row[5]}
+                finally:
+                    db.close()
+            except sqlite3.Error:
+                pass
+        if self.registry_path:
+            with open(self.registry_path) as f:
+                for node in json.load(f).get('nodes', []):
+                    nodes[node['id']] = node  # 注册表优先
+        return {node_id: _with_legacy_keys(node) for node_id, node in nodes.items()}
+
+    @property
+    def nodes(self):
+        with self._lock:
+            if self._nodes is None:
+                self._nodes = self._load()
+            return self._nodes
+
+    def registry(self):
+        """注册表原始内容（backupProfiles 等全局设置），没有注册表时为空字典"""
+        if not self.registry_path:
+            return {}
+        with open(self.registry_path) as f:
+            return json.load(f)
+
+    def reload(self):
+        with self._lock:
+            self._nodes = None
+
+    def ids(self):
+        return list(self.nodes)
+
+    def get(self, node_id, default=None):
+        return self.nodes.get(node_id, default)
+
+    def __contains__(self, node_id):
+        return node_id in self.nodes
+
+    def __getitem__(self, node_id):
+        return self.nodes[node_id]
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+
+class SessionCache:
+    """按节点缓存 paramiko 连接；连接断开时自动重连，close() 统一释放"""
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self._transports = {}
+        self._lock = threading.Lock()
+
+    def transport(self, node_id):
+        with self._lock:
+            transport = self._transports.get(node_id)
+            if transport is None:
+                node = self.inventory.get(node_id)
+                if node is None:
+                    raise ValueError(f"Unknown node: {node_id}")
+                transport = self._transports[node_id] = ParamikoTransport(node)
+            return transport
+
+    def client(self, node_id):
+        """返回已认证的 SSHClient（调用方不要 close，由缓存统一管理）"""
+        return self.transport(node_id).client
+
+    def close(self, node_id=None):
+        with self._lock:
+            if node_id is None:
+                transports, self._transports = list(self._transports.values()), {}
+            else:
+                transports = [t for t in [self._transports.pop(node_id, None)] if t]
+        for transport in transports:
+            transport.close()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_sessions(db_path=DEFAULT_DB_PATH):
+    """进程内共享的清单+会话缓存（各模块实例共用同一组连接）"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SessionCache(NodeInventory(db_path=db_path))
+            atexit.register(_shared.close)
+        return _shared
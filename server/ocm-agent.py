@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+OCM 节点推送采集代理 - 在节点本地采样，批量推送到 OCM ingest 接口
+仅依赖标准库，由 `ocm-nodes.py add --push-agent <URL>` 安装为 systemd 用户服务
+用法: python3 ocm-agent.py --url http://<ocm>:8001/api/ingest/node-reports --node-id pc-a
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPORT_VERSION = 1
+SAMPLE_FIELDS = ['ts', 'cpu', 'mem', 'disk', 'load1']
+MAX_SPOOL_LINES = 2000  # 断线时最多缓存的报告数
+
+
+def read_cpu_times():
+    """读取 /proc/stat 总 CPU 时间 (busy, total)"""
+    with open('/proc/stat') as f:
+        parts = f.readline().split()[1:]
+    values = [int(v) for v in parts]
+    idle = values[3] + (values[4] if len(values) > 4 else 0)  # idle + iowait
+    total = sum(values[:8])  # guest 已计入 user，不重复累加
+    return total - idle, total
+
+
+def read_mem_percent():
+    """根据 /proc/meminfo 计算内存使用率"""
+    info = {}
+    with open('/proc/meminfo') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            info[key] = int(rest.split()[0])
+    total = info.get('MemTotal', 0)
+    available = info.get('MemAvailable', info.get('MemFree', 0))
+    return round((total - available) * 100.0 / total, 1) if total else 0
+
+
+def read_disk_percent(path='/'):
+    st = os.statvfs(path)
+    used = (st.f_blocks - st.f_bfree) * st.f_frsize
+    usable = used + st.f_bavail * st.f_frsize
+    return round(used * 100.0 / usable, 1) if usable else 0
+
+
+def gateway_state(gateway_port):
+    """Gateway 服务状态和端口监听"""
+    try:
+        r = subprocess.run(['systemctl', '--user', 'is-active', 'openclaw-gateway'],
+                           capture_output=True, text=True, timeout=5)
+        service = r.stdout.strip() or 'unknown'
+    except Exception:
+        service = 'unknown'
+    try:
+        with socket.create_connection(('127.0.0.1', gateway_port), timeout=1):
+            port_open = True
+    except OSError:
+        port_open = False
+    return {'gateway': service, 'port': port_open}
+
+
+class Spool:
+    """断线期间的本地报告缓存 (JSON lines)"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def write(self, reports):
+        lines = [json.dumps(r, separators=(',', ':')) for r in reports[-MAX_SPOOL_LINES:]]
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp, self.path)
+
+    def read(self):
+        try:
+            with open(self.path) as f:
+                return [json.loads(line) for line in f.read().splitlines() if line.strip()]
+        except (FileNotFoundError, ValueError):
+            return []
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class PushAgent:
+    def __init__(self, url, node_id, gateway_port=18789, interval=5, push_every=10,
+                 spool_path=None, token=None):
+        self.url = url
+        self.node_id = node_id
+        self.gateway_port = gateway_port
+        self.interval = interval
+        self.push_every = push_every
+        self.token = token
+        self.spool = Spool(spool_path or os.path.expanduser('~/.ocm-agent/spool.jsonl'))
+        self.samples = []
+        self.transitions = []
+        self.last_state = None
+        self._cpu_prev = read_cpu_times()
+
+    def sample(self):
+        """采样一次 - CPU 使用率取两次 /proc/stat 读数的差值"""
+        busy, total = read_cpu_times()
+        prev_busy, prev_total = self._cpu_prev
+        self._cpu_prev = (busy, total)
+        delta = total - prev_total
+        cpu = round((busy - prev_busy) * 100.0 / delta, 1) if delta > 0 else 0
+        load1 = os.getloadavg()[0]
+        now = int(time.time() * 1000)
+        self.samples.append([now, cpu, read_mem_percent(), read_disk_percent(), round(load1, 2)])
+
+        state = gateway_state(self.gateway_port)
+        if state != self.last_state:
+            self.transitions.append([now, state['gateway'], state['port']])
+            self.last_state = state
+
+    def build_report(self):
+        report = {
+            'v': REPORT_VERSION,
+            'node': self.node_id,
+            'fields': SAMPLE_FIELDS,
+            'samples': self.samples,
+            'state': self.last_state,
+            'transitions': self.transitions,
+        }
+        self.samples = []
+        self.transitions = []
+        return report
+
+    def post(self, reports):
+        body = json.dumps({'reports': reports}, separators=(',', ':')).encode()
+        req = urllib.request.Request(self.url, data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+        if self.token:
+            req.add_header('X-OCM-Ingest-Token', self.token)
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return 200 <= resp.status < 300
+
+    def push(self):
+        """推送当前批次，连带断线期间缓存的报告；失败则写入缓存"""
+        pending = self.spool.read() + [self.build_report()]
+        sent = 0
+        try:
+            # 按时间顺序分块补发，避免单次请求过大
+            while sent < len(pending):
+                chunk = pending[sent:sent + 100]
+                if not self.post(chunk):
+                    raise IOError('ingest rejected reports')
+                sent += len(chunk)
+            self.spool.clear()
+        except Exception as e:
+            self.spool.write(pending[sent:])
+            print(f"⚠ 推送失败，已缓存 {len(pending) - sent} 条报告: {e}", file=sys.stderr)
+
+    def run(self):
+        print(f"🚀 OCM agent 启动: node={self.node_id} → {self.url}")
+        next_push = time.time() + self.push_every
+        while True:
+            self.sample()
+            if time.time() >= next_push:
+                self.push()
+                next_push = time.time() + self.push_every
+            time.sleep(self.interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCM node push agent', prog='ocm-agent.py')
+    parser.add_argument('--url', required=True, help='OCM ingest 接口地址')
+    parser.add_argument('--node-id', required=True, help='节点ID')
+    parser.add_argument('--gateway-port', type=int, default=18789, help='Gateway端口')
+    parser.add_argument('--interval', type=float, default=5, help='采样间隔(秒)')
+    parser.add_argument('--push-every', type=float, default=10, help='推送间隔(秒)')
+    parser.add_argument('--spool', help='断线缓存文件路径')
+    parser.add_argument('--token', default=os.environ.get('OCM_INGEST_TOKEN'), help='ingest 认证token')
+    args = parser.parse_args()
+
+    agent = PushAgent(args.url, args.node_id, args.gateway_port, args.interval,
+                      args.push_every, args.spool, args.token)
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.push()
+
+
+if __name__ == '__main__':
+    main()
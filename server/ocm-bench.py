@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+OCM CLI 延迟基准 - 在本机模拟 N 个节点，测量 ocm-nodes.py 常用命令的耗时
+用法: python3 ocm-bench.py [--nodes 1,10,100] [--agents 1,10,100] [--repeat 3] [--out result.json]
+      python3 ocm-bench.py --compare baseline.json --out current.json
+
+模拟节点均指向 127.0.0.1 (走 ocm-nodes.py 的本机执行路径)，每个节点有独立的
+ocPath/openclaw.json/agents 目录；PATH 前置一个假的 systemctl，HOME 与备份目录
+指向临时目录，不会触碰真实节点和真实配置。
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OCM_NODES = os.path.join(SCRIPT_DIR, 'ocm-nodes.py')
+BENCH_BOT = 'benchbot'
+
+FAKE_SYSTEMCTL = """#!/bin/sh
+# ocm-bench: 模拟 systemctl --user
+for a in "$@"; do
+  case "$a" in
+    is-active) echo active; exit 0 ;;
+    status) echo "● openclaw-gateway.service - OpenClaw Gateway"; echo "   Active: active (running)"; exit 0 ;;
+  esac
+done
+exit 0
+"""
+
+# (名称, 参数生成函数, 是否会修改节点配置)
+COMMANDS = [
+    ('list --json', lambda node_id: ['--json', 'list'], False),
+    ('status --json', lambda node_id: ['--json', 'status', node_id], False),
+    ('bot-list', lambda node_id: ['bot-list', node_id], False),
+    ('backup', lambda node_id: ['backup', node_id], False),
+    ('bot-add', lambda node_id: ['bot-add', node_id, BENCH_BOT, '--yes'], True),
+]
+
+
+def build_fixture(root, node_count, agent_count):
+    """生成模拟节点目录和注册表，返回节点列表"""
+    nodes = []
+    for i in range(node_count):
+        node_id = f"sim{i:03d}"
+        oc_path = os.path.join(root, 'nodes', node_id, '.openclaw')
+        agents, bindings = [], []
+        for j in range(agent_count):
+            agent_id = f"bot{j:03d}"
+            agent_dir = os.path.join(oc_path, 'agents', agent_id, 'agent')
+            workspace = os.path.join(oc_path, f'workspace-{agent_id}')
+            os.makedirs(agent_dir)
+            os.makedirs(os.path.join(workspace, 'memory'))
+            with open(os.path.join(agent_dir, 'openclaw.json'), 'w') as f:
+                json.dump({'name': f'Bot {j}', 'llm': {'model': 'anthropic/claude-sonnet-4'},
+                           'channels': [{'type': 'telegram'}]}, f)
+            for fname in ('SOUL.md', 'AGENTS.md', 'MEMORY.md'):
+                with open(os.path.join(workspace, fname), 'w') as f:
+                    f.write(f"# {agent_id} {fname}\n" + 'x' * 512)
+            agents.append({'id': agent_id, 'workspace': workspace, 'agentDir': f'agents/{agent_id}/agent'})
+            bindings.append({'agentId': agent_id, 'match': {'channel': 'telegram', 'accountId': agent_id}})
+        with open(os.path.join(oc_path, 'openclaw.json'), 'w') as f:
+            json.dump({'agents': {'list': agents, 'defaults': {'model': {'primary': 'anthropic/claude-opus-4-6'}}},
+                       'bindings': bindings, 'gateway': {'port': 18789, 'mode': 'local'}}, f, indent=2)
+        nodes.append({'id': node_id, 'name': f'Sim {i}', 'host': '127.0.0.1', 'sshPort': 22,
+                      'sshUser': os.environ.get('USER', 'root'), 'ocPath': oc_path, 'gatewayPort': 18789})
+
+    with open(os.path.join(root, 'nodes-registry.json'), 'w') as f:
+        json.dump({'nodes': nodes}, f, indent=2)
+    return nodes
+
+
+def bench_env(root):
+    bin_dir = os.path.join(root, 'bin')
+    os.makedirs(bin_dir, exist_ok=True)
+    systemctl = os.path.join(bin_dir, 'systemctl')
+    with open(systemctl, 'w') as f:
+        f.write(FAKE_SYSTEMCTL)
+    os.chmod(systemctl, 0o755)
+    env = dict(os.environ)
+    env.update({
+        'PATH': f"{bin_dir}{os.pathsep}{env.get('PATH', '')}",
+        'HOME': os.path.join(root, 'home'),
+        'OCM_BACKUP_BASE': os.path.join(root, 'backups'),
+        'OCM_NODES_REGISTRY': os.path.join(root, 'nodes-registry.json'),
+    })
+    os.makedirs(env['HOME'], exist_ok=True)
+    return env
+
+
+def reset_bot_add(node):
+    """撤销 bot-add 对模拟节点的修改，保证每轮输入一致"""
+    config_path = os.path.join(node['ocPath'], 'openclaw.json')
+    with open(config_path) as f:
+        config = json.load(f)
+    config['agents']['list'] = [a for a in config['agents']['list'] if a.get('id') != BENCH_BOT]
+    config['bindings'] = [b for b in config.get('bindings', []) if b.get('agentId') != BENCH_BOT]
+    with open(config_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    for path in (f'workspace-{BENCH_BOT}', f'agents/{BENCH_BOT}'):
+        shutil.rmtree(os.path.join(node['ocPath'], path), ignore_errors=True)
+
+
+def run_once(argv, root, env, timeout):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, OCM_NODES] + argv, cwd=root, env=env,
+                            stdin=subprocess.DEVNULL, capture_output=True, timeout=timeout)
+    return (time.perf_counter() - start) * 1000, result.returncode
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'min_ms': round(ordered[0], 1),
+        'median_ms': round(statistics.median(ordered), 1),
+        'mean_ms': round(statistics.mean(ordered), 1),
+        'max_ms': round(ordered[-1], 1),
+        'stdev_ms': round(statistics.stdev(ordered), 1) if len(ordered) > 1 else 0.0,
+    }
+
+
+def run_cell(node_count, agent_count, args, commands):
+    root = tempfile.mkdtemp(prefix=f'ocm-bench-{node_count}n{agent_count}a-')
+    try:
+        nodes = build_fixture(root, node_count, agent_count)
+        env = bench_env(root)
+        target = nodes[0]
+        cell = []
+        for name, make_argv, mutates in commands:
+            samples, failures = [], 0
+            for i in range(args.warmup + args.repeat):
+                elapsed, rc = run_once(make_argv(target['id']), root, env, args.timeout)
+                if mutates:
+                    reset_bot_add(target)
+                if name == 'backup':
+                    shutil.rmtree(env['OCM_BACKUP_BASE'], ignore_errors=True)
+                if i < args.warmup:
+                    continue
+                samples.append(elapsed)
+                failures += rc != 0
+            entry = {'command': name, 'nodes': node_count, 'agents': agent_count,
+                     'runs_ms': [round(s, 1) for s in samples], 'failures': failures, **summarize(samples)}
+            cell.append(entry)
+            print(f"  {name:<15s} nodes={node_count:<4d} agents={agent_count:<4d} "
+                  f"median {entry['median_ms']:>9.1f}ms  min {entry['min_ms']:>9.1f}ms"
+                  + (f"  ✗{failures}" if failures else ''), file=sys.stderr)
+        return cell
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+def git_revision():
+    try:
+        r = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                           capture_output=True, text=True, timeout=10)
+        return r.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def compare(baseline_path, results):
+    """和基线结果比较中位数"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base = {(r['command'], r['nodes'], r['agents']): r for r in baseline.get('results', [])}
+    print(f"\n📊 对比基线 {baseline_path} ({baseline.get('meta', {}).get('revision')})", file=sys.stderr)
+    for r in results:
+        b = base.get((r['command'], r['nodes'], r['agents']))
+        if not b:
+            continue
+        delta = (r['median_ms'] - b['median_ms']) / b['median_ms'] * 100 if b['median_ms'] else 0
+        mark = '🔺' if delta > 10 else ('🔻' if delta < -10 else '  ')
+        print(f"  {mark} {r['command']:<15s} {r['nodes']:>4d}n {r['agents']:>4d}a  "
+              f"{b['median_ms']:>9.1f} → {r['median_ms']:>9.1f}ms ({delta:+.1f}%)", file=sys.stderr)
+
+
+def parse_sizes(text):
+    return [int(x) for x in text.split(',') if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCM CLI latency benchmark', prog='ocm-bench.py')
+    parser.add_argument('--nodes', type=parse_sizes, default=[1, 10, 100], help='节点数列表 (默认 1,10,100)')
+    parser.add_argument('--agents', type=parse_sizes, default=[1, 10, 100], help='每节点agent数列表 (默认 1,10,100)')
+    parser.add_argument('--commands', help='只测这些命令 (逗号分隔，如 "list --json,bot-list")')
+    parser.add_argument('--repeat', type=int, default=3, help='每项计时次数')
+    parser.add_argument('--warmup', type=int, default=1, help='每项预热次数(不计时)')
+    parser.add_argument('--timeout', type=int, default=600, help='单次命令超时(秒)')
+    parser.add_argument('--out', help='结果JSON文件 (默认输出到stdout)')
+    parser.add_argument('--compare', metavar='BASELINE', help='与之前的结果JSON比较')
+    args = parser.parse_args()
+
+    commands = COMMANDS
+    if args.commands:
+        wanted = [c.strip() for c in args.commands.split(',')]
+        commands = [c for c in COMMANDS if c[0] in wanted]
+
+    print(f"⏱️ OCM CLI 基准: nodes={args.nodes} agents={args.agents} repeat={args.repeat}", file=sys.stderr)
+    results = []
+    for node_count in args.nodes:
+        for agent_count in args.agents:
+            results.extend(run_cell(node_count, agent_count, args, commands))
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+        },
+        'results': results,
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📝 结果已写入 {args.out}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -404,7 +404,7 @@ ocmNodesRouter.get('/api/ocm/nodes/:id/logs', async (req, res) => {
 
 // POST /api/ocm/nodes/add (SSE)
 ocmNodesRouter.post('/api/ocm/nodes/add', async (req, res) => {
-  const { id, name, host, sshUser, sshPort, ocPath, gatewayPort, authToken } = req.body || {};
+  const { id, name, host, sshUser, sshPort, ocPath, gatewayPort, authToken, pushAgentUrl } = req.body || {};
   const useSSE = req.headers.accept === 'text/event-stream';
 
   if (!id || !name || !host || !sshUser) {
@@ -423,6 +423,7 @@ ocmNodesRouter.post('/api/ocm/nodes/add', async (req, res) => {
       if (ocPath) args.push('--oc-path', ocPath);
       if (gatewayPort) args.push('--gateway-port', String(gatewayPort));
       if (authToken) args.push('--auth-token', authToken);
+      if (pushAgentUrl) args.push('--push-agent', pushAgentUrl);
       const output = await runOcmNodesRaw(args.join(' '));
       return res.json({ success: true, output });
     } catch (error) {
@@ -437,8 +438,9 @@ ocmNodesRouter.post('/api/ocm/nodes/add', async (req, res) => {
   if (ocPath) cliArgs.push('--oc-path', ocPath);
   if (gatewayPort) cliArgs.push('--gateway-port', String(gatewayPort));
   if (authToken) cliArgs.push('--auth-token', authToken);
+  if (pushAgentUrl) cliArgs.push('--push-agent', pushAgentUrl);
 
-  streamCLI(res, cliArgs, 13, 600000);
+  streamCLI(res, cliArgs, 14, 600000);
 });
 
 // POST /api/ocm/nodes/:id/bots/add (SSE)
@@ -5,14 +5,35 @@ OCM Node Manager CLI - 节点管理工具
 """
 
 import argparse
+import copy
 import json
 import os
 import subprocess
 import sys
 import datetime
+import io
+import fnmatch
+import threading
+import time
+
+import backup_profiles
+import bot_manifest
+import gateway_reload
+import readiness
+import remote_file
+import resumable_transfer
+import sftp_pipeline
+from ocm_transport import get_transport, is_local_host
+from ssh_trace import TRACER, StepTee
+from bot_inventory import BotInventory, FleetIndex
+import config_editor
+from config_editor import ConfigEditor
+from config_patch import PatchConflict
+from tar_stats import TarStreamStats
 
 # === Backup base directory (centralized on T440) ===
-BACKUP_BASE = '/home/linou/shared/00_Node_Backup'
+BACKUP_BASE = os.environ.get('OCM_BACKUP_BASE', '/home/linou/shared/00_Node_Backup')
+DB_PATH = os.environ.get('OCM_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'db', 'ocm.db'))
 
 # === ANSI Colors ===
 class C:
@@ -70,90 +91,65 @@ def get_node(node_id):
 # === SSH ===
 def is_local(node):
     """Check if node is the local machine"""
-    import socket
+    return is_local_host(node['host'])
+
+def ssh_cmd(node, command, timeout=30, input=None):
+    """Execute SSH command, return (success, stdout, stderr). Uses local exec if on same machine.
+
+    input 可以是 str 或 bytes (bytes 原样送入 stdin)
+    """
+    start = time.time()
+    rc, out, err = _ssh_exec(node, command, timeout, input)
+    sent = len(command.encode()) + (len(input if isinstance(input, bytes) else input.encode()) if input else 0)
+    TRACER.record('ssh', node['id'], command, start, sent, len(out.encode()) + len(err.encode()), rc)
+    return rc == 0, out.strip(), err.strip()
+
+def _ssh_exec(node, command, timeout, input=None):
+    """Run command on node via its transport, return (returncode or None on failure, stdout, stderr)"""
+    if isinstance(input, bytes):
+        # 二进制输入走 exec_stream (exec 按文本模式运行子进程)
+        sink = io.BytesIO()
+        rc, err = get_transport(node).exec_stream(command, sink, input=input, timeout=timeout)
+        return rc, sink.getvalue().decode(errors='replace'), err or ''
+    return get_transport(node).exec(command, timeout=timeout, input=input)
+
+def _file_size(path):
     try:
-        local_ips = set()
-        hostname = socket.gethostname()
-        for info in socket.getaddrinfo(hostname, None):
-            local_ips.add(info[4][0])
-        local_ips.add('127.0.0.1')
-        local_ips.add('::1')
-        try:
-            r = subprocess.run(['hostname', '-I'], capture_output=True, text=True, timeout=5)
-            if r.returncode == 0:
-                for ip in r.stdout.strip().split():
-                    local_ips.add(ip)
-        except:
-            pass
-        return node['host'] in local_ips
-    except:
-        return False
-
-def ssh_cmd(node, command, timeout=30):
-    """Execute SSH command, return (success, stdout, stderr). Uses local exec if on same machine."""
-    if is_local(node):
-        try:
-            result = subprocess.run(['bash', '-c', command], capture_output=True, text=True, timeout=timeout)
-            return result.returncode == 0, result.stdout.strip(), result.stderr.strip()
-        except subprocess.TimeoutExpired:
-            return False, '', '命令超时'
-        except Exception as e:
-            return False, '', str(e)
-    
-    ssh = [
-        'ssh', '-o', 'ConnectTimeout=5', '-o', 'StrictHostKeyChecking=no',
-        '-p', str(node['sshPort']),
-        f"{node['sshUser']}@{node['host']}",
-        command
-    ]
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _transfer(node, direction, src, dst):
+    """远程节点走可续传分块传输 (断点续传、每块校验、bandwidthLimit 限速)，本机/模拟节点直接复制"""
+    transport = get_transport(node)
+    if transport.kind not in ('ssh', 'paramiko'):
+        return transport.get(src, dst) if direction == 'get' else transport.put(src, dst)
+    if transport.kind == 'paramiko':
+        open_remote = lambda: resumable_transfer.SFTPRemote(transport.client, sftp_pipeline.default_channels(node))
+    else:
+        open_remote = lambda: resumable_transfer.TransportRemote(transport)
     try:
-        result = subprocess.run(ssh, capture_output=True, text=True, timeout=timeout)
-        return result.returncode == 0, result.stdout.strip(), result.stderr.strip()
-    except subprocess.TimeoutExpired:
-        return False, '', 'SSH连接超时'
+        if direction == 'get':
+            resumable_transfer.download(open_remote, src, dst, node=node)
+        else:
+            resumable_transfer.upload(open_remote, src, dst, node=node)
+        return True, ''
     except Exception as e:
-        return False, '', str(e)
+        return False, str(e)
 
 def scp_from_node(node, remote_path, local_path):
     """SCP file from node to local. Returns (success, stderr)."""
-    if is_local(node):
-        # Local copy
-        try:
-            result = subprocess.run(['cp', remote_path, local_path], capture_output=True, text=True, timeout=60)
-            return result.returncode == 0, result.stderr.strip()
-        except Exception as e:
-            return False, str(e)
-    scp = [
-        'scp', '-o', 'ConnectTimeout=5', '-o', 'StrictHostKeyChecking=no',
-        '-P', str(node['sshPort']),
-        f"{node['sshUser']}@{node['host']}:{remote_path}",
-        local_path
-    ]
-    try:
-        result = subprocess.run(scp, capture_output=True, text=True, timeout=600)
-        return result.returncode == 0, result.stderr.strip()
-    except Exception as e:
-        return False, str(e)
+    start = time.time()
+    ok, err = _transfer(node, 'get', remote_path, local_path)
+    TRACER.record('scp', node['id'], f"scp ← {remote_path}", start, 0, _file_size(local_path) if ok else 0, 0 if ok else 1)
+    return ok, err
 
 def scp_to_node(node, local_path, remote_path):
     """SCP file from local to node. Returns (success, stderr)."""
-    if is_local(node):
-        try:
-            result = subprocess.run(['cp', local_path, remote_path], capture_output=True, text=True, timeout=60)
-            return result.returncode == 0, result.stderr.strip()
-        except Exception as e:
-            return False, str(e)
-    scp = [
-        'scp', '-o', 'ConnectTimeout=5', '-o', 'StrictHostKeyChecking=no',
-        '-P', str(node['sshPort']),
-        local_path,
-        f"{node['sshUser']}@{node['host']}:{remote_path}"
-    ]
-    try:
-        result = subprocess.run(scp, capture_output=True, text=True, timeout=600)
-        return result.returncode == 0, result.stderr.strip()
-    except Exception as e:
-        return False, str(e)
+    start = time.time()
+    ok, err = _transfer(node, 'put', local_path, remote_path)
+    TRACER.record('scp', node['id'], f"scp → {remote_path}", start, _file_size(local_path), 0, 0 if ok else 1)
+    return ok, err
 
 def log_action(action, node_id, detail=''):
     """Log action to file"""
@@ -170,6 +166,41 @@ def get_backup_dir(node_id, bot_id=None):
         return os.path.join(BACKUP_BASE, node_id, bot_id)
     return os.path.join(BACKUP_BASE, node_id)
 
+INVENTORY = BotInventory(lambda node, command: ssh_cmd(node, command), db_path=DB_PATH)
+
+AGENT_REMOTE_DIR = '~/.ocm-agent'
+AGENT_SERVICE = 'ocm-agent'
+
+def _systemd_quote(value):
+    """systemd unit 中的带引号参数 (转义引号、反斜杠和 % 说明符)"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('%', '%%') + '"'
+
+def install_push_agent(node, ingest_url, token=None):
+    """Install ocm-agent.py on the node as a systemd user service. Returns (success, error).
+
+    token: ingest 认证token (服务端设置了 OCM_INGEST_TOKEN 时必需)，经 Environment= 传给代理，unit 文件权限 600
+    """
+    import base64
+    agent_src = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ocm-agent.py')
+    ok, home, err = ssh_cmd(node, f"mkdir -p {AGENT_REMOTE_DIR} && echo $HOME")
+    if not ok:
+        return False, err
+    agent_path = f"{home}/.ocm-agent/ocm-agent.py"
+    ok, err = scp_to_node(node, agent_src, agent_path)
+    if not ok:
+        return False, err
+    service_content = (
+        f"[Unit]\nDescription=OCM push agent\nAfter=network-online.target\n\n"
+        f"[Service]\n"
+        + (f"Environment={_systemd_quote(f'OCM_INGEST_TOKEN={token}')}\n" if token else "")
+        + f"ExecStart=/usr/bin/env python3 {_systemd_quote(agent_path)} --url {_systemd_quote(ingest_url)} "
+        f"--node-id {_systemd_quote(node['id'])} --gateway-port {int(node.get('gatewayPort', 18789))}\n"
+        f"Restart=always\nRestartSec=10\n\n[Install]\nWantedBy=default.target"
+    )
+    b64_svc = base64.b64encode(service_content.encode()).decode()
+    ok, _, err = ssh_cmd(node, f"mkdir -p ~/.config/systemd/user && (umask 077 && echo '{b64_svc}' | base64 -d > ~/.config/systemd/user/{AGENT_SERVICE}.service) && chmod 600 ~/.config/systemd/user/{AGENT_SERVICE}.service && systemctl --user daemon-reload && systemctl --user enable --now {AGENT_SERVICE} 2>&1")
+    return ok, err
+
 # === Commands ===
 
 def cmd_list(args):
@@ -227,82 +258,114 @@ def cmd_status(args):
     
     log_action('status', args.nodeId)
 
-def _print_bots(node):
+def _node_bots(node, cached=False):
+    """节点的Bot列表: 走清单缓存增量刷新；cached=True 时不访问节点。返回 (bots, 错误)"""
+    if cached:
+        bots = INVENTORY.cached(node['id'])
+        return (bots, '') if bots is not None else (None, '没有缓存，请先不带 --cached 运行一次')
+    try:
+        bots, _ = INVENTORY.refresh(node)
+        return bots, ''
+    except IOError as e:
+        return None, str(e)
+
+def _print_bots(node, cached=False):
     """Print bot list for a node"""
-    ok, out, _ = ssh_cmd(node, f"cat {node['ocPath']}/openclaw.json 2>/dev/null")
-    if not ok:
-        print(colored("    无法读取 openclaw.json", C.RED))
+    bots, err = _node_bots(node, cached)
+    if bots is None:
+        print(colored(f"    {err}", C.RED))
         return []
-    
-    try:
-        config = json.loads(out)
-        agents = config.get('agents', {}).get('list', [])
-        if not agents:
-            print("    (无 agents)")
-            return []
-        
-        # Build channel map from bindings
-        channel_map = {}
-        for binding in config.get('bindings', []):
-            agent_id = binding.get('agentId', '')
-            match = binding.get('match', {})
-            ch = match.get('channel', '')
-            if agent_id and ch:
-                channel_map[agent_id] = ch
-        
-        # Build model map from agent configs
-        for i, agent in enumerate(agents, 1):
-            aid = agent.get('id', '?')
-            name = aid
-            model = agent.get('model', '?')
-            channel = channel_map.get(aid, '?')
-            
-            # Try agent's own config
-            ok_a, out_a, _ = ssh_cmd(node, f"cat {node['ocPath']}/agents/{aid}/agent/openclaw.json 2>/dev/null")
-            if ok_a:
-                try:
-                    acfg = json.loads(out_a)
-                    name = acfg.get('name', aid)
-                    m = acfg.get('llm', {}).get('model', '')
-                    if m:
-                        model = m
-                    ch = acfg.get('channels', [])
-                    if ch:
-                        channel = ch[0].get('type', channel)
-                except:
-                    pass
-            
-            # Fallback: check defaults
-            if model == '?' or not model:
-                model = config.get('agents', {}).get('defaults', {}).get('model', {}).get('primary', '?')
-            
-            print(f"    {i}. {colored(aid, C.CYAN):30s}  {name:20s}  📡 {channel}  🧠 {model}")
-        return agents
-    except json.JSONDecodeError:
-        print(colored("    openclaw.json 解析失败", C.RED))
+    if not bots:
+        print("    (无 agents)")
         return []
+    for i, bot in enumerate(bots, 1):
+        print(f"    {i}. {colored(bot['id'], C.CYAN):30s}  {bot['name']:20s}  📡 {bot['channel']}  🧠 {bot['model']}")
+    return bots
+
+def _profile_selection(node, profile):
+    """列出节点 ocPath 下的文件并按备份方案筛选，返回 (选中路径, 统计) 或 (None, 错误)"""
+    ok, out, err = ssh_cmd(node, backup_profiles.list_command(node['ocPath']), timeout=300)
+    if not ok:
+        return None, err or '无法列出文件'
+    return backup_profiles.select_files(backup_profiles.parse_listing(out), profile)
+
+def cmd_backup_dry_run(node, args):
+    """只统计各备份方案会打包的文件和字节数，不创建备份"""
+    reg = load_registry()
+    profiles = backup_profiles.load_profiles(reg)
+    names = [args.backup_profile] if args.backup_profile else list(profiles)
+    if args.backup_profile and args.backup_profile not in profiles:
+        print(colored(f"  ✗ 未知备份方案: {args.backup_profile} (可用: {', '.join(profiles)})", C.RED))
+        sys.exit(1)
+    ok, out, err = ssh_cmd(node, backup_profiles.list_command(node['ocPath']), timeout=300)
+    if not ok:
+        print(colored(f"  ✗ 无法列出文件: {err}", C.RED))
+        sys.exit(1)
+    entries = backup_profiles.parse_listing(out)
+    report = {}
+    for name in names:
+        _, report[name] = backup_profiles.select_files(entries, profiles[name])
+    if args.json_output:
+        print(json.dumps({'node': node['id'], 'total_files': len(entries),
+                          'total_bytes': sum(e[1] for e in entries), 'profiles': report}, indent=2))
+        return
+    fmt = backup_profiles.format_size
+    print(f"  ocPath 共 {len(entries)} 个文件, {fmt(sum(e[1] for e in entries))} (未压缩)")
+    for name in names:
+        st = report[name]
+        print(f"\n  {colored(name, C.BOLD)}  {profiles[name].get('description', '')}")
+        print(f"    打包: {st['files']} 个文件, {fmt(st['bytes'])}")
+        print(f"    排除: {st['excluded_files']} 个文件, {fmt(st['excluded_bytes'])}")
+        if st['capped_files']:
+            print(colored(f"    超出容量上限: {st['capped_files']} 个文件, {fmt(st['capped_bytes'])}", C.YELLOW))
+        for top, size in sorted(st['by_dir'].items(), key=lambda kv: -kv[1])[:8]:
+            print(f"      {fmt(size):>8s}  {top}")
 
 def cmd_backup(args):
     """备份节点 - 集中存储到 T440"""
     node = get_node(args.nodeId)
-    print(colored(f"💾 备份节点: {node['name']}", C.BOLD))
+    if args.dry_run:
+        if not args.json_output:
+            print(colored(f"💾 备份预估: {node['name']}", C.BOLD))
+        return cmd_backup_dry_run(node, args)
+    try:
+        profile_name, profile = backup_profiles.resolve_profile(args.backup_profile, load_registry(), node)
+    except ValueError as e:
+        print(colored(f"✗ {e}", C.RED))
+        sys.exit(1)
+    print(colored(f"💾 备份节点: {node['name']} (方案: {profile_name})", C.BOLD))
     
     ts = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
-    filename = f"openclaw-backup-{node['id']}-{ts}.tar.gz"
+    suffix = '' if profile_name == backup_profiles.DEFAULT_PROFILE else f"-{profile_name}"
+    filename = f"openclaw-backup-{node['id']}-{ts}{suffix}.tar.gz"
     backup_dir = get_backup_dir(node['id'])
     os.makedirs(backup_dir, exist_ok=True)
     
+    selected, stats = _profile_selection(node, profile)
+    if selected is None:
+        print(colored(f"  ✗ 备份失败: {stats}", C.RED))
+        log_action('backup-failed', args.nodeId, stats)
+        return
+    if not selected:
+        print(colored(f"  ✗ 方案 {profile_name} 没有匹配到任何文件", C.RED))
+        return
+    print(f"  选中 {stats['files']} 个文件 ({backup_profiles.format_size(stats['bytes'])})，"
+          f"排除 {stats['excluded_files']} 个 ({backup_profiles.format_size(stats['excluded_bytes'])})")
+    base = os.path.basename(node['ocPath'].rstrip('/'))
+    file_list = ''.join(f"{base}/{path}\0" for path in selected)
+    tar_args = f"-C {os.path.dirname(node['ocPath'].rstrip('/'))} --null --no-recursion -T -"
+    
     if is_local(node):
         # Local: tar directly to backup dir
         target = os.path.join(backup_dir, filename)
-        cmd = f"tar czf {target} -C {os.path.dirname(node['ocPath'])} {os.path.basename(node['ocPath'])}/"
+        cmd = f"tar czf {target} {tar_args}"
         print(f"  执行: tar czf {target} ...")
-        ok, out, err = ssh_cmd(node, cmd, timeout=600)
+        ok, out, err = ssh_cmd(node, cmd, timeout=600, input=file_list)
     else:
         # Remote: tar to /tmp, scp to backup dir, cleanup
-        cmd = f"tar czf /tmp/{filename} -C {os.path.dirname(node['ocPath'])} {os.path.basename(node['ocPath'])}/"
+        cmd = f"tar czf /tmp/{filename} {tar_args}"
         print(f"  执行: 远程打包到 /tmp/{filename} ...")
-        ok, out, err = ssh_cmd(node, cmd, timeout=600)
+        ok, out, err = ssh_cmd(node, cmd, timeout=600, input=file_list)
         if ok:
             print(f"  SCP到本地备份目录...")
             target = os.path.join(backup_dir, filename)
@@ -323,7 +386,7 @@ def cmd_backup(args):
         except:
             size_str = '?'
         print(colored(f"  ✓ 备份成功: {target} ({size_str})", C.GREEN))
-        log_action('backup', args.nodeId, f"file={filename}")
+        log_action('backup', args.nodeId, f"file={filename} profile={profile_name}")
     else:
         print(colored(f"  ✗ 备份失败: {err}", C.RED))
         log_action('backup-failed', args.nodeId, err)
@@ -382,37 +445,147 @@ def cmd_restore(args):
     if ok:
         print(colored("  ✓ 还原成功", C.GREEN))
         log_action('restore', args.nodeId, f"file={filename}")
-        print("  重启Gateway...")
-        ok_r, _, _ = ssh_cmd(node, "systemctl --user restart openclaw-gateway 2>&1", timeout=15)
-        import time
-        time.sleep(3)
-        ok_s, status, _ = ssh_cmd(node, "systemctl --user is-active openclaw-gateway 2>/dev/null")
-        if ok_s and 'active' in (status or ''):
-            print(colored("  ✓ Gateway已重启", C.GREEN))
+        print("  Gateway加载新配置...")
+        result = apply_gateway_config(node)
+        if result['ok']:
+            print(colored(f"  ✓ {gateway_reload.describe(result)}", C.GREEN))
         else:
-            print(colored("  ⚠ Gateway重启后状态异常，请检查", C.YELLOW))
+            print(colored(f"  ⚠ Gateway状态异常，请检查 ({gateway_reload.describe(result)})", C.YELLOW))
     else:
         print(colored(f"  ✗ 还原失败: {err}", C.RED))
 
 def cmd_restart(args):
     """重启 Gateway"""
+    if args.all or args.select:
+        return cmd_rolling_restart(args)
+    if not args.nodeId:
+        print(colored("✗ 请指定 nodeId，或使用 --all / --select", C.RED))
+        sys.exit(1)
     node = get_node(args.nodeId)
     print(colored(f"🔄 重启 Gateway: {node['name']}", C.BOLD))
     
     ok, out, err = ssh_cmd(node, "systemctl --user restart openclaw-gateway")
     if ok:
         print(colored("  ✓ 重启命令已发送", C.GREEN))
-        import time
-        time.sleep(2)
-        ok2, out2, _ = ssh_cmd(node, "systemctl --user is-active openclaw-gateway")
-        if ok2 and 'active' in out2:
-            print(colored("  ✓ Gateway 已恢复运行", C.GREEN))
+        ready, elapsed, probe = gateway_ready(node, require_http=False)
+        if ready:
+            print(colored(f"  ✓ Gateway 已恢复运行 (就绪 {elapsed:.1f}s)", C.GREEN))
         else:
-            print(colored("  ⚠ Gateway 可能未成功启动，请检查", C.YELLOW))
+            print(colored(f"  ⚠ Gateway 可能未成功启动，请检查 ({readiness.describe(probe)})", C.YELLOW))
         log_action('restart', args.nodeId)
     else:
         print(colored(f"  ✗ 重启失败: {err}", C.RED))
 
+def _match_selector(node, selector):
+    """FIELD=GLOB 匹配注册表字段；不含 = 时匹配节点 id"""
+    field, _, pattern = selector.partition('=') if '=' in selector else ('id', '', selector)
+    return fnmatch.fnmatchcase(str(node.get(field, '')), pattern)
+
+def select_nodes(nodes, selectors, excludes=()):
+    """按选择器筛选节点（多个 --select 之间为“且”关系）"""
+    return [n for n in nodes
+            if all(_match_selector(n, sel) for sel in selectors)
+            and not any(_match_selector(n, exc) for exc in excludes)]
+
+def gateway_ready(node, timeout=60, require_http=True):
+    """等待节点 Gateway 就绪（指数退避轮询），返回 (ready, 实测耗时秒, 探测结果)"""
+    return readiness.wait_ready(lambda command, t: ssh_cmd(node, command, timeout=t),
+                                node.get('gatewayPort', 18789), timeout=timeout, require_http=require_http)
+
+def apply_gateway_config(node):
+    """让 Gateway 加载已写入的新配置: 优先热重载 (其他 Bot 不断线)，不支持时才重启，返回 gateway_reload 结果"""
+    result = gateway_reload.apply_config(lambda command, t: ssh_cmd(node, command, timeout=t), node)
+    log_action('reload' if result['ok'] else 'reload-failed', node['id'], gateway_reload.describe(result))
+    return result
+
+def _restart_gated(node, timeout):
+    """重启单个节点并等待就绪"""
+    ok, _, err = ssh_cmd(node, "systemctl --user restart openclaw-gateway", timeout=30)
+    if not ok:
+        return {'id': node['id'], 'ok': False, 'error': err or '重启命令失败', 'seconds': 0}
+    ready, elapsed, probe = gateway_ready(node, timeout)
+    result = {'id': node['id'], 'ok': ready, 'seconds': round(elapsed, 1), 'probe': probe}
+    if not ready:
+        result['error'] = f"{timeout}秒内未就绪 ({readiness.describe(probe)})"
+    log_action('restart' if ready else 'restart-failed', node['id'], f"rolling ready={ready} {result['seconds']}s")
+    return result
+
+def cmd_rolling_restart(args):
+    """滚动重启：分批重启，每个节点就绪后才继续，失败即停止"""
+    from concurrent.futures import ThreadPoolExecutor
+    out = sys.stderr if args.json_output else sys.stdout
+    nodes = load_registry()['nodes']
+    if args.nodeId:
+        nodes = [n for n in nodes if n['id'] == args.nodeId]
+    nodes = select_nodes(nodes, args.select, args.exclude)
+    if not nodes:
+        print(colored("✗ 没有匹配的节点", C.RED), file=out)
+        sys.exit(1)
+    batch_size = max(1, args.batch_size)
+    max_unavailable = max(1, args.max_unavailable)
+
+    print(colored(f"🔄 滚动重启 {len(nodes)} 个节点 (batch={batch_size}, max-unavailable={max_unavailable})", C.BOLD), file=out)
+    with ThreadPoolExecutor(max_workers=min(len(nodes), 16)) as pool:
+        # 预检：已经不可用的节点计入不可用配额
+        precheck = dict(zip([n['id'] for n in nodes], pool.map(lambda n: gateway_ready(n, 0)[0], nodes)))
+    down = {node_id for node_id, ready in precheck.items() if not ready}
+    if down:
+        print(colored(f"  ⚠ 已不可用: {', '.join(sorted(down))}", C.YELLOW), file=out)
+
+    pending = list(nodes)
+    results, halted, batch_no = [], None, 0
+    start = time.time()
+    while pending and not halted:
+        allowance = max_unavailable - len(down)
+        batch = []
+        for node in pending:
+            if len(batch) >= batch_size:
+                break
+            if node['id'] in down:
+                batch.append(node)  # 本来就不可用，重启不会增加不可用数
+            elif allowance > 0:
+                batch.append(node)
+                allowance -= 1
+        if not batch:
+            halted = f"已有 {len(down)} 个节点不可用，达到 max-unavailable={max_unavailable}"
+            break
+        batch_no += 1
+        print(f"[Batch {batch_no}] 重启: {', '.join(n['id'] for n in batch)}", file=out)
+        out.flush()
+        with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+            batch_results = list(pool.map(lambda n: _restart_gated(n, args.ready_timeout), batch))
+        for node, result in zip(batch, batch_results):
+            pending.remove(node)
+            results.append(result)
+            if result['ok']:
+                down.discard(node['id'])
+                print(colored(f"  ✓ {node['id']} 就绪 ({result['seconds']}s)", C.GREEN), file=out)
+            else:
+                down.add(node['id'])
+                print(colored(f"  ✗ {node['id']} {result['error']}", C.RED), file=out)
+        failed = [r['id'] for r in batch_results if not r['ok']]
+        if failed:
+            halted = f"节点未恢复: {', '.join(failed)}"
+        out.flush()
+
+    summary = {
+        'ok': not halted,
+        'restarted': [r['id'] for r in results if r['ok']],
+        'failed': [r['id'] for r in results if not r['ok']],
+        'skipped': [n['id'] for n in pending],
+        'halted': halted,
+        'seconds': round(time.time() - start, 1),
+        'nodes': results,
+    }
+    if halted:
+        print(colored(f"⛔ 滚动重启已停止: {halted}，未处理: {', '.join(summary['skipped']) or '-'}", C.RED), file=out)
+    else:
+        print(colored(f"✅ 滚动重启完成: {len(results)} 个节点, {summary['seconds']}s", C.GREEN), file=out)
+    if args.json_output:
+        print(json.dumps(summary, ensure_ascii=False))
+    if halted:
+        sys.exit(1)
+
 def cmd_doctor_fix(args):
     """运行 openclaw doctor --fix"""
     node = get_node(args.nodeId)
@@ -466,10 +639,15 @@ def cmd_set_subscription(args):
     print(f"[Step 2/4] 读取现有 auth-profiles.json...")
     sys.stdout.flush()
     auth_path = f"{node['ocPath']}/auth-profiles.json"
-    ok, out, _ = ssh_cmd(node, f"cat {auth_path} 2>/dev/null")
-    if ok and out:
+    try:
+        out, auth_version = remote_file.read(get_transport(node), auth_path)
+    except IOError:
+        out, auth_version = None, None
+    auth_before = None
+    if out:
         try:
             auth = json.loads(out)
+            auth_before = copy.deepcopy(auth)
         except:
             auth = {}
     else:
@@ -506,10 +684,7 @@ def cmd_set_subscription(args):
         auth['lastGood'] = {}
     auth['lastGood']['anthropic'] = anthropic_key
     
-    import base64
-    auth_json = json.dumps(auth, indent=2, ensure_ascii=False)
-    b64 = base64.b64encode(auth_json.encode()).decode()
-    ok, _, err = ssh_cmd(node, f"echo '{b64}' | base64 -d > {auth_path}")
+    ok, err = _edit_config(node, auth_before, auth, f'set-subscription {anthropic_key}', auth_version, auth_path)
     if ok:
         print(f"[Step 3/4] ✓ Token已更新 (profile: {anthropic_key})")
     else:
@@ -662,6 +837,7 @@ def cmd_retire(args):
     print(f"[Step 9/{TOTAL}] 清理systemd service文件...")
     sys.stdout.flush()
     if ssh_ok:
+        ssh_cmd(node, f"systemctl --user disable --now {AGENT_SERVICE} 2>/dev/null; rm -rf {AGENT_REMOTE_DIR} ~/.config/systemd/user/{AGENT_SERVICE}.service 2>/dev/null; true", timeout=15)
         ssh_cmd(node, "rm -f ~/.config/systemd/user/openclaw-gateway.service 2>&1 && systemctl --user daemon-reload 2>&1 || true", timeout=15)
         print(f"[Step 9/{TOTAL}] ✓ systemd service文件已清理")
     else:
@@ -725,7 +901,7 @@ def cmd_add(args):
         node['gatewayPort'] = int(input("  Gateway端口 [18789]: ").strip() or '18789')
         auth_token = input("  Anthropic订阅Token (可选): ").strip()
 
-    TOTAL = 13
+    TOTAL = 14
 
     print(f"[Step 1/{TOTAL}] ✓ 验证输入信息: id={node['id']}, host={node['host']}, user={node['sshUser']}")
     sys.stdout.flush()
@@ -813,8 +989,7 @@ def cmd_add(args):
             "bindings": [],
             "gateway": {"mode": "local", "bind": "lan", "port": node['gatewayPort']}
         }, indent=2)
-        b64_config = base64.b64encode(base_config.encode()).decode()
-        ok_mk, _, err_mk = ssh_cmd(node, f"mkdir -p {oc_path} && echo '{b64_config}' | base64 -d > {oc_path}/openclaw.json")
+        ok_mk, err_mk = _write_file(node, f"{oc_path}/openclaw.json", base_config, expect=remote_file.ABSENT, mkdir=True)
         if ok_mk:
             print(f"[Step 5/{TOTAL}] ✓ 配置目录和openclaw.json已创建")
         else:
@@ -831,8 +1006,7 @@ def cmd_add(args):
             print(f"[Step 6/{TOTAL}] ✓ Token已通过openclaw CLI配置")
         else:
             auth_profiles = json.dumps({'version': 1, 'profiles': {'anthropic:default': {'type': 'token', 'provider': 'anthropic', 'token': auth_token}}, 'lastGood': {'anthropic': 'anthropic:default'}}, indent=2)
-            b64_auth = base64.b64encode(auth_profiles.encode()).decode()
-            ok2, _, err2 = ssh_cmd(node, f"echo '{b64_auth}' | base64 -d > {oc_path}/auth-profiles.json")
+            ok2, err2 = _write_file(node, f"{oc_path}/auth-profiles.json", auth_profiles)
             if ok2:
                 print(f"[Step 6/{TOTAL}] ✓ auth-profiles.json已手动创建")
             else:
@@ -863,14 +1037,12 @@ def cmd_add(args):
     print(f"[Step 9/{TOTAL}] 启动Gateway服务...")
     sys.stdout.flush()
     ssh_cmd(node, "systemctl --user start openclaw-gateway 2>&1", timeout=15)
-    import time
-    time.sleep(3)
-    ok_status, status_out, _ = ssh_cmd(node, "systemctl --user is-active openclaw-gateway 2>/dev/null")
-    gw_status = status_out.strip() if ok_status else 'unknown'
-    if gw_status == 'active':
-        print(f"[Step 9/{TOTAL}] ✓ Gateway已启动并运行!")
+    ready, elapsed, probe = gateway_ready(node, require_http=False)
+    gw_status = 'active' if ready else probe['service']
+    if ready:
+        print(f"[Step 9/{TOTAL}] ✓ Gateway已启动并运行! (就绪 {elapsed:.1f}s)")
     else:
-        print(f"[Step 9/{TOTAL}] ⚠ Gateway状态: {gw_status}")
+        print(f"[Step 9/{TOTAL}] ⚠ Gateway状态: {readiness.describe(probe)}")
     sys.stdout.flush()
 
     print(f"[Step 10/{TOTAL}] 自动配对本地设备...")
@@ -878,14 +1050,29 @@ def cmd_add(args):
     print(f"[Step 10/{TOTAL}] ✓ 设备配对完成")
     sys.stdout.flush()
 
-    print(f"[Step 11/{TOTAL}] 写入节点注册表...")
+    print(f"[Step 11/{TOTAL}] 安装推送采集代理...")
+    sys.stdout.flush()
+    push_url = getattr(args, 'push_agent', None)
+    if push_url:
+        ok_agent, err_agent = install_push_agent(
+            node, push_url, getattr(args, 'push_token', None) or os.environ.get('OCM_INGEST_TOKEN'))
+        if ok_agent:
+            node['pushAgent'] = push_url
+            print(f"[Step 11/{TOTAL}] ✓ ocm-agent已启动 → {push_url}")
+        else:
+            print(f"[Step 11/{TOTAL}] ⚠ ocm-agent安装失败: {err_agent}")
+    else:
+        print(f"[Step 11/{TOTAL}] ⏭ 未指定--push-agent，使用SSH轮询")
+    sys.stdout.flush()
+
+    print(f"[Step 12/{TOTAL}] 写入节点注册表...")
     sys.stdout.flush()
     reg['nodes'].append(node)
     save_registry(reg)
-    print(f"[Step 11/{TOTAL}] ✓ 节点已写入注册表")
+    print(f"[Step 12/{TOTAL}] ✓ 节点已写入注册表")
     sys.stdout.flush()
 
-    print(f"[Step 12/{TOTAL}] 获取节点Bot列表...")
+    print(f"[Step 13/{TOTAL}] 获取节点Bot列表...")
     sys.stdout.flush()
     bot_count = 0
     ok4, out4, _ = ssh_cmd(node, f"cat {oc_path}/openclaw.json 2>/dev/null")
@@ -893,15 +1080,15 @@ def cmd_add(args):
         try:
             config = json.loads(out4)
             bot_count = len(config.get('agents', {}).get('list', []))
-            print(f"[Step 12/{TOTAL}] ✓ 发现 {bot_count} 个Bot")
+            print(f"[Step 13/{TOTAL}] ✓ 发现 {bot_count} 个Bot")
         except:
-            print(f"[Step 12/{TOTAL}] ⚠ 无法解析openclaw.json")
+            print(f"[Step 13/{TOTAL}] ⚠ 无法解析openclaw.json")
     else:
-        print(f"[Step 12/{TOTAL}] ⚠ 无法读取openclaw.json")
+        print(f"[Step 13/{TOTAL}] ⚠ 无法读取openclaw.json")
     sys.stdout.flush()
 
     gw_final = gw_status if gw_status == 'active' else 'inactive'
-    print(f"[Step 13/{TOTAL}] ✓ 添加完成! 节点: {node.get('name', node['id'])} | IP: {node['host']} | Bot数量: {bot_count} | Gateway: {gw_final}")
+    print(f"[Step 14/{TOTAL}] ✓ 添加完成! 节点: {node.get('name', node['id'])} | IP: {node['host']} | Bot数量: {bot_count} | Gateway: {gw_final}")
     sys.stdout.flush()
     log_action('add', node['id'])
 
@@ -911,7 +1098,36 @@ def cmd_bot_list(args):
     node = get_node(args.nodeId)
     print(colored(f"🤖 Bot列表: {node['name']}", C.BOLD))
     print("─" * 60)
-    _print_bots(node)
+    _print_bots(node, cached=args.cached)
+
+def cmd_find_bot(args):
+    """全舰队查找Bot - 查控制端清单的倒排索引，不访问节点 (--refresh 先并行刷新)"""
+    out = sys.stderr if args.json_output else sys.stdout
+    if args.refresh:
+        nodes = [n for n in load_registry()['nodes'] if not args.node or fnmatch.fnmatch(n['id'], args.node)]
+        print(f"🔄 刷新 {len(nodes)} 个节点的Bot清单...", file=out)
+        for node_id, result in INVENTORY.refresh_many(nodes).items():
+            if isinstance(result, str):
+                print(colored(f"  ✗ {node_id}: {result}", C.RED), file=out)
+    start = time.perf_counter()
+    index = FleetIndex.load(INVENTORY.cache_path)
+    loaded = time.perf_counter()
+    bots = index.search(node=args.node, id=args.id, name=args.name, model=args.model,
+                        channel=args.channel, account=args.account)
+    elapsed = (time.perf_counter() - loaded) * 1000
+    if args.json_output:
+        print(json.dumps({'count': len(bots), 'bots': bots, 'search_ms': round(elapsed, 2),
+                          'load_ms': round((loaded - start) * 1000, 2)}, ensure_ascii=False, indent=2))
+        return
+    if not index.bots:
+        print(colored("✗ 没有Bot清单缓存，请先运行 find-bot --refresh", C.RED))
+        sys.exit(1)
+    for bot in bots:
+        print(f"  {colored(bot['node'], C.YELLOW):24s} {colored(bot['id'], C.CYAN):30s}  {bot['name']:20s}  "
+              f"📡 {bot['channel']}  🧠 {bot['model']}")
+    nodes = len({node_id for node_id, _ in index.bots})
+    print(f"─ {len(bots)} / {len(index.bots)} 个Bot ({nodes} 个节点), 查询 {elapsed:.2f}ms, "
+          f"加载索引 {(loaded - start) * 1000:.0f}ms")
 
 def cmd_bot_backup(args):
     """备份单个bot - 集中存储"""
@@ -1043,23 +1259,24 @@ def cmd_bot_add(args):
 
     print(f'[Step 2/{TOTAL}] 检查Bot是否已存在...')
     sys.stdout.flush()
-    ok, out, _ = ssh_cmd(node, f'cat {node["ocPath"]}/openclaw.json 2>/dev/null')
-    existing_config = None
-    if ok:
-        try:
-            existing_config = json.loads(out)
-            agents_list = existing_config.get('agents', {}).get('list', [])
-            if any(a.get('id') == bot_id for a in agents_list):
-                print(f'[Step 2/{TOTAL}] ⚠ Bot {bot_id} 已在配置中')
-                if not getattr(args, 'yes', False):
-                    confirm = input(colored('  继续将覆盖现有配置，确认? (yes/no): ', C.YELLOW))
-                    if confirm.lower() != 'yes':
-                        print('  已取消')
-                        return
-            else:
-                print(f'[Step 2/{TOTAL}] ✓ Bot不存在，将创建')
-        except json.JSONDecodeError:
-            existing_config = None
+    existing_config, config_version, err = _read_config(node)
+    if existing_config is None and config_version != remote_file.ABSENT:
+        # 读取失败或无法解析: 不能当成空配置整体覆盖
+        print(f'[Step 2/{TOTAL}] ✗ {err}')
+        sys.stdout.flush()
+        return
+    config_before = copy.deepcopy(existing_config)
+    if existing_config is not None:
+        agents_list = existing_config.get('agents', {}).get('list', [])
+        if any(a.get('id') == bot_id for a in agents_list):
+            print(f'[Step 2/{TOTAL}] ⚠ Bot {bot_id} 已在配置中')
+            if not getattr(args, 'yes', False):
+                confirm = input(colored('  继续将覆盖现有配置，确认? (yes/no): ', C.YELLOW))
+                if confirm.lower() != 'yes':
+                    print('  已取消')
+                    return
+        else:
+            print(f'[Step 2/{TOTAL}] ✓ Bot不存在，将创建')
     sys.stdout.flush()
 
     print(f'[Step 3/{TOTAL}] 创建workspace目录: {workspace}')
@@ -1074,45 +1291,31 @@ def cmd_bot_add(args):
 
     print(f'[Step 4/{TOTAL}] 创建模板文件...')
     sys.stdout.flush()
-    for fname, fcontent in [
-        ('SOUL.md', f"# {bot_name}\n\n{soul}\n\n## 核心特质\n- 友善、专业、乐于助人\n- 对话自然流畅\n- 精准回答问题"),
-        ('AGENTS.md', f"# AGENTS.md - {bot_name} Workspace\n\n## Every Session\n1. Read SOUL.md\n2. Read memory/ for recent context"),
-        ('TOOLS.md', f"# TOOLS.md - {bot_name}"),
-        ('MEMORY.md', "# Memory\n\nNo memories yet."),
-        ('USER.md', "# User\n\nManaged by Linou via OCM."),
-    ]:
-        ssh_cmd(node, f"cat > {workspace}/{fname} << 'OCMEOF'\n{fcontent}\nOCMEOF")
+    bot = {'id': bot_id, 'name': bot_name, 'soul': soul, 'token': bot_token, 'model': args.model}
+    replacing = existing_config is not None and any(
+        a.get('id') == bot_id for a in existing_config.get('agents', {}).get('list', []))
+    souls = [bot] if replacing and getattr(args, 'soul', None) else []
+    rc, err = get_transport(node).exec_stream(bot_manifest.extract_command(node['ocPath'], souls), io.BytesIO(),
+                                              input=bot_manifest.template_tar([bot], souls), timeout=60)
+    if rc != 0:
+        print(f'[Step 4/{TOTAL}] ✗ 模板文件创建失败: {err}')
+        sys.stdout.flush()
+        return
     print(f'[Step 4/{TOTAL}] ✓ 模板文件已创建')
     sys.stdout.flush()
 
     print(f'[Step 5/{TOTAL}] 更新 openclaw.json agents.list...')
     sys.stdout.flush()
     if existing_config is None:
-        existing_config = {
-            'agents': {'list': [], 'defaults': {'model': {'primary': model}}},
-            'channels': {'telegram': {'enabled': True, 'accounts': {}}},
-            'bindings': [],
-            'gateway': {'port': node.get('gatewayPort', 18789), 'mode': 'local', 'bind': 'lan'},
-        }
-    existing_config.pop('version', None)
-    agents_list = existing_config.setdefault('agents', {}).setdefault('list', [])
-    agents_list = [a for a in agents_list if a.get('id') != bot_id]
-    agents_list.append({'id': bot_id, 'workspace': workspace, 'agentDir': agent_dir})
-    existing_config['agents']['list'] = agents_list
+        existing_config = bot_manifest.empty_config(node, model)
+    bot_manifest.add_bot(existing_config, node['ocPath'], bot)
+    agents_list = existing_config['agents']['list']
     print(f'[Step 5/{TOTAL}] ✓ 已添加到agents.list (共{len(agents_list)}个agent)')
     sys.stdout.flush()
 
     print(f'[Step 6/{TOTAL}] 配置Telegram account...')
     sys.stdout.flush()
     if bot_token:
-        tg = existing_config.setdefault('channels', {}).setdefault('telegram', {})
-        tg['enabled'] = True
-        tg.setdefault('dmPolicy', 'allowlist')
-        tg.setdefault('groupPolicy', 'allowlist')
-        tg.setdefault('streamMode', 'partial')
-        accounts = tg.setdefault('accounts', {})
-        accounts[bot_id] = {'name': bot_name, 'dmPolicy': 'allowlist', 'botToken': bot_token, 'allowFrom': ['7996447774'], 'groupPolicy': 'allowlist', 'streamMode': 'partial'}
-        existing_config.setdefault('plugins', {}).setdefault('entries', {})['telegram'] = {'enabled': True}
         print(f'[Step 6/{TOTAL}] ✓ Telegram account已配置')
     else:
         print(f'[Step 6/{TOTAL}] ⏭ 未提供bot-token，跳过')
@@ -1120,20 +1323,12 @@ def cmd_bot_add(args):
 
     print(f'[Step 7/{TOTAL}] 配置binding...')
     sys.stdout.flush()
-    bindings = existing_config.setdefault('bindings', [])
-    bindings = [b for b in bindings if b.get('agentId') != bot_id]
-    if bot_token:
-        bindings.append({'agentId': bot_id, 'match': {'channel': 'telegram', 'accountId': bot_id}})
-    existing_config['bindings'] = bindings
     print(f'[Step 7/{TOTAL}] ✓ Binding已配置')
     sys.stdout.flush()
 
     print(f'[Step 8/{TOTAL}] 写入 openclaw.json...')
     sys.stdout.flush()
-    import base64
-    config_json = json.dumps(existing_config, indent=2, ensure_ascii=False)
-    b64 = base64.b64encode(config_json.encode()).decode()
-    ok, _, err = ssh_cmd(node, f"echo '{b64}' | base64 -d > {node['ocPath']}/openclaw.json")
+    ok, err = _edit_config(node, config_before, existing_config, f'bot-add {bot_id}', config_version)
     if ok:
         print(f'[Step 8/{TOTAL}] ✓ openclaw.json已更新')
     else:
@@ -1147,8 +1342,7 @@ def cmd_bot_add(args):
     auth_token = getattr(args, 'auth_token', None) or ''
     if auth_token:
         auth_profiles = json.dumps({'version': 1, 'profiles': {'anthropic:default': {'type': 'token', 'provider': 'anthropic', 'token': auth_token}}, 'lastGood': {'anthropic': 'anthropic:default'}}, indent=2)
-        b64_auth = base64.b64encode(auth_profiles.encode()).decode()
-        ok2, _, err2 = ssh_cmd(node, f"echo '{b64_auth}' | base64 -d > {node['ocPath']}/auth-profiles.json")
+        ok2, err2 = _write_file(node, f"{node['ocPath']}/auth-profiles.json", auth_profiles)
         if ok2:
             print(f'[Step 9/{TOTAL}] ✓ auth-profiles.json已创建')
         else:
@@ -1157,18 +1351,15 @@ def cmd_bot_add(args):
         print(f'[Step 9/{TOTAL}] ⏭ 未提供auth-token')
     sys.stdout.flush()
 
-    print(f'[Step 10/{TOTAL}] 重启Gateway服务...')
+    print(f'[Step 10/{TOTAL}] Gateway加载新配置...')
     sys.stdout.flush()
-    ssh_cmd(node, 'systemctl --user restart openclaw-gateway 2>&1 || true', timeout=15)
-    import time
-    time.sleep(3)
-    ok2, status, _ = ssh_cmd(node, 'systemctl --user is-active openclaw-gateway 2>/dev/null || echo inactive')
-    gw_status = status.strip() if ok2 else 'unknown'
-    if gw_status == 'active':
-        print(f'[Step 10/{TOTAL}] ✓ Gateway已重启! Bot {bot_name} 添加完成!')
+    result = apply_gateway_config(node)
+    if result['ok']:
+        print(f'[Step 10/{TOTAL}] ✓ Bot {bot_name} 添加完成! ({gateway_reload.describe(result)})')
     else:
-        print(f'[Step 10/{TOTAL}] ⚠ Gateway状态: {gw_status}')
+        print(f'[Step 10/{TOTAL}] ⚠ Gateway状态: {gateway_reload.describe(result)}')
     sys.stdout.flush()
+    INVENTORY.invalidate(node['id'])
     log_action('bot-add', args.nodeId, f'bot={bot_id}')
 
 
@@ -1233,33 +1424,24 @@ def cmd_bot_delete(args):
 
     print(f'[Step 3/{TOTAL}] 从openclaw.json移除agent配置...')
     sys.stdout.flush()
-    ok, out, _ = ssh_cmd(node, f'cat {node["ocPath"]}/openclaw.json 2>/dev/null')
-    if ok:
-        try:
-            config = json.loads(out)
-            config['agents']['list'] = [a for a in config.get('agents', {}).get('list', []) if a.get('id') != bot_id]
-            config.get('channels', {}).get('telegram', {}).get('accounts', {}).pop(bot_id, None)
-            config['bindings'] = [b for b in config.get('bindings', []) if b.get('agentId') != bot_id]
-            import base64
-            config_json = json.dumps(config, indent=2, ensure_ascii=False)
-            b64 = base64.b64encode(config_json.encode()).decode()
-            ssh_cmd(node, f"echo '{b64}' | base64 -d > {node['ocPath']}/openclaw.json")
-            print(f'[Step 3/{TOTAL}] ✓ 配置已清理')
-        except Exception as e:
-            print(f'[Step 3/{TOTAL}] ⚠ 清理配置失败: {e}')
-    sys.stdout.flush()
-
-    print(f'[Step 4/{TOTAL}] 重启Gateway...')
-    sys.stdout.flush()
-    ssh_cmd(node, 'systemctl --user restart openclaw-gateway 2>&1 || true', timeout=15)
-    import time
-    time.sleep(2)
-    ok, status, _ = ssh_cmd(node, 'systemctl --user is-active openclaw-gateway 2>/dev/null || echo inactive')
-    gw_status = status.strip() if ok else 'unknown'
-    if gw_status == 'active':
-        print(f'[Step 4/{TOTAL}] ✓ Gateway已重启')
+    config, version, err = _read_config(node)
+    if config is not None:
+        before = copy.deepcopy(config)
+        bot_manifest.remove_bot(config, bot_id)
+        ok, err = _edit_config(node, before, config, f'bot-delete {bot_id}', version)
+    if config is not None and ok:
+        print(f'[Step 3/{TOTAL}] ✓ 配置已清理')
     else:
-        print(f'[Step 4/{TOTAL}] ⚠ Gateway状态: {gw_status}')
+        print(f'[Step 3/{TOTAL}] ⚠ 清理配置失败: {err}')
+    sys.stdout.flush()
+
+    print(f'[Step 4/{TOTAL}] Gateway加载新配置...')
+    sys.stdout.flush()
+    result = apply_gateway_config(node)
+    if result['ok']:
+        print(f'[Step 4/{TOTAL}] ✓ {gateway_reload.describe(result)}')
+    else:
+        print(f'[Step 4/{TOTAL}] ⚠ Gateway状态: {gateway_reload.describe(result)}')
     sys.stdout.flush()
 
     print(f'[Step 5/{TOTAL}] 验证Bot已移除...')
@@ -1269,9 +1451,514 @@ def cmd_bot_delete(args):
 
     print(f'[Step 6/{TOTAL}] ✓ 删除完成! Bot: {bot_id}')
     sys.stdout.flush()
+    INVENTORY.invalidate(node['id'])
     log_action('bot-delete', args.nodeId, f'bot={bot_id}')
 
 
+def cmd_bot_apply(args):
+    """按清单批量新增/修改/删除Bot: 每个节点一个模板tar流、一次配置写入、一次Gateway重启"""
+    try:
+        manifest = bot_manifest.load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(colored(f"✗ 清单无效: {e}", C.RED))
+        sys.exit(1)
+    defaults = manifest['defaults']
+    nodes = [get_node(node_id) for node_id in manifest['nodes']]
+    TOTAL = 6
+
+    print(colored(f"📋 批量应用Bot清单: {len(nodes)} 个节点", C.BOLD))
+
+    print(f'[Step 1/{TOTAL}] 读取节点配置并检查清单...')
+    sys.stdout.flush()
+    configs, versions, problems = {}, {}, []
+    for node in nodes:
+        ops = manifest['nodes'][node['id']]
+        ok, _, err = ssh_cmd(node, 'echo ok', timeout=10)
+        if not ok:
+            problems.append(f"{node['id']}: SSH连接失败: {err}")
+            continue
+        config, version, err = _read_config(node)
+        if config is None:
+            if ops['update'] or ops['delete'] or version != remote_file.ABSENT:
+                problems.append(f"{node['id']}: {err}")
+                continue
+            config = bot_manifest.empty_config(node, defaults.get('model') or bot_manifest.DEFAULT_MODEL)
+        problems += [f"{node['id']}: {p}" for p in bot_manifest.plan(config, ops)]
+        configs[node['id']] = config
+        versions[node['id']] = version
+    if problems:
+        for p in problems:
+            print(f'[Step 1/{TOTAL}] ✗ {p}')
+        sys.exit(1)
+    for node in nodes:
+        ops = manifest['nodes'][node['id']]
+        print(f"    {node['id']}: +{len(ops['add'])} ~{len(ops['update'])} -{len(ops['delete'])}"
+              f"{'  删除: ' + ', '.join(ops['delete']) if ops['delete'] else ''}")
+    print(f'[Step 1/{TOTAL}] ✓ 清单检查通过')
+    sys.stdout.flush()
+    if args.dry_run:
+        return
+    if any(manifest['nodes'][n['id']]['delete'] for n in nodes) and not args.yes:
+        confirm = input(colored('  清单包含删除操作，确认执行? (yes/no): ', C.YELLOW))
+        if confirm.lower() != 'yes':
+            print('  已取消')
+            return
+
+    # 节点之间互不依赖: 某个节点失败时记下原因并跳过，其余节点照常完成全部步骤
+    failed = {}
+
+    print(f'[Step 2/{TOTAL}] 上传workspace模板 (每个节点一个tar流)...')
+    sys.stdout.flush()
+    for node in nodes:
+        ops = manifest['nodes'][node['id']]
+        souls = [b for b in ops['update'] if b.get('soul')]
+        if not ops['add'] and not souls:
+            continue
+        data = bot_manifest.template_tar(ops['add'], souls)
+        rc, err = get_transport(node).exec_stream(bot_manifest.extract_command(node['ocPath'], souls), io.BytesIO(),
+                                                  input=data, timeout=120)
+        if rc != 0:
+            print(f'[Step 2/{TOTAL}]   ✗ {node["id"]} 模板上传失败: {err}')
+            failed[node['id']] = f"模板上传失败: {err}"
+            continue
+        print(f'[Step 2/{TOTAL}]   ✓ {node["id"]}: {len(ops["add"]) + len(souls)} 个Bot, {len(data) / 1024:.0f}KB')
+    print(f'[Step 2/{TOTAL}] {"⚠ 部分节点失败" if failed else "✓ 模板已上传"}')
+    sys.stdout.flush()
+
+    print(f'[Step 3/{TOTAL}] 写入 openclaw.json (每个节点一次)...')
+    sys.stdout.flush()
+    trash, summaries = {}, {}
+    for node in nodes:
+        if node['id'] in failed:
+            continue
+        ops, config = manifest['nodes'][node['id']], configs[node['id']]
+        entries = {a.get('id'): a for a in config.get('agents', {}).get('list', [])}
+        trash[node['id']] = [p for bot_id in ops['delete'] for p in (
+            entries[bot_id].get('workspace') or f"{node['ocPath']}/workspace-{bot_id}",
+            f"{node['ocPath']}/agents/{bot_id}")]
+        if versions[node['id']] == remote_file.ABSENT:
+            summaries[node['id']] = bot_manifest.apply(config, node['ocPath'], ops, defaults)
+            ok, err = _edit_config(node, None, config, version=remote_file.ABSENT)
+        else:
+            # 每个Bot一个补丁 (历史中可分别查看)，合并为一次写入
+            editor = ConfigEditor(node, get_transport(node))
+            summaries[node['id']] = bot_manifest.apply(config, node['ocPath'], ops, defaults, stage=editor.edit)
+            ok, err = _commit_edits(node, editor)
+        if not ok:
+            print(f'[Step 3/{TOTAL}]   ✗ {node["id"]} 写入失败: {err}')
+            failed[node['id']] = f"写入失败: {err}"
+            continue
+        INVENTORY.invalidate(node['id'])
+    written = [node for node in nodes if node['id'] not in failed]
+    print(f'[Step 3/{TOTAL}] {"⚠" if failed else "✓"} 配置已更新 ({len(written)}/{len(nodes)} 个节点)')
+    sys.stdout.flush()
+
+    print(f'[Step 4/{TOTAL}] 已删除Bot的目录移至回收站...')
+    sys.stdout.flush()
+    ts = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    for node in written:
+        if trash[node['id']]:
+            moves = '; '.join(f"[ -d {p} ] && mv {p} /tmp/ocm-trash-{ts}-{os.path.basename(p)}"
+                              for p in trash[node['id']])
+            ssh_cmd(node, f"{moves}; true")
+    print(f'[Step 4/{TOTAL}] ✓ 完成')
+    sys.stdout.flush()
+
+    print(f'[Step 5/{TOTAL}] Gateway加载新配置 (每个节点一次)...')
+    sys.stdout.flush()
+    for node in written:
+        result = apply_gateway_config(node)
+        if result['ok']:
+            print(f'[Step 5/{TOTAL}]   ✓ {node["id"]} {gateway_reload.describe(result)}')
+        else:
+            print(f'[Step 5/{TOTAL}]   ⚠ {node["id"]} Gateway状态: {gateway_reload.describe(result)}')
+        sys.stdout.flush()
+
+    counts = []
+    for node in written:
+        summary = summaries[node['id']]
+        log_action('bot-apply', node['id'], ' '.join(f"{k}={','.join(v)}" for k, v in summary.items() if v))
+        counts.append(f"{node['id']}: +{len(summary['added'])} ~{len(summary['replaced']) + len(summary['updated'])} "
+                      f"-{len(summary['deleted'])}")
+    for node_id, reason in failed.items():
+        log_action('bot-apply-failed', node_id, reason)
+    if failed:
+        print(f'[Step 6/{TOTAL}] ⚠ {len(written)}/{len(nodes)} 个节点已应用: {", ".join(counts) or "无"}')
+        for node_id, reason in failed.items():
+            print(f'[Step 6/{TOTAL}]   ✗ {node_id}: {reason} (该节点未做任何配置修改，修正后可只对它重新执行)')
+        sys.stdout.flush()
+        sys.exit(1)
+    print(f'[Step 6/{TOTAL}] ✓ 清单应用完成! {", ".join(counts)}')
+    sys.stdout.flush()
+
+
+def _pipe_between(src_node, src_cmd, dst_node, dst_cmd, tap=None, timeout=1800):
+    """src 命令的 stdout 经控制端管道直接作为 dst 命令的 stdin (不落盘)，返回 (ok, err, 字节数)"""
+    read_fd, write_fd = os.pipe()
+    reader, writer = os.fdopen(read_fd, 'rb'), os.fdopen(write_fd, 'wb')
+    counted = {'bytes': 0, 'rc': None, 'err': ''}
+
+    class Tee:
+        def write(self, chunk):
+            counted['bytes'] += len(chunk)
+            if tap:
+                tap(chunk)
+            writer.write(chunk)
+
+    def produce():
+        try:
+            counted['rc'], counted['err'] = get_transport(src_node).exec_stream(src_cmd, Tee(), timeout=timeout)
+        except BrokenPipeError:
+            counted['err'] = '目标端提前退出'
+        finally:
+            try:
+                writer.close()
+            except OSError:
+                pass
+
+    start = time.time()
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    rc, err = get_transport(dst_node).exec_stream(dst_cmd, io.BytesIO(), input=reader, timeout=timeout)
+    reader.close()
+    producer.join()
+    TRACER.record('pipe', src_node['id'], f"{src_cmd} → {dst_node['id']}", start, 0, counted['bytes'], counted['rc'])
+    TRACER.record('pipe', dst_node['id'], dst_cmd, start, counted['bytes'], 0, rc)
+    if counted['rc'] != 0:
+        return False, f"源端: {counted['err']}", counted['bytes']
+    if rc != 0:
+        return False, f"目标端: {err}", counted['bytes']
+    return True, '', counted['bytes']
+
+def _read_config(node):
+    """读取 openclaw.json，返回 (config, sha256, 错误)；sha256 传给 _edit_config 检测并发修改"""
+    path = f"{node['ocPath']}/openclaw.json"
+    try:
+        data, version = remote_file.read(get_transport(node), path)
+    except IOError as e:
+        return None, None, str(e)
+    if data is None:
+        return None, version, '无法读取 openclaw.json'
+    try:
+        return json.loads(data), version, ''
+    except json.JSONDecodeError as e:
+        return None, version, f'openclaw.json 解析失败: {e}'
+
+def _write_file(node, path, data, expect=None, mkdir=False):
+    """原子写入节点上的文件 (stdin 流式 + fsync + rename)，返回 (ok, 错误)"""
+    if isinstance(data, str):
+        data = data.encode()
+    start = time.time()
+    rc = 0
+    try:
+        remote_file.write(get_transport(node), path, data, expect=expect, mkdir=mkdir)
+        return True, ''
+    except remote_file.WriteConflict as e:
+        rc = remote_file.CONFLICT_RC
+        return False, f"{e} (读取后被其他操作修改，请重新执行)"
+    except IOError as e:
+        rc = 1
+        return False, str(e)
+    finally:
+        TRACER.record('write', node['id'], path, start, len(data), 0, rc)
+
+def _edit_config(node, before, after, label='', version=None, path=None):
+    """以 JSON-patch 提交 before -> after 的修改 (config_editor)，返回 (ok, 错误)
+
+    before 为 None (文件不存在或无法解析) 时整体原子写入，version 为读取时的 sha256
+    """
+    path = path or f"{node['ocPath']}/openclaw.json"
+    if before is None:
+        return _write_file(node, path, json.dumps(after, indent=2, ensure_ascii=False), expect=version)
+    editor = ConfigEditor(node, get_transport(node), path)
+    editor.edit(before, after, label)
+    return _commit_edits(node, editor)
+
+def _commit_edits(node, editor):
+    """提交编辑会话中暂存的补丁 (每个文件一次写入)，返回 (ok, 错误)"""
+    start = time.time()
+    try:
+        results = editor.commit()
+    except PatchConflict as e:
+        return False, f"配置冲突: {e} (读取后被其他操作修改，请重新执行)"
+    except (IOError, ValueError) as e:
+        return False, str(e)
+    for result in results:
+        TRACER.record('patch', node['id'], f"{result['path']} ({result['ops']} ops, {result['mode']})",
+                      start, result['bytes'], 0, 0)
+    return True, ''
+
+def _rollback_edit(node, label, prefix):
+    """撤销本次命令在节点上提交的配置修改 (按标签找最近一次未撤销的提交)，返回是否成功"""
+    entry = next((e for e in config_editor.undoable(node['id'])
+                  if e['path'] == f"{node['ocPath']}/openclaw.json" and label in e['labels']), None)
+    if entry is None:
+        print(f'{prefix} ✗ {node["id"]} 找不到要回滚的提交，请用 config-history / config-undo 手动处理')
+        return False
+    try:
+        config_editor.undo(node, get_transport(node), entry)
+    except (PatchConflict, IOError, ValueError) as e:
+        print(f'{prefix} ✗ {node["id"]} 回滚失败: {e}，请用 config-undo {node["id"]} {entry["id"]} 手动处理')
+        log_action('config-rollback-failed', node['id'], f"entry={entry['id']} {e}")
+        return False
+    INVENTORY.invalidate(node['id'])
+    print(f'{prefix} ↩ {node["id"]} 配置已回滚 ({entry["id"]})')
+    log_action('config-rollback', node['id'], f"entry={entry['id']} {label}")
+    return True
+
+def cmd_bot_migrate(args):
+    """节点间直接迁移Bot: 目录经控制端管道流式复制，配置条目随之移动，两端各加载一次新配置
+
+    复制时Bot仍在源端运行；源端下线后再补传复制开始后改过的文件，然后目标端才加载
+    """
+    src, dst = get_node(args.srcNodeId), get_node(args.dstNodeId)
+    bot_id = args.botId
+    TOTAL = 9
+    if src['id'] == dst['id']:
+        print(colored("✗ 源节点和目标节点相同", C.RED))
+        sys.exit(1)
+
+    print(colored(f"🚚 迁移Bot: {bot_id}  {src['name']} → {dst['name']}", C.BOLD))
+
+    print(f'[Step 1/{TOTAL}] 验证SSH连接...')
+    sys.stdout.flush()
+    for node in (src, dst):
+        ok, _, err = ssh_cmd(node, 'echo ok', timeout=10)
+        if not ok:
+            print(f'[Step 1/{TOTAL}] ✗ {node["id"]} SSH连接失败: {err}')
+            sys.exit(1)
+    print(f'[Step 1/{TOTAL}] ✓ 两端SSH连接成功')
+
+    print(f'[Step 2/{TOTAL}] 读取两端 openclaw.json...')
+    sys.stdout.flush()
+    src_config, src_version, err = _read_config(src)
+    dst_config, dst_version, err2 = _read_config(dst)
+    if src_config is None or dst_config is None:
+        print(f'[Step 2/{TOTAL}] ✗ {err or err2}')
+        sys.exit(1)
+    entry = next((a for a in src_config.get('agents', {}).get('list', []) if a.get('id') == bot_id), None)
+    if entry is None:
+        print(f'[Step 2/{TOTAL}] ✗ {src["id"]} 的 agents.list 中没有 {bot_id}')
+        sys.exit(1)
+    if any(a.get('id') == bot_id for a in dst_config.get('agents', {}).get('list', [])):
+        print(f'[Step 2/{TOTAL}] ⚠ {dst["id"]} 已有 {bot_id}')
+        if not args.yes:
+            confirm = input(colored('  继续将覆盖目标节点上的Bot，确认? (yes/no): ', C.YELLOW))
+            if confirm.lower() != 'yes':
+                print('  已取消')
+                return
+    print(f'[Step 2/{TOTAL}] ✓ 配置已读取')
+
+    # 源/目标目录: workspace 在源 ocPath 下时映射到目标 ocPath 下的同名位置
+    src_workspace = entry.get('workspace') or f"{src['ocPath']}/workspace-{bot_id}"
+    if src_workspace.startswith(src['ocPath'].rstrip('/') + '/'):
+        dst_workspace = dst['ocPath'].rstrip('/') + src_workspace[len(src['ocPath'].rstrip('/')):]
+    else:
+        dst_workspace = f"{dst['ocPath']}/workspace-{bot_id}"
+    dirs = [(f"{src['ocPath']}/agents/{bot_id}", f"{dst['ocPath']}/agents/{bot_id}"),
+            (src_workspace, dst_workspace)]
+
+    print(f'[Step 3/{TOTAL}] 流式复制Bot目录 ({src["id"]} → 控制端管道 → {dst["id"]})...')
+    sys.stdout.flush()
+    # 复制开始时间的标记文件: 源端下线后用 find -newer 找出复制期间被改写的文件
+    ok, stamp, err = ssh_cmd(src, f'mktemp /tmp/ocm-migrate-{bot_id}.XXXXXX')
+    if not ok:
+        print(f'[Step 3/{TOTAL}] ✗ 无法创建标记文件: {err}')
+        sys.exit(1)
+    copied = []
+    for src_dir, dst_dir in dirs:
+        ok, _, _ = ssh_cmd(src, f'test -d {src_dir}')
+        if not ok:
+            print(f'[Step 3/{TOTAL}]   ⏭ 源目录不存在: {src_dir}')
+            continue
+        stats = TarStreamStats(compressed=False)
+        start = time.time()
+        ok, err, size = _pipe_between(src, f"tar cf - -C {src_dir} .", dst,
+                                      f"rm -rf {dst_dir} && mkdir -p {dst_dir} && tar xf - -C {dst_dir}",
+                                      tap=stats.feed)
+        if not ok:
+            print(f'[Step 3/{TOTAL}] ✗ 复制 {src_dir} 失败: {err}')
+            sys.exit(1)
+        ok, out, _ = ssh_cmd(dst, f"find {dst_dir} -type f | wc -l")
+        if not ok or int(out or 0) < stats.file_count:
+            print(f'[Step 3/{TOTAL}] ✗ 目标文件数不一致: {out} < {stats.file_count}')
+            sys.exit(1)
+        elapsed = time.time() - start
+        print(f'[Step 3/{TOTAL}]   ✓ {src_dir} → {dst_dir} ({stats.file_count} 个文件, '
+              f'{size / 1024 / 1024:.1f}MB, {elapsed:.1f}s)')
+        copied.append((src_dir, dst_dir))
+    if not copied:
+        print(f'[Step 3/{TOTAL}] ✗ 没有可迁移的目录')
+        sys.exit(1)
+    print(f'[Step 3/{TOTAL}] ✓ 目录复制完成')
+
+    print(f'[Step 4/{TOTAL}] 移动 agents.list / Telegram account / binding...')
+    sys.stdout.flush()
+    originals = {src['id']: copy.deepcopy(src_config), dst['id']: copy.deepcopy(dst_config)}
+    moved_entry = dict(entry, workspace=dst_workspace, agentDir=entry.get('agentDir') or f'agents/{bot_id}/agent')
+    src_config['agents']['list'] = [a for a in src_config['agents']['list'] if a.get('id') != bot_id]
+    dst_agents = dst_config.setdefault('agents', {}).setdefault('list', [])
+    dst_config['agents']['list'] = [a for a in dst_agents if a.get('id') != bot_id] + [moved_entry]
+
+    src_tg = src_config.get('channels', {}).get('telegram', {})
+    account = src_tg.get('accounts', {}).pop(bot_id, None)
+    if account is not None:
+        dst_tg = dst_config.setdefault('channels', {}).setdefault('telegram', {})
+        dst_tg['enabled'] = True
+        for key in ('dmPolicy', 'groupPolicy', 'streamMode'):
+            if key in src_tg:
+                dst_tg.setdefault(key, src_tg[key])
+        dst_tg.setdefault('accounts', {})[bot_id] = account
+        dst_config.setdefault('plugins', {}).setdefault('entries', {})['telegram'] = {'enabled': True}
+
+    bindings = [b for b in src_config.get('bindings', []) if b.get('agentId') == bot_id]
+    src_config['bindings'] = [b for b in src_config.get('bindings', []) if b.get('agentId') != bot_id]
+    dst_config['bindings'] = [b for b in dst_config.get('bindings', []) if b.get('agentId') != bot_id] + bindings
+    print(f'[Step 4/{TOTAL}] ✓ agent{"、Telegram account" if account else ""}、{len(bindings)} 个binding')
+
+    print(f'[Step 5/{TOTAL}] 写入两端 openclaw.json...')
+    sys.stdout.flush()
+    label = f'bot-migrate {bot_id} {src["id"]}→{dst["id"]}'
+    for node, config, version in ((dst, dst_config, dst_version), (src, src_config, src_version)):
+        ok, err = _edit_config(node, originals[node['id']], config, label, version)
+        if not ok:
+            print(f'[Step 5/{TOTAL}] ✗ {node["id"]} 写入失败: {err}')
+            if node is src:
+                # 目标端已写入: 撤销，否则两个节点的配置里都有这个Bot (同一个Telegram token)
+                _rollback_edit(dst, label, f'[Step 5/{TOTAL}]')
+            sys.exit(1)
+    print(f'[Step 5/{TOTAL}] ✓ 配置已更新')
+
+    # 先让源端加载配置使Bot下线，再补传增量、让目标端加载，避免两个Gateway同时轮询同一个Telegram token
+    def reload(step, node):
+        print(f'[Step {step}/{TOTAL}] {node["id"]} Gateway加载新配置...')
+        sys.stdout.flush()
+        result = apply_gateway_config(node)
+        if result['ok']:
+            print(f'[Step {step}/{TOTAL}] ✓ {node["id"]} {gateway_reload.describe(result)}')
+        else:
+            print(f'[Step {step}/{TOTAL}] ⚠ {node["id"]} Gateway状态: {gateway_reload.describe(result)}')
+
+    switch_start = time.time()
+    reload(6, src)
+
+    print(f'[Step 7/{TOTAL}] 补传复制期间源端改写的文件 (会话/记忆等)...')
+    sys.stdout.flush()
+    synced = True
+    for src_dir, dst_dir in copied:
+        stats = TarStreamStats(compressed=False)
+        ok, err, size = _pipe_between(
+            src, f"cd {src_dir} && find . -newer {stamp} \\( -type f -o -type l \\) -print0 | "
+                 f"tar cf - --null --no-recursion -T -",
+            dst, f"tar xf - -C {dst_dir}", tap=stats.feed)
+        if ok:
+            print(f'[Step 7/{TOTAL}]   ✓ {src_dir}: {stats.file_count} 个文件 ({size / 1024:.0f}KB)')
+        else:
+            print(f'[Step 7/{TOTAL}]   ✗ {src_dir} 补传失败: {err}')
+            synced = False
+    ssh_cmd(src, f'rm -f {stamp}')
+    if synced:
+        print(f'[Step 7/{TOTAL}] ✓ 增量已同步')
+    else:
+        print(f'[Step 7/{TOTAL}] ⚠ 增量同步不完整，源端目录保留，请手动核对')
+
+    reload(8, dst)
+    downtime = time.time() - switch_start
+
+    INVENTORY.invalidate(src['id'])
+    INVENTORY.invalidate(dst['id'])
+    if not synced:
+        log_action('bot-migrate-incomplete', src['id'], f'bot={bot_id} dst={dst["id"]} downtime={downtime:.1f}s')
+        sys.exit(1)
+    print(f'[Step 9/{TOTAL}] 源节点目录移至回收站...')
+    sys.stdout.flush()
+    ts = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    for path, _ in copied:
+        ssh_cmd(src, f'mv {path} /tmp/ocm-trash-{bot_id}-{ts}-{os.path.basename(path)}')
+    print(f'[Step 9/{TOTAL}] ✓ 迁移完成! Bot {bot_id} 现在运行在 {dst["id"]} (切换耗时 {downtime:.1f}s)')
+    sys.stdout.flush()
+    log_action('bot-migrate', src['id'], f'bot={bot_id} dst={dst["id"]} downtime={downtime:.1f}s')
+
+
+def cmd_config_history(args):
+    """节点配置修改历史 (JSON-patch 提交记录)"""
+    node = get_node(args.nodeId)
+    entries = config_editor.history(node['id'])[-args.limit:]
+    if args.json_output:
+        print(json.dumps(entries, ensure_ascii=False, indent=2))
+        return
+    print(colored(f"📜 配置修改历史: {node['name']}", C.BOLD))
+    print("─" * 60)
+    if not entries:
+        print("  (无记录)")
+        return
+    undone = {e['undo_of'] for e in config_editor.history(node['id']) if e.get('undo_of')}
+    for entry in entries:
+        mark = colored(' (已撤销)', C.YELLOW) if entry['id'] in undone else ''
+        print(f"  {colored(entry['id'], C.CYAN)}  {os.path.basename(entry['path'])}  "
+              f"{len(entry['patch'])} ops  {'; '.join(entry['labels'])}{mark}")
+
+def cmd_config_undo(args):
+    """撤销最近一次 (或指定的) 配置修改: 应用其反向补丁，之后又被改过的部分会报冲突"""
+    node = get_node(args.nodeId)
+    candidates = config_editor.undoable(node['id'])
+    entry = next((e for e in candidates if e['id'] == args.entryId), None) if args.entryId else \
+        (candidates[0] if candidates else None)
+    if entry is None:
+        print(colored("✗ 没有可撤销的修改" + (f": {args.entryId}" if args.entryId else ''), C.RED))
+        sys.exit(1)
+    print(colored(f"↩️  撤销配置修改: {entry['id']} @ {node['name']}", C.BOLD))
+    print(f"  {os.path.basename(entry['path'])}: {'; '.join(entry['labels'])} ({len(entry['inverse'])} ops)")
+    if not args.yes:
+        confirm = input(colored('  确认撤销? (yes/no): ', C.YELLOW))
+        if confirm.lower() != 'yes':
+            print('  已取消')
+            return
+    try:
+        config_editor.undo(node, get_transport(node), entry)
+    except PatchConflict as e:
+        print(colored(f"  ✗ 无法撤销，之后又被修改过: {e}", C.RED))
+        sys.exit(1)
+    except (IOError, ValueError) as e:
+        print(colored(f"  ✗ 撤销失败: {e}", C.RED))
+        sys.exit(1)
+    INVENTORY.invalidate(node['id'])
+    log_action('config-undo', node['id'], f"entry={entry['id']}")
+    if not args.reload:
+        print(colored("  ✓ 已撤销 (Gateway 未加载，需要时加 --reload 或运行 restart)", C.GREEN))
+        return
+    print(colored("  ✓ 已撤销", C.GREEN))
+    result = apply_gateway_config(node)
+    print(colored(f"  {'✓' if result['ok'] else '⚠'} {gateway_reload.describe(result)}",
+                  C.GREEN if result['ok'] else C.YELLOW))
+
+def cmd_reload_stats(args):
+    """各节点配置生效策略的实测中断窗口 (gateway_reload 统计)"""
+    stats = gateway_reload.load_stats()
+    if args.nodeId:
+        stats = {args.nodeId: stats.get(args.nodeId, {})}
+    if args.json_output:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        return
+    print(colored("⏱  Gateway 配置生效中断统计", C.BOLD))
+    print("─" * 60)
+    if not any(stats.values()):
+        print("  (无记录)")
+        return
+    print(f"  {'节点':<14} {'策略':<8} {'次数':>4} {'失败':>4} {'平均':>8} {'最大':>8} {'最近':>8}")
+    for node_id, strategies in sorted(stats.items()):
+        for strategy in gateway_reload.STRATEGIES:
+            entry = strategies.get(strategy)
+            if not entry:
+                continue
+            done = entry['count'] - entry['failures']
+            avg = f"{entry['total_ms'] / done / 1000:.2f}s" if done else '-'
+            last = f"{entry['last_ms'] / 1000:.2f}s" if entry['last_ms'] is not None else '-'
+            mark = colored(' 不支持', C.YELLOW) if entry['unsupported'] else ''
+            print(f"  {node_id:<14} {strategy:<8} {entry['count']:>4} {entry['failures']:>4} {avg:>8} "
+                  f"{entry['max_ms'] / 1000:>7.2f}s {last:>8}{mark}")
+
+
 # === JSON output mode for API integration ===
 def cmd_list_json(args):
     """JSON output for API"""
@@ -1298,49 +1985,8 @@ def cmd_status_json(args):
     ok, out, _ = ssh_cmd(node, "systemctl --user is-active openclaw-gateway 2>/dev/null || echo inactive")
     status = out.strip().split('\n')[-1] if ok else 'unreachable'
     
-    ok2, out2, _ = ssh_cmd(node, f"cat {node['ocPath']}/openclaw.json 2>/dev/null")
-    bots = []
-    if ok2:
-        try:
-            config = json.loads(out2)
-            agent_list = config.get('agents', {}).get('list', [])
-            
-            # Build channel map from bindings
-            channel_map = {}
-            for binding in config.get('bindings', []):
-                agent_id = binding.get('agentId', '')
-                match = binding.get('match', {})
-                ch = match.get('channel', '')
-                if agent_id and ch:
-                    channel_map[agent_id] = ch
-            
-            # Default model from config
-            default_model = config.get('agents', {}).get('defaults', {}).get('model', {}).get('primary', '')
-            
-            for a in agent_list:
-                aid = a.get('id', '?')
-                name = aid
-                model = default_model or '?'
-                channel = channel_map.get(aid, '?')
-                
-                # Try to read agent's own config for more details
-                ok_a, out_a, _ = ssh_cmd(node, f"cat {node['ocPath']}/agents/{aid}/agent/openclaw.json 2>/dev/null")
-                if ok_a:
-                    try:
-                        acfg = json.loads(out_a)
-                        name = acfg.get('name', aid)
-                        m = acfg.get('llm', {}).get('model', '')
-                        if m:
-                            model = m
-                        ch = acfg.get('channels', [])
-                        if ch:
-                            channel = ch[0].get('type', channel)
-                    except:
-                        pass
-                
-                bots.append({'id': aid, 'name': name, 'model': model, 'channel': channel})
-        except:
-            pass
+    bots, _ = _node_bots(node)
+    bots = [{k: b[k] for k in ('id', 'name', 'model', 'channel')} for b in bots or []]
     
     ok3, disk, _ = ssh_cmd(node, f"du -sh {node['ocPath']} 2>/dev/null")
     
@@ -1356,6 +2002,9 @@ def cmd_status_json(args):
 def main():
     parser = argparse.ArgumentParser(description='OCM Node Manager', prog='ocm-nodes.py')
     parser.add_argument('--json', action='store_true', dest='json_output', help='JSON output for API')
+    parser.add_argument('--profile', action='store_true', help='记录每次远程调用耗时并输出分解')
+    parser.add_argument('--trace-file', metavar='PATH',
+                        help='同 --profile，并写出 trace 及 cProfile 数据 (PATH.prof)')
     
     sub = parser.add_subparsers(dest='command', help='命令')
     
@@ -1366,13 +2015,22 @@ def main():
     
     p = sub.add_parser('backup', help='备份节点')
     p.add_argument('nodeId')
+    p.add_argument('--backup-profile', metavar='NAME', help='备份方案 (config/bots/full 或注册表 backupProfiles 中的名称)')
+    p.add_argument('--dry-run', action='store_true', help='只统计各方案的文件数和字节数，不创建备份')
     
     p = sub.add_parser('restore', help='还原节点')
     p.add_argument('nodeId')
     p.add_argument('filename', nargs='?', default=None)
     
-    p = sub.add_parser('restart', help='重启Gateway')
-    p.add_argument('nodeId')
+    p = sub.add_parser('restart', help='重启Gateway (单节点，或 --all/--select 滚动重启)')
+    p.add_argument('nodeId', nargs='?')
+    p.add_argument('--all', action='store_true', help='滚动重启所有节点')
+    p.add_argument('--select', action='append', default=[], metavar='FIELD=GLOB',
+                   help='按注册表字段筛选节点 (如 id=pc-*、host=192.168.3.*，可重复；只写GLOB时匹配id)')
+    p.add_argument('--exclude', action='append', default=[], metavar='FIELD=GLOB', help='排除匹配的节点')
+    p.add_argument('--batch-size', type=int, default=1, help='每批重启的节点数 (默认1)')
+    p.add_argument('--max-unavailable', type=int, default=1, help='同时不可用节点上限，含原本已故障的节点 (默认1)')
+    p.add_argument('--ready-timeout', type=int, default=90, help='每个节点等待就绪的最长时间(秒)')
     
     p = sub.add_parser('retire', help='退役节点')
     p.add_argument('nodeId')
@@ -1394,6 +2052,9 @@ def main():
     p.add_argument('--oc-path', dest='ocPath', help='OpenClaw路径')
     p.add_argument('--gateway-port', dest='gatewayPort', type=int, default=18789, help='Gateway端口')
     p.add_argument('--auth-token', dest='auth_token', help='Anthropic订阅Token')
+    p.add_argument('--push-agent', dest='push_agent', metavar='INGEST_URL', help='安装推送采集代理，上报到该 ingest 地址')
+    p.add_argument('--push-token', dest='push_token', metavar='TOKEN',
+                   help='ingest 认证token (默认取环境变量 OCM_INGEST_TOKEN，与服务端一致)')
     p.add_argument('--yes', action='store_true', help='跳过确认')
     
     p = sub.add_parser('bot-add', help='添加新Bot')
@@ -1409,6 +2070,16 @@ def main():
 
     p = sub.add_parser('bot-list', help='列出节点bot')
     p.add_argument('nodeId')
+    p.add_argument('--cached', action='store_true', help='只读控制端缓存，不访问节点')
+    
+    p = sub.add_parser('find-bot', help='全舰队查找bot (查清单缓存索引，支持 * ? 通配)')
+    p.add_argument('--id', help='bot id')
+    p.add_argument('--name', help='名称 (全名或其中一个词)')
+    p.add_argument('--model', help='模型')
+    p.add_argument('--channel', help='通道类型')
+    p.add_argument('--account', help='通道账号 (accountId)')
+    p.add_argument('--node', help='节点 id (通配)')
+    p.add_argument('--refresh', action='store_true', help='先并行刷新节点清单')
     
     p = sub.add_parser('bot-backup', help='备份bot')
     p.add_argument('nodeId')
@@ -1424,6 +2095,30 @@ def main():
     p.add_argument('botId')
     p.add_argument('--yes', action='store_true', help='跳过确认')
     
+    p = sub.add_parser('bot-apply', help='按清单批量新增/修改/删除bot (每个节点只加载一次新配置)')
+    p.add_argument('manifest', help='清单文件 (JSON)')
+    p.add_argument('--dry-run', action='store_true', help='只检查清单，不做修改')
+    p.add_argument('--yes', action='store_true', help='包含删除操作时跳过确认')
+    
+    p = sub.add_parser('config-history', help='节点配置修改历史')
+    p.add_argument('nodeId')
+    p.add_argument('--limit', type=int, default=20, help='显示最近N条')
+    
+    p = sub.add_parser('config-undo', help='撤销配置修改 (默认最近一次)')
+    p.add_argument('nodeId')
+    p.add_argument('entryId', nargs='?', default=None)
+    p.add_argument('--yes', action='store_true', help='跳过确认')
+    p.add_argument('--reload', action='store_true', help='撤销后让Gateway加载配置 (优先热重载)')
+    
+    p = sub.add_parser('reload-stats', help='配置生效策略 (热重载/重启) 的实测中断统计')
+    p.add_argument('nodeId', nargs='?', default=None)
+    
+    p = sub.add_parser('bot-migrate', help='把bot直接迁移到另一个节点')
+    p.add_argument('srcNodeId')
+    p.add_argument('dstNodeId')
+    p.add_argument('botId')
+    p.add_argument('--yes', action='store_true', help='目标节点已有同名bot时直接覆盖')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -1442,16 +2137,41 @@ def main():
         'set-subscription': cmd_set_subscription,
         'bot-add': cmd_bot_add,
         'bot-list': cmd_bot_list,
+        'find-bot': cmd_find_bot,
         'bot-backup': cmd_bot_backup,
         'bot-restore': cmd_bot_restore,
         'bot-delete': cmd_bot_delete,
+        'bot-migrate': cmd_bot_migrate,
+        'bot-apply': cmd_bot_apply,
+        'config-history': cmd_config_history,
+        'config-undo': cmd_config_undo,
+        'reload-stats': cmd_reload_stats,
     }
     
     cmd_func = commands.get(args.command)
-    if cmd_func:
-        cmd_func(args)
-    else:
+    if not cmd_func:
         parser.print_help()
+    elif args.profile or args.trace_file:
+        run_profiled(cmd_func, args)
+    else:
+        cmd_func(args)
+
+def run_profiled(cmd_func, args):
+    """Run command with ssh/scp tracing and cProfile, report to stderr (and trace file)"""
+    import cProfile
+    TRACER.enable()
+    stdout = sys.stdout
+    sys.stdout = StepTee(stdout, TRACER)
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(cmd_func, args)
+    finally:
+        sys.stdout = stdout
+        TRACER.print_report()
+        if args.trace_file:
+            TRACER.write(args.trace_file)
+            profiler.dump_stats(f"{args.trace_file}.prof")
+            print(f"📝 Trace: {args.trace_file}  cProfile: {args.trace_file}.prof", file=sys.stderr)
 
 if __name__ == '__main__':
     main()
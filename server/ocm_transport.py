@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+节点传输层 - 统一的 exec / exec_stream / put / get / stat 接口
+实现: 本机执行 (LocalTransport)、OpenSSH 子进程+连接复用 (SSHSubprocessTransport)、
+paramiko (ParamikoTransport)、内存模拟 (MockTransport，用于无网络的进程内测试)
+
+get_transport(node) 按节点选择最快的可用实现并缓存：
+  节点字段 transport 显式指定 > 本机地址走 local > 有 sshPassword 走 paramiko > 默认 ssh 子进程
+环境变量 OCM_TRANSPORT 可把远程节点的默认实现改为 paramiko 等
+"""
+
+import os
+import re
+import shlex
+import shutil
+import socket
+import stat as stat_mod
+import subprocess
+import threading
+
+import sftp_pipeline
+
+CHUNK_SIZE = 64 * 1024
+
+_local_ips = None
+_local_lock = threading.Lock()
+
+
+def local_addresses():
+    """本机地址集合（只计算一次）"""
+    global _local_ips
+    with _local_lock:
+        if _local_ips is None:
+            ips = {'127.0.0.1', '::1', 'localhost'}
+            try:
+                for info in socket.getaddrinfo(socket.gethostname(), None):
+                    ips.add(info[4][0])
+            except Exception:
+                pass
+            try:
+                r = subprocess.run(['hostname', '-I'], capture_output=True, text=True, timeout=5)
+                if r.returncode == 0:
+                    ips.update(r.stdout.split())
+            except Exception:
+                pass
+            _local_ips = ips
+        return _local_ips
+
+
+def is_local_host(host):
+    return host in local_addresses()
+
+
+def _feed(stdin, data):
+    """把 bytes 或文件对象写入子进程 stdin"""
+    try:
+        if hasattr(data, 'read'):
+            while True:
+                chunk = data.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                stdin.write(chunk)
+        elif data:
+            stdin.write(data)
+    except (BrokenPipeError, OSError):
+        pass
+    finally:
+        try:
+            stdin.close()
+        except OSError:
+            pass
+
+
+def _stream_process(argv, sink, input, timeout, timeout_msg):
+    """运行子进程，stdout 分块写入 sink，返回 (returncode, stderr)"""
+    proc = subprocess.Popen(argv, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    feeder = None
+    if input is not None:
+        feeder = threading.Thread(target=_feed, args=(proc.stdin, input), daemon=True)
+        feeder.start()
+    stderr_chunks = []
+    drainer = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    drainer.start()
+    timed_out = []
+
+    def kill():
+        timed_out.append(True)
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill) if timeout else None
+    if timer:
+        timer.start()
+    try:
+        while True:
+            chunk = proc.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            sink.write(chunk)
+        rc = proc.wait()
+    finally:
+        if timer:
+            timer.cancel()
+    drainer.join()
+    if feeder:
+        feeder.join()
+    err = b''.join(stderr_chunks).decode(errors='replace').strip()
+    if timed_out:
+        return None, timeout_msg
+    return rc, err
+
+
+class Transport:
+    """传输层接口
+
+    exec 返回 (returncode, stdout, stderr)，失败/超时时 returncode 为 None
+    exec_stream 把 stdout 原始字节写入 sink，返回 (returncode, stderr)
+    put/get 返回 (success, stderr)；stat 返回 {size, mtime, mode, is_dir} 或 None
+    """
+
+    kind = 'base'
+
+    def __init__(self, node):
+        self.node = node
+
+    def exec(self, command, timeout=30, input=None):
+        raise NotImplementedError
+
+    def exec_stream(self, command, sink, input=None, timeout=None):
+        raise NotImplementedError
+
+    def put(self, local_path, remote_path):
+        raise NotImplementedError
+
+    def get(self, remote_path, local_path):
+        raise NotImplementedError
+
+    def stat(self, remote_path):
+        rc, out, _ = self.exec(f"stat -c '%s %Y %f' {shlex.quote(remote_path)} 2>/dev/null", timeout=15)
+        if rc != 0 or not out.strip():
+            return None
+        size, mtime, mode = out.split()
+        mode = int(mode, 16)
+        return {'size': int(size), 'mtime': int(mtime), 'mode': mode, 'is_dir': stat_mod.S_ISDIR(mode)}
+
+    def close(self):
+        pass
+
+
+class LocalTransport(Transport):
+    """本机执行：bash -c / 文件复制"""
+
+    kind = 'local'
+
+    def exec(self, command, timeout=30, input=None):
+        try:
+            result = subprocess.run(['bash', '-c', command], input=input, capture_output=True, text=True,
+                                    timeout=timeout, stdin=None if input is not None else subprocess.DEVNULL)
+            return result.returncode, result.stdout, result.stderr
+        except subprocess.TimeoutExpired:
+            return None, '', '命令超时'
+        except Exception as e:
+            return None, '', str(e)
+
+    def exec_stream(self, command, sink, input=None, timeout=None):
+        try:
+            return _stream_process(['bash', '-c', command], sink, input, timeout, '命令超时')
+        except Exception as e:
+            return None, str(e)
+
+    def put(self, local_path, remote_path):
+        return self._copy(local_path, remote_path)
+
+    def get(self, remote_path, local_path):
+        return self._copy(remote_path, local_path)
+
+    def _copy(self, src, dst):
+        try:
+            shutil.copyfile(os.path.expanduser(src), os.path.expanduser(dst))
+            return True, ''
+        except Exception as e:
+            return False, str(e)
+
+    def stat(self, remote_path):
+        try:
+            st = os.stat(os.path.expanduser(remote_path))
+        except OSError:
+            return None
+        return {'size': st.st_size, 'mtime': int(st.st_mtime), 'mode': st.st_mode,
+                'is_dir': stat_mod.S_ISDIR(st.st_mode)}
+
+
+class SSHSubprocessTransport(Transport):
+    """OpenSSH 子进程，ControlMaster 复用同一条连接（后续调用省去握手）"""
+
+    kind = 'ssh'
+    CONTROL_PERSIST = '120'
+
+    def _options(self):
+        control_dir = os.path.expanduser('~/.ssh')
+        os.makedirs(control_dir, mode=0o700, exist_ok=True)
+        return [
+            '-o', 'ConnectTimeout=5', '-o', 'StrictHostKeyChecking=no',
+            '-o', 'ControlMaster=auto',
+            '-o', f"ControlPath={os.path.join(control_dir, 'ocm-cm-%C')}",
+            '-o', f'ControlPersist={self.CONTROL_PERSIST}',
+        ]
+
+    def _target(self):
+        return f"{self.node['sshUser']}@{self.node['host']}"
+
+    def _ssh_argv(self, command):
+        return ['ssh'] + self._options() + ['-p', str(self.node['sshPort']), self._target(), command]
+
+    def exec(self, command, timeout=30, input=None):
+        try:
+            result = subprocess.run(self._ssh_argv(command), input=input, capture_output=True, text=True,
+                                    timeout=timeout, stdin=None if input is not None else subprocess.DEVNULL)
+            return result.returncode, result.stdout, result.stderr
+        except subprocess.TimeoutExpired:
+            return None, '', 'SSH连接超时'
+        except Exception as e:
+            return None, '', str(e)
+
+    def exec_stream(self, command, sink, input=None, timeout=None):
+        try:
+            return _stream_process(self._ssh_argv(command), sink, input, timeout, 'SSH连接超时')
+        except Exception as e:
+            return None, str(e)
+
+    def _scp(self, src, dst):
+        argv = ['scp'] + self._options() + ['-P', str(self.node['sshPort']), src, dst]
+        try:
+            result = subprocess.run(argv, capture_output=True, text=True, timeout=600, stdin=subprocess.DEVNULL)
+            return result.returncode == 0, result.stderr.strip()
+        except Exception as e:
+            return False, str(e)
+
+    def put(self, local_path, remote_path):
+        return self._scp(local_path, f"{self._target()}:{remote_path}")
+
+    def get(self, remote_path, local_path):
+        return self._scp(f"{self._target()}:{remote_path}", local_path)
+
+    def shutdown_master(self):
+        """关闭复用的主连接（close() 不关闭，以便后续 CLI 调用继续复用）"""
+        subprocess.run(['ssh'] + self._options() + ['-p', str(self.node['sshPort']), '-O', 'exit', self._target()],
+                       capture_output=True, stdin=subprocess.DEVNULL, timeout=10)
+
+
+class ParamikoTransport(Transport):
+    """paramiko 长连接，支持密码认证；SFTP 通道按需打开并复用"""
+
+    kind = 'paramiko'
+
+    def __init__(self, node, client=None):
+        super().__init__(node)
+        self._client = client
+        self._sftp = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None or not self._is_active():
+                self._client = self._connect()
+                self._sftp = None
+            return self._client
+
+    def _is_active(self):
+        transport = self._client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _connect(self):
+        import paramiko
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        params = {
+            'hostname': self.node['host'],
+            'port': int(self.node.get('sshPort', 22)),
+            'username': self.node.get('sshUser'),
+            'timeout': 10,
+        }
+        password = self.node.get('sshPassword') or os.environ.get('NODE_SSH_PASSWORD')
+        if password:
+            params['password'] = password
+        client.connect(**params)
+        return client
+
+    @property
+    def sftp(self):
+        client = self.client
+        with self._lock:
+            if self._sftp is None:
+                self._sftp = sftp_pipeline.open_sftp(client)
+            return self._sftp
+
+    def exec(self, command, timeout=30, input=None):
+        try:
+            stdin, stdout, stderr = self.client.exec_command(command, timeout=timeout)
+            if input is not None:
+                stdin.write(input)
+            stdin.channel.shutdown_write()
+            out = stdout.read().decode(errors='replace')
+            err = stderr.read().decode(errors='replace')
+            return stdout.channel.recv_exit_status(), out, err
+        except socket.timeout:
+            return None, '', 'SSH连接超时'
+        except Exception as e:
+            return None, '', str(e)
+
+    def exec_stream(self, command, sink, input=None, timeout=None):
+        try:
+            stdin, stdout, stderr = self.client.exec_command(command, timeout=timeout)
+            if input is not None:
+                _feed(stdin, input)
+            stdin.channel.shutdown_write()
+            while True:
+                chunk = stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sink.write(chunk)
+            err = stderr.read().decode(errors='replace').strip()
+            return stdout.channel.recv_exit_status(), err
+        except socket.timeout:
+            return None, 'SSH连接超时'
+        except Exception as e:
+            return None, str(e)
+
+    def put(self, local_path, remote_path):
+        try:
+            self.sftp.put(local_path, remote_path)
+            return True, ''
+        except Exception as e:
+            return False, str(e)
+
+    def get(self, remote_path, local_path):
+        try:
+            self.sftp.get(remote_path, local_path)
+            return True, ''
+        except Exception as e:
+            return False, str(e)
+
+    def stat(self, remote_path):
+        try:
+            st = self.sftp.stat(remote_path)
+        except Exception:
+            return None
+        return {'size': st.st_size, 'mtime': int(st.st_mtime), 'mode': st.st_mode,
+                'is_dir': stat_mod.S_ISDIR(st.st_mode)}
+
+    def close(self):
+        with self._lock:
+            for handle in (self._sftp, self._client):
+                try:
+                    if handle is not None:
+                        handle.close()
+                except Exception:
+                    pass
+            self._sftp = None
+            self._client = None
+
+
+class MockTransport(Transport):
+    """内存模拟节点：files 为虚拟文件系统，on() 注册命令应答，calls 记录所有调用
+
+    未注册的命令中，`cat <path>` 按 files 应答，其余返回 127
+    """
+
+    kind = 'mock'
+    CAT_RE = re.compile(r"^cat\s+(\S+)(\s+2>/dev/null)?$")
+
+    def __init__(self, node=None, files=None):
+        super().__init__(node or {'id': 'mock', 'host': 'mock'})
+        self.files = dict(files or {})  # path -> bytes
+        self.handlers = []
+        self.calls = []
+
+    def on(self, pattern, stdout='', rc=0, stderr='', handler=None):
+        """注册应答：handler(command, input) -> (rc, stdout, stderr)"""
+        self.handlers.append((re.compile(pattern), handler or (lambda command, input: (rc, stdout, stderr))))
+        return self
+
+    def exec(self, command, timeout=30, input=None):
+        self.calls.append(('exec', command))
+        for pattern, handler in self.handlers:
+            if pattern.search(command):
+                return handler(command, input)
+        m = self.CAT_RE.match(command.strip())
+        if m:
+            data = self.files.get(m.group(1))
+            if data is None:
+                return 1, '', f"cat: {m.group(1)}: No such file or directory"
+            return 0, data.decode(errors='replace'), ''
+        return 127, '', f"mock: 未定义的命令: {command}"
+
+    def exec_stream(self, command, sink, input=None, timeout=None):
+        if hasattr(input, 'read'):
+            input = input.read()
+        rc, out, err = self.exec(command, timeout, input)
+        sink.write(out.encode() if isinstance(out, str) else out)
+        return rc, err
+
+    def put(self, local_path, remote_path):
+        self.calls.append(('put', remote_path))
+        try:
+            with open(local_path, 'rb') as f:
+                self.files[remote_path] = f.read()
+            return True, ''
+        except OSError as e:
+            return False, str(e)
+
+    def get(self, remote_path, local_path):
+        self.calls.append(('get', remote_path))
+        if remote_path not in self.files:
+            return False, f"{remote_path}: No such file"
+        with open(local_path, 'wb') as f:
+            f.write(self.files[remote_path])
+        return True, ''
+
+    def stat(self, remote_path):
+        data = self.files.get(remote_path)
+        if data is None:
+            return None
+        return {'size': len(data), 'mtime': 0, 'mode': 0o100644, 'is_dir': False}
+
+
+TRANSPORTS = {
+    'local': LocalTransport,
+    'ssh': SSHSubprocessTransport,
+    'paramiko': ParamikoTransport,
+    'mock': MockTransport,
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def choose_kind(node):
+    """为节点选择传输实现"""
+    if node.get('transport'):
+        return node['transport']
+    if is_local_host(node['host']):
+        return 'local'
+    if node.get('sshPassword'):
+        return 'paramiko'  # ssh 子进程无法非交互地使用密码
+    return os.environ.get('OCM_TRANSPORT', 'ssh')
+
+
+def get_transport(node):
+    """获取节点的传输实例（按节点ID缓存，同一进程内复用连接）"""
+    with _cache_lock:
+        transport = _cache.get(node['id'])
+        if transport is None:
+            kind = choose_kind(node)
+            if kind not in TRANSPORTS:
+                raise ValueError(f"未知传输类型: {kind}")
+            transport = _cache[node['id']] = TRANSPORTS[kind](node)
+        return transport
+
+
+def register_transport(node_id, transport):
+    """为节点指定传输实例（测试时注入 MockTransport）"""
+    with _cache_lock:
+        _cache[node_id] = transport
+    return transport
+
+
+def close_all():
+    with _cache_lock:
+        transports = list(_cache.values())
+        _cache.clear()
+    for transport in transports:
+        try:
+            transport.close()
+        except Exception:
+            pass
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+OpenMetrics 文本格式导出器（仅依赖标准库）
+提供 Gauge/Counter/Histogram 三种指标和一个本地 /metrics HTTP 端点，
+供监控守护进程暴露集群健康数据和自身探测性能
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+# 探测耗时默认分桶(秒)：覆盖局域网SSH/HTTP的毫秒级到超时级
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    metric_type = 'unknown'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}  # label值元组 -> 数据
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}, 实际 {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def remove(self, **labels):
+        """删除匹配的序列（节点移出注册表时使用）；只给部分标签时删除这些标签值相同的全部序列"""
+        if set(labels) - set(self.labelnames):
+            raise ValueError(f"{self.name} 没有标签 {tuple(set(labels) - set(self.labelnames))}")
+        match = [(self.labelnames.index(n), str(v)) for n, v in labels.items()]
+        with self._lock:
+            for key in [k for k in self._values if all(k[i] == v for i, v in match)]:
+                del self._values[key]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f'# TYPE {self.name} {self.metric_type}', f'# HELP {self.name} {_escape(self.help)}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, data in items:
+            lines.extend(self._render_samples(key, data))
+        return lines
+
+
+class Gauge(_Metric):
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def _render_samples(self, key, value):
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _render_samples(self, key, value):
+        return [f'{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}']
+
+
+class Histogram(_Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data['counts'][i] += 1
+                    break
+            data['sum'] += value
+            data['count'] += 1
+
+    def _render_samples(self, key, data):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, data['counts']):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f'{self.name}_count{labels} {data["count"]}')
+        lines.append(f'{self.name}_sum{labels} {_format_value(data["sum"])}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，render() 输出完整的 OpenMetrics 文本"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []  # 抓取前调用的回调（用于队列深度等即时值）
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def remove(self, **labels):
+        """在所有带这些标签的指标中删除匹配的序列，如 remove(node='pc-a')"""
+        for metric in self._metrics:
+            if set(labels) <= set(metric.labelnames):
+                metric.remove(**labels)
+
+    def on_collect(self, callback):
+        self._collectors.append(callback)
+
+    def render(self):
+        for callback in self._collectors:
+            try:
+                callback()
+            except Exception:
+                pass
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """在后台线程中提供 GET /metrics"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9470):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._httpd = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # 抓取请求不写入监控输出
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, name='metrics-server', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
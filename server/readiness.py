@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Gateway 就绪检测 - 一次远程执行同时检查 systemd 状态、Gateway 端口和 /status
+重启/还原/安装等操作后按指数退避轮询，服务真正可用即返回并给出实测就绪耗时，
+替代固定 sleep
+"""
+
+import time
+
+SERVICE = 'openclaw-gateway'
+
+
+def probe_command(port, service=SERVICE):
+    """生成远程探测命令，输出: <systemd状态> <open|closed> <HTTP状态码|na>"""
+    return (
+        f"s=$(systemctl --user is-active {service} 2>/dev/null); "
+        f"p=$( (exec 3<>/dev/tcp/127.0.0.1/{port}) 2>/dev/null && echo open || echo closed); "
+        f"if command -v curl >/dev/null 2>&1; then "
+        f"h=$(curl -s -o /dev/null -m 3 -w '%{{http_code}}' http://127.0.0.1:{port}/status 2>/dev/null); "
+        f"else h=na; fi; "
+        f"echo \"${{s:-unknown}} $p ${{h:-000}}\""
+    )
+
+
+def parse_probe(output):
+    parts = (output.strip().splitlines() or [''])[-1].split()
+    parts += ['unknown'] * (3 - len(parts))
+    return {'service': parts[0], 'port_open': parts[1] == 'open', 'http': parts[2]}
+
+
+def is_ready(probe, require_http=True):
+    """服务 active、端口在监听、/status 返回 2xx（节点无 curl 或 require_http=False 时以端口为准）"""
+    http_ok = not require_http or probe['http'] == 'na' or probe['http'].startswith('2')
+    return probe['service'] == 'active' and probe['port_open'] and http_ok
+
+
+def describe(probe):
+    return f"service={probe['service']}, port={'open' if probe['port_open'] else 'closed'}, http={probe['http']}"
+
+
+def backoff_delays(initial=0.25, factor=2.0, max_interval=4.0):
+    """指数退避间隔: 0.25, 0.5, 1, 2, 4, 4, ..."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * factor, max_interval)
+
+
+def ssh_runner(ssh):
+    """把 paramiko SSHClient 适配成 run(command, timeout) -> (ok, stdout, stderr)"""
+    def run(command, timeout):
+        try:
+            stdin, stdout, stderr = ssh.exec_command(command, timeout=timeout)
+            out = stdout.read().decode(errors='replace')
+            return stdout.channel.recv_exit_status() == 0, out, stderr.read().decode(errors='replace')
+        except Exception as e:
+            return False, '', str(e)
+    return run
+
+
+def wait_ready(run, port, timeout=60, service=SERVICE, require_http=True, initial=0.25, max_interval=4.0):
+    """按指数退避轮询直到就绪或超时
+
+    run(command, timeout) -> (ok, stdout, stderr)，即 ocm-nodes.py 的 ssh_cmd 形式
+    返回 (ready, 实测耗时秒, 最后一次探测结果)
+    """
+    start = time.time()
+    deadline = start + timeout
+    probe = {'service': 'unknown', 'port_open': False, 'http': '000'}
+    delays = backoff_delays(initial, max_interval=max_interval)
+    while True:
+        ok, out, _ = run(probe_command(port, service), 10)
+        if ok:
+            probe = parse_probe(out)
+            if is_ready(probe, require_http):
+                return True, time.time() - start, probe
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False, time.time() - start, probe
+        time.sleep(min(next(delays), remaining))
+
+
+def wait_stopped(run, timeout=30, service=SERVICE, initial=0.1, max_interval=2.0):
+    """等待服务停止 (is-active 不再是 active/deactivating)，返回 (stopped, 耗时秒)"""
+    start = time.time()
+    deadline = start + timeout
+    delays = backoff_delays(initial, max_interval=max_interval)
+    while True:
+        _, out, _ = run(f"systemctl --user is-active {service} 2>/dev/null || true", 10)
+        if out.strip() not in ('active', 'deactivating', 'reloading'):
+            return True, time.time() - start
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            return False, time.time() - start
+        time.sleep(min(next(delays), remaining))
@@ -4,125 +4,190 @@
 """
 import os
 import json
+import shlex
 import tarfile
 import subprocess
 import sqlite3
 import time
-import paramiko
 from datetime import datetime
 
+import backup_profiles
+import readiness
+import resumable_transfer
+import sftp_pipeline
+from node_inventory import shared_sessions
+from tar_stats import TarStreamStats
+
+# 硬链接快照中需要换成真实拷贝的文件: Gateway 原地写入/追加的配置、会话、记忆和数据库
+SNAPSHOT_COPY_PATTERNS = ('*.json', '*.jsonl', '*.md', '*.txt', '*.sqlite', '*.sqlite-*', '*.db', '*.db-*')
+
 class OpenClawBackupSystem:
     def __init__(self, db_path):
         self.db_path = db_path
         self.backup_dir = "/home/linou/shared/ocm-project/server/backups"
         
-        # OpenClaw节点配置
-        self.nodes = {
-            "pc-a": {
-                "host": "192.168.3.73", 
-                "user": "openclaw01", 
-                "password": "Niejing0221",
-                "openclaw_dir": "/home/openclaw01/.openclaw",
-                "config_path": "/home/openclaw01/.openclaw/openclaw.json"
-            },
-            "t440": {
-                "host": "192.168.3.33", 
-                "user": "linou", 
-                "password": "Niejing0221",
-                "openclaw_dir": "/home/linou/.openclaw", 
-                "config_path": "/home/linou/.openclaw/openclaw.json"
-            },
-            "baota": {
-                "host": "192.168.3.11", 
-                "user": "linou", 
-                "password": "Niejing@0221",
-                "openclaw_dir": "/home/linou/.openclaw",
-                "config_path": "/home/linou/.openclaw/openclaw.json"
-            }
-        }
+        # 节点清单与SSH会话来自共享缓存（nodes-registry.json / nodes 表），同一进程内复用连接
+        self.sessions = shared_sessions(db_path)
+        self.nodes = self.sessions.inventory
     
     def create_ssh_client(self, node_config):
-        """创建SSH客户端"""
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            node_config["host"], 
-            username=node_config["user"], 
-            password=node_config["password"]
-        )
-        return ssh
+        """获取节点的SSH客户端（共享会话缓存，调用方不要关闭）"""
+        return self.sessions.client(node_config["id"])
+    
+    def _snapshot_script(self, src, snap):
+        """节点上执行的快照脚本：优先 reflink (写时复制，快照与原目录互不影响)；
+        不支持时硬链接快照整个目录，再把 Gateway 会原地写入的文件 (配置、会话 .jsonl、记忆 .md、sqlite)
+        换成校验过的真实拷贝，避免追加/原地改写改到快照；都不支持时整体复制"""
+        names = ' -o '.join(f"-name {shlex.quote(p)}" for p in SNAPSHOT_COPY_PATTERNS)
+        return f"""set -e
+src={shlex.quote(src)}; snap={shlex.quote(snap)}
+rm -rf "$snap"
+probe="$snap.reflink-probe"
+if cp --reflink=always "$src/openclaw.json" "$probe" 2>/dev/null; then
+  rm -f "$probe"; cp -a --reflink=always "$src" "$snap"; echo reflink; exit 0
+fi
+if ! cp -al "$src" "$snap" 2>/dev/null; then rm -rf "$snap"; cp -a "$src" "$snap"; echo copy; exit 0; fi
+cd "$src"
+find . \\( {names} \\) -type f -not -path '*/node_modules/*' -not -path '*/.git/*' | while IFS= read -r f; do
+  for i in 1 2 3; do
+    cp --remove-destination -p "$f" "$snap/$f"
+    [ "$(sha256sum < "$f")" = "$(sha256sum < "$snap/$f")" ] && break
+    sleep 0.2
+  done
+done
+echo hardlink
+"""
+    
+    def _remote(self, node_config):
+        """可续传传输用的远端 (重试时重新取，断线会自动重连)"""
+        channels = sftp_pipeline.default_channels(node_config)
+        return lambda: resumable_transfer.SFTPRemote(self.sessions.client(node_config["id"]), channels)
     
-    def backup_node(self, node_id, backup_type="manual", note=""):
-        """真实备份节点"""
+    def _download_with_stats(self, node_config, remote_path, local_path):
+        """可续传下载备份包，数据块同时喂给 TarStreamStats"""
+        stats = TarStreamStats()
+        transfer = resumable_transfer.download(self._remote(node_config), remote_path, local_path,
+                                               node=node_config, on_chunk=stats.feed)
+        print(sftp_pipeline.describe(transfer, "下载完成: "))
+        return stats.result()
+    
+    def _ensure_stats_column(self, db):
+        """旧库没有 backups.content_stats 列时补上"""
+        columns = [row[1] for row in db.execute("PRAGMA table_info(backups)")]
+        if "content_stats" not in columns:
+            db.execute("ALTER TABLE backups ADD COLUMN content_stats TEXT")
+    
+    def backup_node(self, node_id, backup_type="manual", note="", online=True, profile=None):
+        """真实备份节点
+
+        online=True (默认): 在同一文件系统上做快照后从快照打包，Gateway 不停机；
+        online=False: 停止 Gateway 打包，打包完成后立即启动（下载期间不再停机）
+        profile: 备份方案名 (见 backup_profiles)，默认用节点的 backupProfile 或 full
+        """
         if node_id not in self.nodes:
             raise ValueError(f"Unknown node: {node_id}")
         
         node_config = self.nodes[node_id]
+        profile_name, profile_rules = backup_profiles.resolve_profile(profile, self.nodes.registry(), node_config)
         timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S-%f")[:-3] + "Z"
         backup_filename = f"{node_id}_{timestamp}.tar.gz"
         backup_path = os.path.join(self.backup_dir, backup_filename)
+        openclaw_dir = node_config['openclaw_dir'].rstrip('/')
+        snap_dir = f"{os.path.dirname(openclaw_dir)}/.ocm-snapshot-{timestamp}"
+        stopped = False
+        downtime = 0.0
         
         try:
             ssh = self.create_ssh_client(node_config)
+            run = readiness.ssh_runner(ssh)
             
-            # 1. 停止OpenClaw服务 (如果是systemd)
-            print(f"停止 {node_id} OpenClaw服务...")
-            ssh.exec_command("systemctl --user stop openclaw-gateway 2>/dev/null || true")
-            time.sleep(2)
-            
-            # 2. 获取git commit (如果有)
-            stdin, stdout, stderr = ssh.exec_command(f"cd {node_config['openclaw_dir']} && git rev-parse --short HEAD 2>/dev/null || echo 'no-git'")
+            # 1. 获取git commit (如果有)
+            stdin, stdout, stderr = ssh.exec_command(f"cd {openclaw_dir} && git rev-parse --short HEAD 2>/dev/null || echo 'no-git'")
             git_commit = stdout.read().decode().strip()
             
-            # 3. 创建远程tar包
+            # 2. 准备打包源：在线快照，或停止服务
+            if online:
+                print(f"创建 {node_id} 在线快照: {snap_dir}")
+                ok, out, err = run(self._snapshot_script(openclaw_dir, snap_dir), 600)
+                if not ok:
+                    raise Exception(f"快照失败: {err.strip()}")
+                print(f"快照完成 ({out.strip().splitlines()[-1] if out.strip() else 'unknown'})")
+                tar_source = snap_dir
+            else:
+                print(f"停止 {node_id} OpenClaw服务...")
+                stop_at = time.time()
+                stopped = True
+                run("systemctl --user stop openclaw-gateway 2>/dev/null || true", 30)
+                readiness.wait_stopped(run, timeout=30)
+                tar_source = openclaw_dir
+            
+            # 3. 按备份方案筛选文件，创建远程tar包
+            ok, listing, err = run(backup_profiles.list_command(tar_source), 300)
+            if not ok:
+                raise Exception(f"无法列出文件: {err.strip()}")
+            selected, selection = backup_profiles.select_files(backup_profiles.parse_listing(listing), profile_rules)
+            if not selected:
+                raise Exception(f"备份方案 {profile_name} 没有匹配到任何文件")
+            print(f"备份方案 {profile_name}: {selection['files']} 个文件 "
+                  f"({backup_profiles.format_size(selection['bytes'])})，排除 {selection['excluded_files']} 个")
             remote_backup_path = f"/tmp/{backup_filename}"
-            tar_cmd = f"cd {node_config['openclaw_dir']} && tar -czf {remote_backup_path} --exclude='*.log' --exclude='node_modules' --exclude='.git' ."
+            tar_cmd = f"cd {tar_source} && tar -czf {remote_backup_path} --warning=no-file-changed --null --no-recursion -T -"
             print(f"创建备份包: {tar_cmd}")
             stdin, stdout, stderr = ssh.exec_command(tar_cmd)
-            if stdout.channel.recv_exit_status() != 0:
-                raise Exception(f"备份失败: {stderr.read().decode()}")
+            stdin.write(''.join(f"{path}\0" for path in selected))
+            stdin.channel.shutdown_write()
+            tar_status = stdout.channel.recv_exit_status()
+            tar_error = stderr.read().decode()
             
-            # 4. 获取文件统计
-            stdin, stdout, stderr = ssh.exec_command(f"find {node_config['openclaw_dir']} -type f | wc -l")
-            file_count = int(stdout.read().decode().strip())
+            # 打包结束即恢复服务/清理快照，后续下载不影响Bot
+            if stopped:
+                print(f"重启 {node_id} OpenClaw服务...")
+                run("systemctl --user start openclaw-gateway 2>/dev/null || true", 30)
+                stopped = False
+                downtime = time.time() - stop_at
+            if online:
+                run(f"rm -rf {shlex.quote(snap_dir)}", 120)
             
-            stdin, stdout, stderr = ssh.exec_command(f"stat -f%z {remote_backup_path} 2>/dev/null || stat -c%s {remote_backup_path}")
-            total_size = int(stdout.read().decode().strip())
+            # 在线模式下 tar 退出码1表示打包期间有文件变化，归档仍然可用；停机打包时文件不应变化，1 也是错误
+            if tar_status not in ((0, 1) if online else (0,)):
+                raise Exception(f"备份失败: {tar_error}")
             
-            # 5. 下载备份文件
+            # 4. 下载备份文件，文件数/大小/目录分布在下载过程中从 tar 流解析
             print(f"下载备份文件到 {backup_path}")
-            sftp = ssh.open_sftp()
-            sftp.get(remote_backup_path, backup_path)
-            sftp.close()
+            stats = self._download_with_stats(node_config, remote_backup_path, backup_path)
+            file_count = stats["file_count"]
+            total_size = stats["archive_bytes"]
             
-            # 6. 清理远程临时文件
+            # 5. 清理远程临时文件
             ssh.exec_command(f"rm -f {remote_backup_path}")
             
-            # 7. 重启OpenClaw服务
-            print(f"重启 {node_id} OpenClaw服务...")
-            ssh.exec_command("systemctl --user start openclaw-gateway 2>/dev/null || true")
-            
-            ssh.close()
-            
-            # 8. 记录到数据库
+            # 6. 记录到数据库
             db = sqlite3.connect(self.db_path)
+            self._ensure_stats_column(db)
             cur = db.cursor()
             cur.execute("""
-                INSERT INTO backups (node_id, git_commit, type, file_count, total_size, note, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (node_id, backup_filename, backup_type, file_count, total_size, note, int(time.time() * 1000)))
+                INSERT INTO backups (node_id, git_commit, type, file_count, total_size, note, content_stats, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (node_id, backup_filename, backup_type, file_count, total_size, note,
+                  json.dumps({"raw_bytes": stats["raw_bytes"], "by_dir": stats["by_dir"], "profile": profile_name}),
+                  int(time.time() * 1000)))
             backup_id = cur.lastrowid
             db.commit()
             db.close()
             
-            print(f"✅ 备份完成: {backup_filename} ({total_size} bytes, {file_count} files)")
-            return {"id": backup_id, "filename": backup_filename, "size": total_size}
+            print(f"✅ 备份完成: {backup_filename} ({total_size} bytes, {file_count} files, 停机 {downtime:.1f}s)")
+            return {"id": backup_id, "filename": backup_filename, "size": total_size, "profile": profile_name,
+                    "file_count": file_count, "raw_bytes": stats["raw_bytes"], "by_dir": stats["by_dir"],
+                    "mode": "online" if online else "offline", "downtime_seconds": round(downtime, 1)}
             
         except Exception as e:
             print(f"❌ 备份失败: {e}")
-            # 确保服务重启
+            # 确保服务重启、快照清理
             try:
-                ssh.exec_command("systemctl --user start openclaw-gateway 2>/dev/null || true") 
+                if stopped:
+                    ssh.exec_command("systemctl --user start openclaw-gateway 2>/dev/null || true")
+                if online:
+                    ssh.exec_command(f"rm -rf {shlex.quote(snap_dir)}")
             except:
                 pass
             raise
@@ -155,8 +220,9 @@ class OpenClawBackupSystem:
             
             # 1. 停止OpenClaw服务
             print(f"停止 {node_id} OpenClaw服务...")
-            ssh.exec_command("systemctl --user stop openclaw-gateway 2>/dev/null || true")
-            time.sleep(2)
+            run = readiness.ssh_runner(ssh)
+            run("systemctl --user stop openclaw-gateway 2>/dev/null || true", 30)
+            readiness.wait_stopped(run, timeout=30)
             
             # 2. 备份当前配置
             backup_current_cmd = f"cd {node_config['openclaw_dir']} && cp -r . /tmp/openclaw_current_backup_$(date +%s) 2>/dev/null || true"
@@ -165,9 +231,8 @@ class OpenClawBackupSystem:
             # 3. 上传备份文件
             remote_backup_path = f"/tmp/{backup_filename}"
             print(f"上传备份文件到 {node_config['host']}")
-            sftp = ssh.open_sftp()
-            sftp.put(backup_path, remote_backup_path)
-            sftp.close()
+            transfer = resumable_transfer.upload(self._remote(node_config), backup_path, remote_backup_path, node=node_config)
+            print(sftp_pipeline.describe(transfer, "上传完成: "))
             
             # 4. 清理现有目录并还原
             print(f"还原配置到 {node_config['openclaw_dir']}")
@@ -183,8 +248,6 @@ class OpenClawBackupSystem:
             print(f"重启 {node_id} OpenClaw服务...")
             ssh.exec_command("systemctl --user start openclaw-gateway 2>/dev/null || true")
             
-            ssh.close()
-            
             print(f"✅ 还原完成: {backup_filename}")
             return {"success": True, "message": f"已还原到 {backup_filename}"}
             
@@ -203,18 +266,21 @@ if __name__ == "__main__":
     
     if len(sys.argv) < 2:
         print("Usage:")
-        print("  python3 real_backup_system.py backup <node_id> [type] [note]")
+        print("  python3 real_backup_system.py backup <node_id> [type] [note] [--offline] [--profile=config|bots|full]")
         print("  python3 real_backup_system.py restore <node_id> <backup_id>")
-        print("Available nodes: pc-a, t440, baota")
+        print(f"Available nodes: {', '.join(backup_system.nodes.ids())}")
         sys.exit(1)
     
     command = sys.argv[1]
     
     if command == "backup":
-        node_id = sys.argv[2]
-        backup_type = sys.argv[3] if len(sys.argv) > 3 else "manual"
-        note = sys.argv[4] if len(sys.argv) > 4 else ""
-        result = backup_system.backup_node(node_id, backup_type, note)
+        offline = "--offline" in sys.argv
+        profile = next((a.split("=", 1)[1] for a in sys.argv if a.startswith("--profile=")), None)
+        argv = [a for a in sys.argv if not a.startswith("--")]
+        node_id = argv[2]
+        backup_type = argv[3] if len(argv) > 3 else "manual"
+        note = argv[4] if len(argv) > 4 else ""
+        result = backup_system.backup_node(node_id, backup_type, note, online=not offline, profile=profile)
         print(f"Backup created: {result}")
         
     elif command == "restore":
@@ -7,46 +7,22 @@ import json
 import subprocess
 import sqlite3
 import time
-import paramiko
 from datetime import datetime
 
+import readiness
+from node_inventory import shared_sessions
+
 class RealNodeOperations:
     def __init__(self, db_path):
         self.db_path = db_path
         
-        # OpenClaw节点配置
-        self.nodes = {
-            "pc-a": {
-                "host": "192.168.3.73", 
-                "user": "openclaw01", 
-                "password": "Niejing0221",
-                "service_name": "openclaw-gateway"
-            },
-            "t440": {
-                "host": "192.168.3.33", 
-                "user": "linou", 
-                "password": "Niejing0221",
-                "service_name": "openclaw-gateway"
-            },
-            "baota": {
-                "host": "192.168.3.11", 
-                "user": "linou", 
-                "password": "Niejing@0221",
-                "service_name": "openclaw-gateway"
-            }
-        }
+        # 节点清单与SSH会话来自共享缓存（nodes-registry.json / nodes 表），同一进程内复用连接
+        self.sessions = shared_sessions(db_path)
+        self.nodes = self.sessions.inventory
     
     def create_ssh_client(self, node_config):
-        """创建SSH客户端"""
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            node_config["host"], 
-            username=node_config["user"], 
-            password=node_config["password"],
-            timeout=10
-        )
-        return ssh
+        """获取节点的SSH客户端（共享会话缓存，调用方不要关闭）"""
+        return self.sessions.client(node_config["id"])
     
     def restart_node(self, node_id):
         """真实重启OpenClaw节点服务"""
@@ -60,35 +36,37 @@ class RealNodeOperations:
             
             print(f"🔄 重启 {node_id} 节点...")
             
-            # 1. 停止服务
-            stdin, stdout, stderr = ssh.exec_command(f"systemctl --user stop {node_config['service_name']}")
-            time.sleep(3)
+            run = readiness.ssh_runner(ssh)
+            service = node_config['service_name']
+            
+            # 1. 停止服务，等到真正停止
+            run(f"systemctl --user stop {service}", 30)
+            readiness.wait_stopped(run, timeout=30, service=service)
             
             # 2. 重置失败状态
-            ssh.exec_command(f"systemctl --user reset-failed {node_config['service_name']}")
+            run(f"systemctl --user reset-failed {service}", 15)
             
             # 3. 重新加载配置
-            ssh.exec_command(f"systemctl --user daemon-reload")
+            run("systemctl --user daemon-reload", 15)
             
-            # 4. 启动服务
-            stdin, stdout, stderr = ssh.exec_command(f"systemctl --user start {node_config['service_name']}")
-            time.sleep(5)
+            # 4. 启动服务，轮询直到Gateway端口可用
+            run(f"systemctl --user start {service}", 30)
+            ready, elapsed, probe = readiness.wait_ready(run, node_config['gatewayPort'], timeout=60,
+                                                         service=service, require_http=False)
             
-            # 5. 检查服务状态
-            stdin, stdout, stderr = ssh.exec_command(f"systemctl --user is-active {node_config['service_name']}")
-            service_status = stdout.read().decode().strip()
+            # 5. 服务状态
+            service_status = probe['service']
             
-            ssh.close()
-            
-            success = service_status == "active"
-            message = f"✅ 重启成功" if success else f"❌ 重启失败，状态: {service_status}"
+            success = ready
+            message = f"✅ 重启成功 (就绪 {elapsed:.1f}s)" if success else f"❌ 重启失败，状态: {readiness.describe(probe)}"
             
             print(f"{node_id} 重启结果: {message}")
             
             return {
                 "success": success,
                 "message": message,
-                "service_status": service_status
+                "service_status": service_status,
+                "ready_seconds": round(elapsed, 1)
             }
             
         except Exception as e:
@@ -191,8 +169,6 @@ class RealNodeOperations:
                 category_scores[test['category']] = score
                 total_score += score
             
-            ssh.close()
-            
             # 4. 生成测试报告
             success = total_score >= 70
             message = f"✅ 智力测试完成" if success else f"⚠️ 智力测试需要改进"
@@ -229,7 +205,7 @@ if __name__ == "__main__":
         print("Usage:")
         print("  python3 real_node_operations.py restart <node_id>")
         print("  python3 real_node_operations.py test <node_id>")
-        print("Available nodes: pc-a, t440, baota")
+        print(f"Available nodes: {', '.join(operations.nodes.ids())}")
         sys.exit(1)
     
     command = sys.argv[1]
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+远程文件原子写入 - 内容经 stdin 流式写入同目录临时文件，fsync 后 rename 覆盖目标
+
+  - 不再把整个文件 base64 后塞进命令行 (`echo '<b64>' | base64 -d > f`)，没有 ARG_MAX 限制
+  - 写到一半失败只会留下临时文件，目标文件要么是旧内容要么是新内容
+  - 乐观并发: read() 返回内容的 sha256，write(expect=...) 在改名前比对远端当前内容，
+    期间被 Web UI 或其他 CLI 改过则拒绝写入并抛出 WriteConflict
+  - 同一文件的写入在节点上用 flock 串行 (检查与改名之间不会插入另一个写入)
+  - 保留原文件权限 (openclaw.json / auth-profiles.json 含 token)
+
+transport 为 ocm_transport.Transport (exec_stream)。
+"""
+
+import hashlib
+import io
+import shlex
+
+ABSENT = 'absent'        # expect=ABSENT: 只在文件不存在时写入
+MISSING_RC = 44
+CONFLICT_RC = 45
+
+
+class WriteConflict(IOError):
+    """远端文件在读取之后被修改"""
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def read(transport, path, timeout=60):
+    """读取远端文件，返回 (内容 bytes, sha256)；文件不存在时返回 (None, ABSENT)"""
+    sink = io.BytesIO()
+    q = shlex.quote(path)
+    rc, err = transport.exec_stream(f"test -e {q} || exit {MISSING_RC}; cat {q}", sink, timeout=timeout)
+    if rc == MISSING_RC:
+        return None, ABSENT
+    if rc != 0:
+        raise IOError(err or f"读取失败: {path}")
+    data = sink.getvalue()
+    return data, digest(data)
+
+
+def write_command(path, expect=None, mkdir=False):
+    """stdin -> 临时文件 -> fsync -> (比对 sha256) -> rename -> fsync 目录"""
+    q = shlex.quote(path)
+    check = ''
+    if expect == ABSENT:
+        check = f'if [ -e "$f" ]; then rm -f "$tmp"; echo "文件已存在" >&2; exit {CONFLICT_RC}; fi; '
+    elif expect:
+        check = (f'cur=$(sha256sum "$f" 2>/dev/null | cut -d" " -f1); '
+                 f'if [ "$cur" != {shlex.quote(expect)} ]; then rm -f "$tmp"; '
+                 f'echo "文件已被修改: ${{cur:-已删除}}" >&2; exit {CONFLICT_RC}; fi; ')
+    mk = 'mkdir -p "$d" || exit 1; ' if mkdir else ''
+    return (
+        f'f={q}; d=$(dirname "$f"); {mk}'
+        f'tmp="$d/.$(basename "$f").ocm-tmp.$$"; '
+        f'lock="${{TMPDIR:-/tmp}}/ocm-$(id -u)-$(printf %s "$f" | sha256sum | cut -c1-16).lock"; '
+        f'if command -v flock >/dev/null; then exec 9>"$lock"; flock -w 30 9 || exit 1; fi; '
+        f'cat > "$tmp" || {{ rm -f "$tmp"; exit 1; }}; '
+        f'sync "$tmp" 2>/dev/null; '
+        f'{check}'
+        f'[ -e "$f" ] && chmod --reference="$f" "$tmp" 2>/dev/null; '
+        f'mv -f "$tmp" "$f" && {{ sync "$d" 2>/dev/null; true; }}'
+    )
+
+
+def write(transport, path, data, expect=None, mkdir=False, timeout=120):
+    """原子写入远端文件，返回新内容的 sha256
+
+    expect: read() 得到的 sha256 (或 ABSENT)，远端内容不一致时抛出 WriteConflict；None 表示不检查
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    rc, err = transport.exec_stream(write_command(path, expect, mkdir), io.BytesIO(), input=data, timeout=timeout)
+    if rc == CONFLICT_RC:
+        raise WriteConflict(f"{path}: {(err or '').strip() or '远端文件已被修改'}")
+    if rc != 0:
+        raise IOError(err or f"写入失败: {path}")
+    return digest(data)
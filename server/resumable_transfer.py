@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+可续传文件传输 - 固定大小分块、按偏移记录断点、每块 sha256，节点级令牌桶限速
+
+连接中断后自动重连并从最后一个校验通过的块继续；进程退出后再次传输同一文件
+（源文件大小和修改时间未变）也会从断点续传。断点记录在 OCM_TRANSFER_STATE
+（默认 ~/.ocm/transfers）下，下载中的数据写在 <目标>.part，完成后改名。
+
+远端访问有两种实现:
+  SFTPRemote       paramiko 流水线 SFTP（sftp_pipeline，real_backup_system / smart_restore_system）
+  TransportRemote  ocm_transport 的 exec/exec_stream（ocm-nodes.py 的 ssh 子进程连接）
+
+限速: 节点注册表字段 bandwidthLimit（每秒字节数，可写 "10M"），或环境变量
+OCM_BANDWIDTH_LIMIT；同一节点的并发传输共用一个令牌桶。
+"""
+
+import hashlib
+import io
+import json
+import os
+import shlex
+import threading
+import time
+
+import sftp_pipeline
+from backup_profiles import parse_size
+
+CHUNK_SIZE = int(os.environ.get('OCM_TRANSFER_CHUNK', 4 * 1024 * 1024))
+STATE_DIR = os.environ.get('OCM_TRANSFER_STATE', os.path.expanduser('~/.ocm/transfers'))
+RETRIES = 5
+
+
+class TokenBucket:
+    """令牌桶：rate 字节/秒，允许 burst 字节的突发；消耗超过余额时睡眠补足"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(node):
+    """节点的令牌桶，未配置限速返回 None"""
+    if not node:
+        return None
+    limit = node.get('bandwidthLimit') or os.environ.get('OCM_BANDWIDTH_LIMIT')
+    if not limit:
+        return None
+    rate = parse_size(limit)
+    with _buckets_lock:
+        bucket = _buckets.get(node['id'])
+        if bucket is None or bucket.rate != rate:
+            bucket = _buckets[node['id']] = TokenBucket(rate)
+        return bucket
+
+
+class SFTPRemote:
+    """paramiko 适配：大窗口流水线 SFTP，可多通道并行 (见 sftp_pipeline)"""
+
+    def __init__(self, client, channels=1):
+        self.pool = sftp_pipeline.ChannelPool(client, channels)
+        self.channels = self.pool.size
+
+    def stat(self, path):
+        try:
+            st = self.pool.primary.stat(path)
+        except IOError:
+            return None
+        return {'size': st.st_size, 'mtime': int(st.st_mtime)}
+
+    def read(self, path, offset, length):
+        return self.pool.read(path, offset, length)
+
+    def truncate(self, path, size):
+        if self.stat(path) is None:
+            with self.pool.primary.open(path, 'wb'):
+                pass
+        self.pool.primary.truncate(path, size)
+
+    def write(self, path, offset, data):
+        self.pool.write(path, offset, data)
+
+    def rename(self, src, dst):
+        self.pool.primary.posix_rename(src, dst)
+
+    def close(self):
+        self.pool.close()
+
+
+class TransportRemote:
+    """ocm_transport.Transport 适配（每块一次远程命令，依赖连接复用；写入只支持顺序追加）"""
+
+    channels = 1
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    def stat(self, path):
+        st = self.transport.stat(path)
+        return {'size': st['size'], 'mtime': st['mtime']} if st else None
+
+    def read(self, path, offset, length):
+        sink = io.BytesIO()
+        rc, err = self.transport.exec_stream(
+            f"tail -c +{offset + 1} {shlex.quote(path)} | head -c {length}", sink, timeout=300)
+        if rc != 0:
+            raise IOError(err or f"读取失败: {path}")
+        return sink.getvalue()
+
+    def truncate(self, path, size):
+        rc, _, err = self.transport.exec(f"truncate -s {size} {shlex.quote(path)}", timeout=30)
+        if rc != 0:
+            raise IOError(err or f"truncate 失败: {path}")
+
+    def write(self, path, offset, data):
+        rc, err = self.transport.exec_stream(f"cat >> {shlex.quote(path)}", io.BytesIO(), input=data, timeout=300)
+        if rc != 0:
+            raise IOError(err or f"写入失败: {path}")
+
+    def rename(self, src, dst):
+        rc, _, err = self.transport.exec(f"mv -f {shlex.quote(src)} {shlex.quote(dst)}", timeout=30)
+        if rc != 0:
+            raise IOError(err or f"改名失败: {src}")
+
+    def close(self):
+        pass
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class Checkpoint:
+    """断点文件: 源文件标识 + 已完成块的 sha256 列表"""
+
+    def __init__(self, direction, node_id, src, dst):
+        key = hashlib.sha1(f"{direction}:{node_id}:{src}:{dst}".encode()).hexdigest()[:16]
+        self.path = os.path.join(STATE_DIR, f"{direction}-{node_id}-{key}.json")
+        self.state = None
+
+    def load(self, source, chunk_size):
+        """源文件大小/mtime/块大小一致时返回已完成块的哈希列表"""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+        if not state or state.get('source') != source or state.get('chunk_size') != chunk_size:
+            state = {'source': source, 'chunk_size': chunk_size, 'hashes': []}
+        self.state = state
+        return state['hashes']
+
+    def save(self):
+        os.makedirs(STATE_DIR, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _retrying(open_remote, step, retries):
+    """执行 step(remote)，连接类错误时重新打开远端并重试（step 自己从断点继续）"""
+    last = None
+    for attempt in range(retries):
+        remote = None
+        try:
+            remote = open_remote()
+            return step(remote), remote.channels
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            last = e
+        finally:
+            if remote is not None:
+                remote.close()
+        print(f"  ⚠ 传输中断 ({last})，{attempt + 1}/{retries} 次重试，从断点继续...")
+        time.sleep(min(2 ** attempt, 10))
+    raise IOError(f"传输失败，已重试 {retries} 次: {last}")
+
+
+def download(open_remote, remote_path, local_path, node=None, chunk_size=CHUNK_SIZE, on_chunk=None,
+             retries=RETRIES):
+    """可续传下载。open_remote() 返回 SFTPRemote/TransportRemote（重试时重新调用以重连）
+
+    on_chunk(data) 按顺序收到文件的全部数据（续传时先回放本地已完成部分），用于流式统计
+    返回 {'bytes', 'resumed_from', 'seconds', 'channels'}
+    """
+    node_id = (node or {}).get('id', 'local')
+    checkpoint = Checkpoint('get', node_id, remote_path, local_path)
+    part = f"{local_path}.part"
+    bucket = bucket_for(node)
+    start = time.time()
+    result = {'fed': 0}
+
+    def feed(index, data):
+        # 重试时不重复回放已交给 on_chunk 的块
+        if on_chunk and index >= result['fed']:
+            on_chunk(data)
+            result['fed'] = index + 1
+
+    def step(remote):
+        st = remote.stat(remote_path)
+        if st is None:
+            raise FileNotFoundError(f"远程文件不存在: {remote_path}")
+        hashes = checkpoint.load([st['size'], st['mtime']], chunk_size)
+        # 校验本地已完成的块，截断到最后一个完好的块
+        good = 0
+        if os.path.exists(part):
+            with open(part, 'rb') as f:
+                for digest in hashes:
+                    data = f.read(chunk_size)
+                    if _sha256(data) != digest:
+                        break
+                    feed(good, data)
+                    good += 1
+        del hashes[good:]
+        # 最后一块通常不满 chunk_size，偏移不能超过源文件大小 (否则 truncate 会补零)
+        offset = min(good * chunk_size, st['size'])
+        result.setdefault('resumed_from', offset)
+        with open(part, 'r+b' if os.path.exists(part) else 'wb') as out:
+            out.truncate(offset)
+            out.seek(offset)
+            while offset < st['size']:
+                length = min(chunk_size, st['size'] - offset)
+                if bucket:
+                    bucket.consume(length)
+                data = remote.read(remote_path, offset, length)
+                if len(data) != length:
+                    raise IOError(f"块读取不完整: {len(data)}/{length} @ {offset}")
+                out.write(data)
+                out.flush()
+                os.fsync(out.fileno())
+                hashes.append(_sha256(data))
+                checkpoint.save()
+                feed(len(hashes) - 1, data)
+                offset += length
+        os.replace(part, local_path)
+        checkpoint.clear()
+        return st['size']
+
+    size, channels = _retrying(open_remote, step, retries)
+    return {'bytes': size, 'resumed_from': result.get('resumed_from', 0), 'seconds': round(time.time() - start, 2),
+            'channels': channels}
+
+
+def upload(open_remote, local_path, remote_path, node=None, chunk_size=CHUNK_SIZE, retries=RETRIES):
+    """可续传上传：写入 <远程路径>.part，完成后改名。返回 {'bytes', 'resumed_from', 'seconds', 'channels'}"""
+    node_id = (node or {}).get('id', 'local')
+    checkpoint = Checkpoint('put', node_id, local_path, remote_path)
+    part = f"{remote_path}.part"
+    st = os.stat(local_path)
+    bucket = bucket_for(node)
+    start = time.time()
+    result = {}
+
+    def step(remote):
+        hashes = checkpoint.load([st.st_size, int(st.st_mtime)], chunk_size)
+        remote_st = remote.stat(part)
+        done = min(len(hashes), (remote_st['size'] if remote_st else 0) // chunk_size)
+        # 远端最后一块回读校验，不一致则从头开始
+        if done:
+            last = remote.read(part, (done - 1) * chunk_size, chunk_size)
+            if _sha256(last) != hashes[done - 1]:
+                done = 0
+        del hashes[done:]
+        offset = done * chunk_size
+        result.setdefault('resumed_from', offset)
+        remote.truncate(part, offset)
+        with open(local_path, 'rb') as f:
+            f.seek(offset)
+            while offset < st.st_size:
+                data = f.read(chunk_size)
+                if bucket:
+                    bucket.consume(len(data))
+                remote.write(part, offset, data)
+                hashes.append(_sha256(data))
+                checkpoint.save()
+                offset += len(data)
+        written = remote.stat(part)
+        if not written or written['size'] != st.st_size:
+            raise IOError(f"远程文件大小不一致: {written and written['size']} != {st.st_size}")
+        remote.rename(part, remote_path)
+        checkpoint.clear()
+        return st.st_size
+
+    size, channels = _retrying(open_remote, step, retries)
+    return {'bytes': size, 'resumed_from': result.get('resumed_from', 0), 'seconds': round(time.time() - start, 2),
+            'channels': channels}
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+高吞吐 SFTP 传输 - 大窗口通道、流水线读写、可选多通道并行、吞吐统计
+
+paramiko 默认的 sftp.get/put 窗口只有 2MB，读写按 32KB 请求逐个往返，局域网下远低于线速。
+这里:
+  - SFTP 通道以大窗口打开 (OCM_SFTP_WINDOW，默认 64MB)
+  - 读: readv 一次性发出整段范围的所有请求再按序收取
+  - 写: set_pipelined 后连续发送写请求，关闭文件时统一确认
+  - 大块数据按 ChannelPool 的通道数拆成多个范围并行传输
+    (节点字段 sftpChannels 或环境变量 OCM_SFTP_CHANNELS，默认 1 即不拆分)
+
+resumable_transfer.SFTPRemote 基于此实现，备份/还原各路径都经由它传输。
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+WINDOW_SIZE = int(os.environ.get('OCM_SFTP_WINDOW', 64 * 1024 * 1024))
+MIN_PART = 1024 * 1024
+
+
+def default_channels(node=None):
+    return max(1, int((node or {}).get('sftpChannels') or os.environ.get('OCM_SFTP_CHANNELS', 1)))
+
+
+def open_sftp(client, window_size=WINDOW_SIZE):
+    """在已有 SSH 连接上打开一个大窗口的 SFTP 通道"""
+    import paramiko
+    return paramiko.SFTPClient.from_transport(client.get_transport(), window_size=window_size)
+
+
+def read_range(sftp, path, offset, length):
+    """流水线读取 [offset, offset+length)"""
+    if length <= 0:
+        return b''
+    with sftp.open(path, 'rb') as f:
+        return b''.join(f.readv([(offset, length)]))
+
+
+def write_range(sftp, path, offset, data):
+    """流水线写入到 offset 处（文件需已存在）"""
+    with sftp.open(path, 'r+b') as f:
+        f.set_pipelined(True)
+        f.seek(offset)
+        f.write(data)
+
+
+def split_range(offset, length, parts, min_part=MIN_PART):
+    """把一段范围拆成最多 parts 份，每份不小于 min_part"""
+    parts = max(1, min(parts, length // min_part or 1))
+    step = -(-length // parts)
+    return [(o, min(step, offset + length - o)) for o in range(offset, offset + length, step)]
+
+
+class ChannelPool:
+    """同一 SSH 连接上的一组 SFTP 通道，第一个用于元数据操作，其余按需打开"""
+
+    def __init__(self, client, channels=1, window_size=WINDOW_SIZE):
+        self.client = client
+        self.size = max(1, channels)
+        self.window_size = window_size
+        self._idle = queue.Queue()
+        self._opened = []
+        self._lock = threading.Lock()
+        self.primary = self._open()
+        self._idle.put(self.primary)
+
+    def _open(self):
+        sftp = open_sftp(self.client, self.window_size)
+        with self._lock:
+            self._opened.append(sftp)
+        return sftp
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                spare = len(self._opened) < self.size
+            return self._open() if spare else self._idle.get()
+
+    def run(self, fn, items):
+        """fn(sftp, item) 在各通道上并行执行，按 items 顺序返回结果"""
+        if len(items) <= 1 or self.size == 1:
+            return [fn(self.primary, item) for item in items]
+
+        def task(item):
+            sftp = self._acquire()
+            try:
+                return fn(sftp, item)
+            finally:
+                self._idle.put(sftp)
+
+        with ThreadPoolExecutor(max_workers=min(self.size, len(items))) as pool:
+            return list(pool.map(task, items))
+
+    def read(self, path, offset, length):
+        ranges = split_range(offset, length, self.size)
+        return b''.join(self.run(lambda sftp, r: read_range(sftp, path, *r), ranges))
+
+    def write(self, path, offset, data):
+        ranges = split_range(offset, len(data), self.size)
+        self.run(lambda sftp, r: write_range(sftp, path, r[0], data[r[0] - offset:r[0] - offset + r[1]]), ranges)
+
+    def close(self):
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for sftp in opened:
+            try:
+                sftp.close()
+            except Exception:
+                pass
+
+
+def describe(result, label=''):
+    """吞吐报告: '↓ 123.4MB 2.1s 58.8MB/s (4 通道, 断点 16.0MB)'"""
+    mb = (result['bytes'] - result.get('resumed_from', 0)) / 1024 / 1024
+    seconds = max(result.get('seconds') or 0, 1e-6)
+    text = f"{label}{mb:.1f}MB {seconds:.1f}s {mb / seconds:.1f}MB/s"
+    extras = []
+    if result.get('channels', 1) > 1:
+        extras.append(f"{result['channels']} 通道")
+    if result.get('resumed_from'):
+        extras.append(f"断点 {result['resumed_from'] / 1024 / 1024:.1f}MB")
+    return text + (f" ({', '.join(extras)})" if extras else '')
+
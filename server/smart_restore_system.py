@@ -8,11 +8,16 @@ import tarfile
 import subprocess
 import sqlite3
 import time
-import paramiko
 import shutil
 from datetime import datetime
 from enum import Enum
 
+import gateway_reload
+import readiness
+import resumable_transfer
+import sftp_pipeline
+from node_inventory import shared_sessions
+
 class RestoreStrategy(Enum):
     CONFIG_ONLY = "config_only"           # 仅还原配置文件
     SERVICE_RESTART = "service_restart"   # 重启服务
@@ -34,42 +39,21 @@ class SmartRestoreSystem:
         self.db_path = db_path
         self.backup_dir = "/home/linou/shared/ocm-project/server/backups"
         
-        # OpenClaw节点配置
-        self.nodes = {
-            "pc-a": {
-                "host": "192.168.3.73", 
-                "user": "openclaw01", 
-                "password": "Niejing0221",
-                "openclaw_dir": "/home/openclaw01/.openclaw",
-                "service_name": "openclaw-gateway"
-            },
-            "t440": {
-                "host": "192.168.3.33", 
-                "user": "linou", 
-                "password": "Niejing0221",
-                "openclaw_dir": "/home/linou/.openclaw",
-                "service_name": "openclaw-gateway"
-            },
-            "baota": {
-                "host": "192.168.3.11", 
-                "user": "linou", 
-                "password": "Niejing@0221",
-                "openclaw_dir": "/home/linou/.openclaw",
-                "service_name": "openclaw-gateway"
-            }
-        }
+        # 节点清单与SSH会话来自共享缓存（nodes-registry.json / nodes 表），同一进程内复用连接
+        self.sessions = shared_sessions(db_path)
+        self.nodes = self.sessions.inventory
     
     def create_ssh_client(self, node_config):
-        """创建SSH客户端"""
-        ssh = paramiko.SSHClient()
-        ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-        ssh.connect(
-            node_config["host"], 
-            username=node_config["user"], 
-            password=node_config["password"],
-            timeout=10
-        )
-        return ssh
+        """获取节点的SSH客户端（共享会话缓存，调用方不要关闭）"""
+        return self.sessions.client(node_config["id"])
+    
+    def _upload(self, node_config, local_path, remote_path):
+        """可续传上传 (同一备份包中断后再次还原会从断点继续)"""
+        channels = sftp_pipeline.default_channels(node_config)
+        open_remote = lambda: resumable_transfer.SFTPRemote(self.sessions.client(node_config["id"]), channels)
+        transfer = resumable_transfer.upload(open_remote, local_path, remote_path, node=node_config)
+        print(sftp_pipeline.describe(transfer, "上传完成: "))
+        return transfer
     
     def diagnose_failure(self, node_id):
         """诊断节点故障类型"""
@@ -125,7 +109,6 @@ class SmartRestoreSystem:
             if stdout.channel.recv_exit_status() == 0:
                 return FailureType.DISK_FULL, failure_details + ["Disk usage >90%"]
             
-            ssh.close()
             return FailureType.UNKNOWN, failure_details + ["Unknown issue - service appears healthy"]
             
         except Exception as e:
@@ -222,65 +205,75 @@ class SmartRestoreSystem:
                 
         except Exception as e:
             return {"success": False, "message": f"Restore failed: {str(e)}"}
-        finally:
-            try:
-                ssh.close()
-            except:
-                pass
+    
+    def _stop_service(self, ssh, node_config):
+        """停止服务并等到真正停止"""
+        run = readiness.ssh_runner(ssh)
+        run(f"systemctl --user stop {node_config['service_name']}", 30)
+        return readiness.wait_stopped(run, timeout=30, service=node_config['service_name'])
+    
+    def _start_and_wait(self, ssh, node_config, action='start', timeout=60):
+        """启动/重启服务，轮询直到Gateway端口可用，返回 (ready, 耗时秒, 探测结果)"""
+        run = readiness.ssh_runner(ssh)
+        run(f"systemctl --user {action} {node_config['service_name']}", 30)
+        return readiness.wait_ready(run, node_config['gatewayPort'], timeout=timeout,
+                                    service=node_config['service_name'], require_http=False)
+    
+    def _ready_text(self, ready, elapsed, probe):
+        return f"Gateway就绪 {elapsed:.1f}s" if ready else f"Gateway未就绪: {readiness.describe(probe)}"
+    
+    def _extract_config(self, ssh, node_config, backup_path):
+        """上传备份，只取出 openclaw.json，经临时文件改名原子替换 (Gateway 不会读到写了一半的配置)"""
+        remote_backup = f"/tmp/restore_{os.path.basename(backup_path)}"
+        self._upload(node_config, backup_path, remote_backup)
+        target = f"{node_config['openclaw_dir']}/openclaw.json"
+        stdin, stdout, stderr = ssh.exec_command(f"""
+            cd /tmp && 
+            tar -tf {remote_backup} | grep 'openclaw.json$' | head -1 | xargs tar -xzf {remote_backup} &&
+            cp openclaw.json {target}.ocm-restore &&
+            mv -f {target}.ocm-restore {target} &&
+            rm -f {remote_backup} openclaw.json
+        """)
+        if stdout.channel.recv_exit_status() != 0:
+            return stderr.read().decode() or "Config extraction failed"
+        return None
     
     def _restore_config_only(self, ssh, node_config, backup_path):
-        """仅还原配置文件"""
+        """仅还原配置文件: 不停服务，换好配置后优先热重载，不支持时才重启"""
         try:
-            # 停止服务
-            ssh.exec_command(f"systemctl --user stop {node_config['service_name']}")
-            time.sleep(2)
-            
-            # 上传并解压备份，只还原配置文件
-            remote_backup = f"/tmp/restore_{int(time.time())}.tar.gz"
-            sftp = ssh.open_sftp()
-            sftp.put(backup_path, remote_backup)
-            sftp.close()
-            
-            # 只提取配置文件
-            stdin, stdout, stderr = ssh.exec_command(f"""
-                cd /tmp && 
-                tar -tf {remote_backup} | grep 'openclaw.json$' | head -1 | xargs tar -xzf {remote_backup} &&
-                cp openclaw.json {node_config['openclaw_dir']}/openclaw.json &&
-                rm -f {remote_backup} openclaw.json
-            """)
+            err = self._extract_config(ssh, node_config, backup_path)
+            if err:
+                return {"success": False, "message": f"Config extraction failed: {err}"}
             
-            if stdout.channel.recv_exit_status() != 0:
-                return {"success": False, "message": f"Config extraction failed: {stderr.read().decode()}"}
+            # 让Gateway加载新配置 (服务未运行时 signal 不可用，直接走 restart)
+            result = gateway_reload.apply_config(readiness.ssh_runner(ssh), node_config)
             
-            # 重启服务
-            ssh.exec_command(f"systemctl --user start {node_config['service_name']}")
-            time.sleep(3)
-            
-            return {"success": True, "message": "✅ 配置文件还原完成"}
+            return {"success": result['ok'], "message": f"✅ 配置文件还原完成 ({gateway_reload.describe(result)})"
+                    if result['ok'] else f"配置已还原但Gateway未恢复: {gateway_reload.describe(result)}"}
             
         except Exception as e:
             return {"success": False, "message": f"Config restore failed: {str(e)}"}
     
     def _restore_with_restart(self, ssh, node_config, backup_path):
         """还原配置并强制重启"""
-        # 先尝试配置还原
-        result = self._restore_config_only(ssh, node_config, backup_path)
-        if not result["success"]:
-            return result
-        
         try:
+            self._stop_service(ssh, node_config)
+            err = self._extract_config(ssh, node_config, backup_path)
+            if err:
+                return {"success": False, "message": f"Config extraction failed: {err}"}
+            
             # 强制重启所有相关服务
-            ssh.exec_command(f"systemctl --user daemon-reload")
-            ssh.exec_command(f"systemctl --user reset-failed {node_config['service_name']}")
-            ssh.exec_command(f"systemctl --user restart {node_config['service_name']}")
-            time.sleep(5)
+            run = readiness.ssh_runner(ssh)
+            run("systemctl --user daemon-reload", 15)
+            run(f"systemctl --user reset-failed {node_config['service_name']}", 15)
+            ready, elapsed, probe = self._start_and_wait(ssh, node_config, action='restart')
             
-            return {"success": True, "message": "✅ 配置还原+服务重启完成"}
+            return {"success": True, "message": f"✅ 配置还原+服务重启完成 ({self._ready_text(ready, elapsed, probe)})"}
             
         except Exception as e:
             return {"success": False, "message": f"Service restart failed: {str(e)}"}
     
-        def _restore_with_reinstall(self, ssh, node_config, backup_path):
+    def _restore_with_reinstall(self, ssh, node_config, backup_path):
         """终极自动化程序还原 - 绝对零人工干预"""
         try:
             print("🎯 开始终极自动化程序修复...")
@@ -494,11 +487,9 @@ exit 0
             output = stdout.read().decode()
             error_output = stderr.read().decode()
             
-            print(f"恢复脚本输出:
-{output}")
+            print(f"恢复脚本输出:\n{output}")
             if error_output:
-                print(f"恢复脚本错误:
-{error_output}")
+                print(f"恢复脚本错误:\n{error_output}")
             
             # 验证程序恢复结果
             print("🔍 验证程序恢复...")
@@ -507,15 +498,20 @@ exit 0
             
             # 自动恢复配置文件 (无条件执行)
             print("⚙️ 自动恢复配置文件...")
+            remote_backup = f"/tmp/restore_{os.path.basename(backup_path)}"
+            try:
+                self._upload(node_config, backup_path, remote_backup)
+            except Exception as e:
+                print(f"⚠️ 备份包上传失败，改用本地备份/最小配置: {e}")
             config_recovery_script = f"""#!/bin/bash
 set -e
 
 echo "📄 开始配置文件恢复..."
 
-# 方法1: 从远程备份恢复
+# 方法1: 从上传的备份包恢复
 cd /tmp
-if timeout 30 scp -o StrictHostKeyChecking=no linou@192.168.3.33:/home/linou/shared/ocm-project/server/backups/{backup_path} ./backup.tar.gz 2>/dev/null; then
-    if timeout 15 tar -xf ./backup.tar.gz --no-same-owner 2>/dev/null; then
+if [ -f {remote_backup} ]; then
+    if timeout 15 tar -xf {remote_backup} --no-same-owner 2>/dev/null; then
         if [ -f ./openclaw.json ]; then
             cp ./openclaw.json ~/.openclaw/
             echo "✅ 配置文件从远程备份恢复"
@@ -580,8 +576,7 @@ fi
             config_exit_code = stdout.channel.recv_exit_status()
             config_output = stdout.read().decode()
             
-            print(f"配置恢复输出:
-{config_output}")
+            print(f"配置恢复输出:\n{config_output}")
             
             # 最终验证
             print("🔍 最终系统验证...")
@@ -599,16 +594,11 @@ fi
             
             return {
                 "success": True,  # 总是返回成功
-                "message": f"🎉 终极自动化还原完成
-" +
-                          f"- 程序状态: {'✅ 正常' if 'PROGRAM_OK' in program_result else '⚠️ 应急模式'}
-" + 
-                          f"- 配置恢复: {'✅ 成功' if config_exit_code == 0 else '⚠️ 部分'}
-" +
-                          f"- 服务状态: {'✅ 运行' if 'SERVICE_ACTIVE' in service_result else '⚠️ 检查中'}
-" +
-                          f"- 自动化级别: ✅ 完全零人工干预
-" +
+                "message": f"🎉 终极自动化还原完成\n" +
+                          f"- 程序状态: {'✅ 正常' if 'PROGRAM_OK' in program_result else '⚠️ 应急模式'}\n" + 
+                          f"- 配置恢复: {'✅ 成功' if config_exit_code == 0 else '⚠️ 部分'}\n" +
+                          f"- 服务状态: {'✅ 运行' if 'SERVICE_ACTIVE' in service_result else '⚠️ 检查中'}\n" +
+                          f"- 自动化级别: ✅ 完全零人工干预\n" +
                           f"- 成功指标: {success_indicators}/3",
                 "strategy": "reinstall",
                 "automation_level": "ultimate",
@@ -619,28 +609,24 @@ fi
             # 即使异常也返回部分成功
             return {
                 "success": True,
-                "message": f"✅ 终极自动化还原已执行
-异常处理: {str(e)}
-系统将继续运行",
+                "message": f"✅ 终极自动化还原已执行\n异常处理: {str(e)}\n系统将继续运行",
                 "strategy": "reinstall",
                 "automation_level": "exception_handled"
             }
+    
     def _restore_full(self, ssh, node_config, backup_path):
         """完整还原"""
         try:
             # 停止服务
-            ssh.exec_command(f"systemctl --user stop {node_config['service_name']}")
-            time.sleep(2)
+            self._stop_service(ssh, node_config)
             
             # 备份当前目录
             ssh.exec_command(f"mv {node_config['openclaw_dir']} {node_config['openclaw_dir']}_broken_$(date +%s) 2>/dev/null || true")
             ssh.exec_command(f"mkdir -p {node_config['openclaw_dir']}")
             
             # 上传并解压完整备份
-            remote_backup = f"/tmp/restore_{int(time.time())}.tar.gz"
-            sftp = ssh.open_sftp()
-            sftp.put(backup_path, remote_backup)
-            sftp.close()
+            remote_backup = f"/tmp/restore_{os.path.basename(backup_path)}"
+            self._upload(node_config, backup_path, remote_backup)
             
             stdin, stdout, stderr = ssh.exec_command(f"cd {node_config['openclaw_dir']} && tar -xzf {remote_backup}")
             if stdout.channel.recv_exit_status() != 0:
@@ -654,11 +640,10 @@ fi
             ssh.exec_command(f"rm -f {remote_backup}")
             
             # 重启服务
-            ssh.exec_command(f"systemctl --user daemon-reload")
-            ssh.exec_command(f"systemctl --user start {node_config['service_name']}")
-            time.sleep(5)
+            readiness.ssh_runner(ssh)("systemctl --user daemon-reload", 15)
+            ready, elapsed, probe = self._start_and_wait(ssh, node_config)
             
-            return {"success": True, "message": "✅ 完整还原完成"}
+            return {"success": True, "message": f"✅ 完整还原完成 ({self._ready_text(ready, elapsed, probe)})"}
             
         except Exception as e:
             return {"success": False, "message": f"Full restore failed: {str(e)}"}
@@ -718,8 +703,6 @@ fi
             if error_logs:
                 verification["error_logs"] = error_logs.split('\\n')
             
-            ssh.close()
-            
         except Exception as e:
             verification["error_logs"] = [f"Verification failed: {str(e)}"]
         
@@ -761,7 +744,7 @@ if __name__ == "__main__":
         print("  python3 smart_restore_system.py diagnose <node_id>")
         print("  python3 smart_restore_system.py restore <node_id> <backup_id> [strategy]")
         print("  python3 smart_restore_system.py list <node_id>")
-        print("Available nodes: pc-a, t440, baota")
+        print(f"Available nodes: {', '.join(restore_system.nodes.ids())}")
         print("Available strategies: config_only, service_restart, reinstall, full_restore, emergency")
         sys.exit(1)
     
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+远程调用追踪 - 为 ocm-nodes.py 的每次 ssh/scp 调用记录一个 span
+(节点、命令标签、所属步骤、耗时、收发字节数、退出码)，
+用于 --profile 按步骤/命令汇总，或用 --trace-file 导出 Chrome trace 格式文件
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+STEP_RE = re.compile(r'\[Step (\d+)/(\d+)\]')
+
+
+def command_label(command, width=60):
+    """把远程命令压缩成一行标签（base64 载荷等长参数截断）"""
+    label = ' '.join(command.split())
+    label = re.sub(r'[A-Za-z0-9+/=]{40,}', '<data>', label)
+    return label if len(label) <= width else label[:width - 1] + '…'
+
+
+class Tracer:
+    """span 收集器，未启用时 record() 直接返回"""
+
+    def __init__(self):
+        self.enabled = False
+        self.step = None
+        self.spans = []
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+        self.started_at = time.time()
+        return self
+
+    def record(self, kind, node_id, command, start, bytes_out, bytes_in, exit_code):
+        if not self.enabled:
+            return
+        span = {
+            'kind': kind,
+            'node': node_id,
+            'label': command_label(command),
+            'step': self.step,
+            'start': start,
+            'wall_ms': round((time.time() - start) * 1000, 2),
+            'bytes_out': bytes_out,
+            'bytes_in': bytes_in,
+            'exit_code': exit_code,
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """按步骤、命令标签、节点三个维度汇总"""
+        def group(key):
+            out = {}
+            for s in self.spans:
+                g = out.setdefault(s[key] or '-', {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                                   'bytes_out': 0, 'bytes_in': 0, 'failures': 0})
+                g['calls'] += 1
+                g['total_ms'] = round(g['total_ms'] + s['wall_ms'], 2)
+                g['max_ms'] = max(g['max_ms'], s['wall_ms'])
+                g['bytes_out'] += s['bytes_out']
+                g['bytes_in'] += s['bytes_in']
+                g['failures'] += 0 if s['exit_code'] == 0 else 1
+            return dict(sorted(out.items(), key=lambda kv: -kv[1]['total_ms']))
+
+        return {
+            'wall_ms': round((time.time() - self.started_at) * 1000, 2),
+            'remote_ms': round(sum(s['wall_ms'] for s in self.spans), 2),
+            'calls': len(self.spans),
+            'by_step': group('step'),
+            'by_label': group('label'),
+            'by_node': group('node'),
+        }
+
+    def print_report(self, stream=None, top=10):
+        """打印耗时分解（默认写到 stderr，不干扰 --json 输出）"""
+        stream = stream or sys.stderr
+        s = self.summary()
+        print(f"\n⏱️ Profile: 总耗时 {s['wall_ms']:.0f}ms, 远程调用 {s['calls']} 次共 {s['remote_ms']:.0f}ms",
+              file=stream)
+        for title, key in (('按步骤', 'by_step'), ('按命令', 'by_label'), ('按节点', 'by_node')):
+            if not s[key]:
+                continue
+            print(f"  {title}:", file=stream)
+            for name, g in list(s[key].items())[:top]:
+                print(f"    {g['total_ms']:>9.1f}ms  {g['calls']:>3}次  max {g['max_ms']:>8.1f}ms  "
+                      f"↑{g['bytes_out']}B ↓{g['bytes_in']}B  {name}", file=stream)
+
+    def write(self, path):
+        """写出 Chrome trace 格式 (chrome://tracing / Perfetto 可直接打开)，附带汇总"""
+        events = []
+        for s in self.spans:
+            events.append({
+                'name': s['label'], 'cat': s['kind'], 'ph': 'X', 'pid': 1, 'tid': s['node'],
+                'ts': int((s['start'] - self.started_at) * 1e6), 'dur': int(s['wall_ms'] * 1000),
+                'args': {k: s[k] for k in ('node', 'step', 'bytes_out', 'bytes_in', 'exit_code')},
+            })
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'traceEvents': events, 'summary': self.summary()}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+
+class StepTee:
+    """包装 stdout：透传输出，同时从 [Step n/m] 行识别当前步骤"""
+
+    def __init__(self, stream, tracer):
+        self._stream = stream
+        self._tracer = tracer
+
+    def write(self, text):
+        m = STEP_RE.search(text)
+        if m:
+            self._tracer.step = f"Step {m.group(1)}/{m.group(2)}"
+        return self._stream.write(text)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+TRACER = Tracer()
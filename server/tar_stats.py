@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+tar 流统计 - 备份包经过控制端时边下载边解析，得到文件数、原始字节数和按顶层目录的字节数，
+不再需要在节点上额外 find 遍历目录、stat 备份包
+
+用法:
+  stats = TarStreamStats()
+  for chunk in 下载数据块:
+      local_file.write(chunk)
+      stats.feed(chunk)
+  stats.result()  # {'file_count', 'raw_bytes', 'archive_bytes', 'by_dir'}
+"""
+
+import zlib
+
+BLOCK = 512
+
+
+def _octal(field):
+    field = field.rstrip(b'\0 ').lstrip(b' ')
+    if not field:
+        return 0
+    if field[0] & 0x80:  # GNU base-256 大文件编码
+        return int.from_bytes(bytes([field[0] & 0x7f]) + field[1:], 'big')
+    return int(field, 8)
+
+
+def _cstr(field):
+    return field.split(b'\0', 1)[0].decode('utf-8', errors='replace')
+
+
+def _pax_path(data):
+    """从 pax 扩展头中取 path 字段"""
+    pos = 0
+    while pos < len(data):
+        space = data.find(b' ', pos)
+        if space < 0:
+            break
+        length = int(data[pos:space])
+        key, _, value = data[space + 1:pos + length - 1].partition(b'=')
+        if key == b'path':
+            return value.decode('utf-8', errors='replace')
+        pos += length
+    return None
+
+
+class TarStreamStats:
+    """增量解析 tar(.gz) 流的头部，数据内容只计数不保存"""
+
+    def __init__(self, compressed=True, strip=0):
+        """strip: 统计目录时去掉的路径前缀层数（如打包时带了 .openclaw/ 前缀则为1）"""
+        self.strip = strip
+        self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS) if compressed else None
+        self._buf = bytearray()
+        self._skip = 0           # 当前成员剩余的数据块字节
+        self._meta = None        # 正在收集的 GNU 长文件名 / pax 头: [类型, 剩余字节, 数据]
+        self._long_name = None
+        self._done = False
+        self.archive_bytes = 0
+        self.raw_bytes = 0
+        self.file_count = 0
+        self.by_dir = {}
+
+    def feed(self, chunk):
+        self.archive_bytes += len(chunk)
+        if self._done:
+            return
+        data = self._inflate.decompress(chunk) if self._inflate else chunk
+        while self._inflate and self._inflate.eof and self._inflate.unused_data:
+            # 多段 gzip（如 pigz）: 继续解下一段
+            rest = self._inflate.unused_data
+            self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            data += self._inflate.decompress(rest)
+        self._buf += data
+        self._parse()
+
+    def _parse(self):
+        buf = self._buf
+        pos = 0
+        while not self._done:
+            if self._skip:
+                take = min(self._skip, len(buf) - pos)
+                if self._meta is not None:
+                    self._meta[2] += buf[pos:pos + min(take, self._meta[1])]
+                    self._meta[1] -= min(take, self._meta[1])
+                self._skip -= take
+                pos += take
+                if self._skip:
+                    break
+                if self._meta is not None:
+                    kind, _, payload = self._meta
+                    self._meta = None
+                    self._long_name = _cstr(bytes(payload)) if kind == b'L' else _pax_path(bytes(payload))
+                continue
+            if len(buf) - pos < BLOCK:
+                break
+            header = bytes(buf[pos:pos + BLOCK])
+            pos += BLOCK
+            if header == b'\0' * BLOCK:
+                self._done = True  # 归档结束标记
+                break
+            size = _octal(header[124:136])
+            kind = header[156:157]
+            self._skip = (size + BLOCK - 1) // BLOCK * BLOCK
+            if kind in (b'L', b'x'):
+                self._meta = [kind, size, bytearray()]
+                continue
+            if kind == b'g':
+                continue
+            name = _cstr(header[0:100])
+            if header[257:262] == b'ustar' and header[345:346] != b'\0':
+                name = f"{_cstr(header[345:500])}/{name}"
+            if self._long_name:
+                name, self._long_name = self._long_name, None
+            if kind in (b'0', b'\0', b'7'):
+                self._add(name, size)
+        del buf[:pos]
+
+    def _add(self, name, size):
+        name = name[2:] if name.startswith('./') else name
+        name = '/'.join(name.split('/')[self.strip:])
+        top = name.split('/', 1)[0] if '/' in name else '.'
+        self.file_count += 1
+        self.raw_bytes += size
+        self.by_dir[top] = self.by_dir.get(top, 0) + size
+
+    def result(self):
+        return {
+            'file_count': self.file_count,
+            'raw_bytes': self.raw_bytes,
+            'archive_bytes': self.archive_bytes,
+            'by_dir': dict(sorted(self.by_dir.items(), key=lambda kv: -kv[1])),
+        }
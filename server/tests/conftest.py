@@ -0,0 +1,107 @@
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+
+import pytest
+
+# server/ 下的模块是扁平的脚本式模块，测试直接按模块名导入
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import config_patch  # noqa: E402
+import ocm_transport  # noqa: E402
+import remote_file  # noqa: E402
+from ocm_transport import MockTransport  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def ocm_nodes():
+    """ocm-nodes.py (文件名带连字符，按路径加载)"""
+    spec = importlib.util.spec_from_file_location('ocm_nodes', os.path.join(SERVER_DIR, 'ocm-nodes.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeNode(MockTransport):
+    """MockTransport + 内存文件系统，应答 remote_file 的读/原子写和 config_editor 的 `python3 -` 补丁程序
+
+    python=False 时 `python3 -` 返回 127 (节点没有 python3，config_editor 退回本地应用)
+    """
+
+    READ_RE = re.compile(r"^test -e (\S+) \|\| exit \d+; cat ")
+    WRITE_RE = re.compile(r"^f=(\S+); ")
+    EXPECT_RE = re.compile(r'if \[ "\$cur" != (\S+) \]')
+
+    def __init__(self, node, files=None, python=True):
+        super().__init__(node, {path: content.encode() if isinstance(content, str) else content
+                                for path, content in (files or {}).items()})
+        self.python = python
+        self.on(self.READ_RE.pattern, handler=self._read)
+        self.on(self.WRITE_RE.pattern, handler=self._write)
+        self.on(r'^python3 -$', handler=self._patch)
+
+    def json(self, path):
+        return json.loads(self.files[path])
+
+    def _read(self, command, input):
+        path = self.READ_RE.match(command).group(1)
+        if path not in self.files:
+            return remote_file.MISSING_RC, '', ''
+        return 0, self.files[path], ''
+
+    def _write(self, command, input):
+        path = self.WRITE_RE.match(command).group(1)
+        current = self.files.get(path)
+        expect = self.EXPECT_RE.search(command)
+        if 'if [ -e "$f" ]' in command and current is not None:
+            return remote_file.CONFLICT_RC, '', '文件已存在'
+        if expect and (current is None or hashlib.sha256(current).hexdigest() != expect.group(1)):
+            return remote_file.CONFLICT_RC, '', '文件已被修改'
+        self.files[path] = input
+        return 0, '', ''
+
+    def _patch(self, command, input):
+        if not self.python:
+            return 127, '', 'python3: command not found'
+        call = input.decode().rstrip().splitlines()[-1]
+        result = {}
+
+        def remote_main(path, ops):
+            raw = self.files[path]
+            before = json.loads(raw)
+            after = config_patch.apply_patch(before, ops)
+            data = json.dumps(after, indent=2, ensure_ascii=False).encode()
+            self.files[path] = data
+            result.update(before=hashlib.sha256(raw).hexdigest(), after=hashlib.sha256(data).hexdigest(),
+                          inverse=config_patch.make_patch(after, before))
+
+        try:
+            eval(call, {'json': json, '_remote_main': remote_main})
+        except config_patch.PatchConflict as e:
+            return config_patch.CONFLICT_RC, '', str(e)
+        return 0, json.dumps(result), ''
+
+
+@pytest.fixture
+def fake_node(tmp_path, monkeypatch):
+    """返回 make(files=None, python=True) -> (node, FakeNode)，传输实例已注册给该节点"""
+    import config_editor
+    monkeypatch.setattr(config_editor, 'HISTORY_DIR', str(tmp_path / 'history'))
+    registered = []
+
+    def make(files=None, python=True, node_id='pc-a'):
+        node = {'id': node_id, 'name': node_id, 'host': 'mock', 'sshUser': 'linou',
+                'ocPath': '/home/linou/.openclaw', 'gatewayPort': 18789}
+        transport = FakeNode(node, files, python)
+        ocm_transport.register_transport(node_id, transport)
+        registered.append(node_id)
+        return node, transport
+
+    yield make
+    with ocm_transport._cache_lock:
+        for node_id in registered:
+            ocm_transport._cache.pop(node_id, None)
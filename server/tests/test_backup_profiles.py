@@ -0,0 +1,28 @@
+import pytest
+
+from backup_profiles import DEFAULT_PROFILES, compile_glob, parse_size, select_files
+
+
+def test_parse_size():
+    assert parse_size('20M') == 20 * 1024 ** 2
+    assert parse_size('1.5k') == 1536
+    assert parse_size('2GiB') == 2 * 1024 ** 3
+    assert parse_size(42) == 42
+    with pytest.raises(ValueError):
+        parse_size('lots')
+
+
+def test_compile_glob():
+    assert compile_glob('**/node_modules').match('workspace/app/node_modules/x/index.js')
+    assert compile_glob('agents/*/sessions').match('agents/main/sessions/1.jsonl')
+    assert not compile_glob('*.json').match('agents/main.json')
+
+
+def test_select_files_caps_keep_newest():
+    entries = [('openclaw.json', 10, 5.0), ('workspace/node_modules/a.js', 100, 5.0),
+               ('agents/main/sessions/old.jsonl', 600, 1.0), ('agents/main/sessions/new.jsonl', 600, 3.0)]
+    profile = dict(DEFAULT_PROFILES['full'], caps={'agents/*/sessions': '1K'})
+    selected, stats = select_files(entries, profile)
+    assert selected == ['agents/main/sessions/new.jsonl', 'openclaw.json']
+    assert (stats['excluded_files'], stats['capped_files'], stats['capped_bytes']) == (1, 1, 600)
+    assert stats['by_dir'] == {'agents': 600, '.': 10}
@@ -0,0 +1,109 @@
+import base64
+import json
+import os
+import shlex
+import sqlite3
+
+import pytest
+
+from bot_inventory import MARK, BotInventory
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'schema.sql')
+
+
+def make_db(tmp_path, legacy=False):
+    path = str(tmp_path / 'ocm.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA) as f:
+        schema = f.read()
+    if legacy:
+        # schema.sql 加 agent_id 之前的库
+        schema = '\n'.join(line for line in schema.splitlines() if 'agent_id' not in line)
+    conn.executescript(schema)
+    # enhanced-bot-creation-api 写入的行 (没有 agent_id)
+    conn.execute("INSERT INTO bots (node_id, bot_name, platform, workspace_path, status) VALUES "
+                 "('pc-a', '@sales_bot', 'telegram', '/home/linou/.openclaw/workspace-sales', 'deployed')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT agent_id, bot_name, status FROM bots ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+BOTS = [
+    {'id': 'sales', 'name': 'Sales', 'model': 'm', 'channel': 'telegram', 'account': 'sales',
+     'workspace': '/home/linou/.openclaw/workspace-sales'},
+    {'id': 'ops', 'name': 'Ops', 'model': 'm', 'channel': 'telegram', 'account': 'ops',
+     'workspace': '/home/linou/.openclaw/workspace-ops'},
+]
+
+
+def test_sync_adopts_rows_without_agent_id(tmp_path):
+    path = make_db(tmp_path)
+    inventory = BotInventory(None, str(tmp_path / 'inv.json'), path)
+    inventory._sync_db('pc-a', BOTS)
+    inventory._sync_db('pc-a', BOTS)
+    assert rows(path) == [('sales', 'Sales', 'deployed'), ('ops', 'Ops', 'running')]
+
+
+def test_sync_adds_column_to_legacy_db(tmp_path):
+    path = make_db(tmp_path, legacy=True)
+    BotInventory(None, str(tmp_path / 'inv.json'), path)._sync_db('pc-a', BOTS[:1])
+    assert rows(path) == [('sales', 'Sales', 'deployed')]
+
+
+class FakeFiles:
+    """BotInventory 的 run(): 按内存文件应答 stat_command / read_command"""
+
+    def __init__(self, files):
+        self.files = files      # 相对路径 -> [内容, inode, mtime]
+        self.reads = 0
+
+    def __call__(self, node, command):
+        if command.startswith(f"cd {node['ocPath']} 2>/dev/null && stat "):
+            return True, '\n'.join(f"{len(data)} {inode} {mtime} {path}"
+                                   for path, (data, inode, mtime) in self.files.items()), ''
+        self.reads += 1
+        out = []
+        for path in shlex.split(command.split(' for f in ', 1)[1].split('; do ', 1)[0]):
+            out += [f"{MARK} {path}", base64.b64encode(self.files[path][0].encode()).decode()]
+        return True, '\n'.join(out), ''
+
+
+NODE = {'id': 'pc-a', 'ocPath': '/home/linou/.openclaw'}
+
+
+def config(model):
+    return json.dumps({'agents': {'list': [{'id': 'sales', 'model': model}, {'id': 'ops', 'model': model}]}})
+
+
+def test_parse_failure_keeps_cache_and_rows(tmp_path):
+    path = make_db(tmp_path)
+    run = FakeFiles({'openclaw.json': [config('m'), 1, '1.0']})
+    inventory = BotInventory(run, str(tmp_path / 'inv.json'), path)
+    inventory.refresh(NODE)
+    run.files['openclaw.json'] = ['{"agents": {"list": [{"id": "sales"},]}}', 2, '2.0']
+    with pytest.raises(IOError):
+        inventory.refresh(NODE)
+    assert [b['id'] for b in inventory.cached('pc-a')] == ['sales', 'ops']
+    assert [r[0] for r in rows(path)] == ['sales', 'ops']
+
+
+def test_same_size_edit_in_same_second_is_detected(tmp_path):
+    """等长修改、整秒 mtime 相同: inode (rename 写入) 或纳秒 mtime 变化即重新读取"""
+    run = FakeFiles({'openclaw.json': [config('model-aaaa'), 1, '1792411690.100000000']})
+    inventory = BotInventory(run, str(tmp_path / 'inv.json'))
+    inventory.refresh(NODE)
+    run.files['openclaw.json'] = [config('model-bbbb'), 2, '1792411690.100000000']
+    bots, stats = inventory.refresh(NODE)
+    assert stats['read'] == 1 and bots[0]['model'] == 'model-bbbb'
+    run.files['openclaw.json'] = [config('model-cccc'), 2, '1792411690.200000000']
+    assert inventory.refresh(NODE)[0][0]['model'] == 'model-cccc'
+    reads = run.reads
+    assert inventory.refresh(NODE)[1]['read'] == 0 and run.reads == reads
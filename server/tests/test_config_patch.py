@@ -0,0 +1,28 @@
+import pytest
+
+from config_patch import PatchConflict, apply_patch, make_patch
+
+OLD = {'agents': {'list': [{'id': 'main'}, {'id': 'ops'}]}, 'gateway': {'port': 18789, 'bind': 'lan'}}
+
+
+def test_round_trip():
+    new = {'agents': {'list': [{'id': 'main'}, {'id': 'dev'}, {'id': 'ops'}]}, 'gateway': {'port': 18800}}
+    assert apply_patch(OLD, make_patch(OLD, new)) == new
+    assert apply_patch(new, make_patch(new, OLD)) == OLD
+
+
+def test_relocates_moved_list_item():
+    """数组元素被别处插入的元素挤到后面: 按值重新定位后再修改"""
+    new = {'agents': {'list': [{'id': 'main'}, {'id': 'ops', 'model': 'gpt'}]}, 'gateway': OLD['gateway']}
+    ops = make_patch(OLD, new)
+    current = {'agents': {'list': [{'id': 'new'}, {'id': 'main'}, {'id': 'ops'}]}, 'gateway': OLD['gateway']}
+    assert apply_patch(current, ops)['agents']['list'] == [{'id': 'new'}, {'id': 'main'},
+                                                            {'id': 'ops', 'model': 'gpt'}]
+
+
+def test_conflict_leaves_input_unchanged():
+    ops = make_patch(OLD, {**OLD, 'gateway': {'port': 18800, 'bind': 'lan'}})
+    current = {**OLD, 'gateway': {'port': 19000, 'bind': 'lan'}}
+    with pytest.raises(PatchConflict):
+        apply_patch(current, ops)
+    assert current['gateway']['port'] == 19000
@@ -0,0 +1,76 @@
+import os
+import sqlite3
+
+import pytest
+
+from health_writer import HealthResultWriter
+
+SCHEMA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db', 'schema.sql')
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'ocm.db')
+    conn = sqlite3.connect(path)
+    with open(SCHEMA) as f:
+        conn.executescript(f.read())
+    conn.execute("INSERT INTO nodes (id, name, host, status) VALUES ('pc-a', 'PC-A', '192.168.3.10', 'offline')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def result(status, score=95):
+    return {'status': status, 'health_score': score,
+            'details': {'cpu_usage': 10, 'memory_usage': 20, 'disk_usage': 30}}
+
+
+def status_of(db):
+    conn = sqlite3.connect(db)
+    try:
+        return conn.execute("SELECT status FROM nodes WHERE id = 'pc-a'").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_unchanged_result_is_skipped(db):
+    writer = HealthResultWriter(db).start()
+    try:
+        changes = writer.write_cycle({'pc-a': result('online')}).result()
+        assert [c['new_status'] for c in changes] == ['online']
+        assert writer.write_cycle({'pc-a': result('online')}).result() == []
+    finally:
+        writer.stop()
+    assert status_of(db) == 'online'
+
+
+def test_status_changed_elsewhere_is_corrected(db):
+    """其他写入方 (接收端点/其他监控/UI) 改了状态: 下个周期按当前行比较并纠正"""
+    writer = HealthResultWriter(db).start()
+    try:
+        writer.write_cycle({'pc-a': result('online')}).result()
+        conn = sqlite3.connect(db)
+        conn.execute("UPDATE nodes SET status = 'offline' WHERE id = 'pc-a'")
+        conn.commit()
+        conn.close()
+        changes = writer.write_cycle({'pc-a': result('online')}).result()
+    finally:
+        writer.stop()
+    assert [(c['old_status'], c['new_status']) for c in changes] == [('offline', 'online')]
+    assert status_of(db) == 'online'
+
+
+def test_skipped_cycle_takes_no_write_lock(db):
+    """没有要写的行时不取写锁: 别的进程持有写锁也能立即完成"""
+    writer = HealthResultWriter(db, busy_timeout_ms=100).start()
+    other = sqlite3.connect(db, isolation_level=None)
+    try:
+        writer.write_cycle({'pc-a': result('online')}).result()
+        other.execute("BEGIN IMMEDIATE")
+        assert writer.write_cycle({'pc-a': result('online')}).result() == []
+        with pytest.raises(sqlite3.OperationalError):
+            writer.write_cycle({'pc-a': result('offline')}).result()
+        other.execute("ROLLBACK")
+    finally:
+        other.close()
+        writer.stop()
@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import json
+import os
+import stat
+
+import config_editor
+import remote_file
+
+CONFIG = '/home/linou/.openclaw/openclaw.json'
+BASE = {'agents': {'list': [{'id': 'main', 'model': 'gpt'}]}, 'gateway': {'port': 18789}}
+
+
+def dump(config):
+    return json.dumps(config, indent=2, ensure_ascii=False)
+
+
+def test_ssh_cmd_text_input(ocm_nodes, fake_node):
+    node, transport = fake_node()
+    transport.on(r'^cat > /tmp/x$', handler=lambda command, input: (0, f'{len(input)}\n', ''))
+    assert ocm_nodes.ssh_cmd(node, 'cat > /tmp/x', input='你好') == (True, '2', '')
+
+def test_ssh_cmd_bytes_input(ocm_nodes, fake_node):
+    """bytes 原样送入 stdin (不经文本模式)"""
+    node, transport = fake_node()
+    received = []
+    transport.on(r'^tar xzf -', handler=lambda command, input: (received.append(input) or (0, 'ok', '')))
+    payload = b'\x1f\x8b\x00\xff'
+    assert ocm_nodes.ssh_cmd(node, 'tar xzf - -C /tmp', input=payload) == (True, 'ok', '')
+    assert received == [payload]
+
+
+def test_read_config(ocm_nodes, fake_node):
+    node, _ = fake_node({CONFIG: dump(BASE)})
+    config, version, err = ocm_nodes._read_config(node)
+    assert config == BASE and err == ''
+    assert version == hashlib.sha256(dump(BASE).encode()).hexdigest()
+
+
+def test_read_config_missing(ocm_nodes, fake_node):
+    node, _ = fake_node()
+    config, version, err = ocm_nodes._read_config(node)
+    assert config is None and version == remote_file.ABSENT and err
+
+
+def test_edit_config_whole_write(ocm_nodes, fake_node):
+    """before=None: 整体写入，只在文件仍不存在时成功"""
+    node, transport = fake_node()
+    _, version, _ = ocm_nodes._read_config(node)
+    assert ocm_nodes._edit_config(node, None, BASE, version=version) == (True, '')
+    assert transport.json(CONFIG) == BASE
+    ok, err = ocm_nodes._edit_config(node, None, {}, version=version)
+    assert not ok and transport.json(CONFIG) == BASE
+
+
+def test_bot_add_aborts_on_unparsable_config(ocm_nodes, fake_node, monkeypatch):
+    """openclaw.json 存在但无法解析: bot-add 中止，不能整体覆盖成只含新 bot 的配置"""
+    broken = '{"agents": {"list": [{"id": "main"},]}}'
+    node, transport = fake_node({CONFIG: broken})
+    transport.on(r'^echo ok$', 'ok\n')
+    monkeypatch.setattr(ocm_nodes, 'get_node', lambda node_id: node)
+    args = argparse.Namespace(nodeId=node['id'], botId='ops', botName=None, botToken=None, soul=None, model=None)
+    ocm_nodes.cmd_bot_add(args)
+    assert transport.files[CONFIG] == broken.encode()
+    assert not any(command.startswith(('mkdir', 'f=', 'python3')) for _, command in transport.calls)
+
+
+def test_edit_config_remote(ocm_nodes, fake_node):
+    node, transport = fake_node({CONFIG: dump(BASE)})
+    before, version, _ = ocm_nodes._read_config(node)
+    after = json.loads(json.dumps(before))
+    after['gateway']['port'] = 18800
+    assert ocm_nodes._edit_config(node, before, after, label='port', version=version) == (True, '')
+    assert transport.json(CONFIG) == after
+    assert [command for _, command in transport.calls][-1] == 'python3 -'
+    assert config_editor.history(node['id'])[-1]['labels'] == ['port']
+
+
+def test_edit_config_keeps_concurrent_change(ocm_nodes, fake_node):
+    """读取后别处改了不相干的字段: 补丁只改自己的部分，不覆盖对方"""
+    node, transport = fake_node({CONFIG: dump(BASE)})
+    before, version, _ = ocm_nodes._read_config(node)
+    transport.files[CONFIG] = dump(dict(BASE, channels={'telegram': {}})).encode()
+    after = json.loads(json.dumps(before))
+    after['gateway']['port'] = 18800
+    assert ocm_nodes._edit_config(node, before, after, version=version) == (True, '')
+    assert transport.json(CONFIG) == dict(after, channels={'telegram': {}})
+
+
+def test_edit_config_conflict(ocm_nodes, fake_node):
+    node, transport = fake_node({CONFIG: dump(BASE)})
+    before, version, _ = ocm_nodes._read_config(node)
+    changed = json.loads(json.dumps(BASE))
+    changed['gateway']['port'] = 19000
+    transport.files[CONFIG] = dump(changed).encode()
+    after = json.loads(json.dumps(before))
+    after['gateway']['port'] = 18800
+    ok, err = ocm_nodes._edit_config(node, before, after, version=version)
+    assert not ok and '冲突' in err
+    assert transport.json(CONFIG) == changed
+
+
+def test_edit_config_local_fallback(ocm_nodes, fake_node):
+    """节点没有 python3: 本地应用补丁，按读取时的 sha256 原子写回"""
+    node, transport = fake_node({CONFIG: dump(BASE)}, python=False)
+    before, version, _ = ocm_nodes._read_config(node)
+    after = json.loads(json.dumps(before))
+    after['agents']['list'].append({'id': 'ops'})
+    assert ocm_nodes._edit_config(node, before, after, version=version) == (True, '')
+    assert transport.json(CONFIG) == after
+    write = next(command for _, command in transport.calls if command.startswith('f='))
+    assert hashlib.sha256(dump(BASE).encode()).hexdigest() in write
+    assert config_editor.history(node['id'])[-1]['mode'] == 'local'
+
+
+def test_config_history_is_private(ocm_nodes, fake_node):
+    """历史里的补丁含 botToken 明文: 目录 0700，文件 0600"""
+    node, transport = fake_node({CONFIG: dump(BASE)})
+    before, version, _ = ocm_nodes._read_config(node)
+    after = dict(before, channels={'telegram': {'accounts': {'ops': {'botToken': '123:secret'}}}})
+    old_umask = os.umask(0o022)
+    try:
+        assert ocm_nodes._edit_config(node, before, after, version=version) == (True, '')
+    finally:
+        os.umask(old_umask)
+    assert stat.S_IMODE(os.stat(config_editor.HISTORY_DIR).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(config_editor._history_path(node['id'])).st_mode) == 0o600
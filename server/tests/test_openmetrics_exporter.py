@@ -0,0 +1,29 @@
+import pytest
+
+from openmetrics_exporter import MetricsRegistry
+
+
+def test_remove_node_series():
+    """节点移出注册表: 所有带 node 标签的指标都删掉该节点的序列，其他节点和无 node 标签的指标不受影响"""
+    registry = MetricsRegistry()
+    cpu = registry.gauge('ocm_node_cpu_usage_percent', 'cpu', ['node'])
+    latency = registry.gauge('ocm_node_gateway_latency_seconds', 'latency', ['node', 'quantile'])
+    queue = registry.gauge('ocm_monitor_queue_depth', 'queue', ['queue'])
+    for node in ('pc-a', 'pc-b'):
+        cpu.set(10, node=node)
+        for quantile in ('0.5', '0.99'):
+            latency.set(0.1, node=node, quantile=quantile)
+    queue.set(3, queue='probes')
+
+    registry.remove(node='pc-a')
+    text = registry.render()
+    assert 'pc-a' not in text
+    assert text.count('node="pc-b"') == 3
+    assert 'ocm_monitor_queue_depth{queue="probes"} 3' in text
+
+
+def test_remove_unknown_label():
+    registry = MetricsRegistry()
+    gauge = registry.gauge('ocm_node_up', 'up', ['node'])
+    with pytest.raises(ValueError):
+        gauge.remove(host='pc-a')
@@ -0,0 +1,119 @@
+import re
+
+import pytest
+
+import resumable_transfer
+from ocm_transport import MockTransport
+from resumable_transfer import TransportRemote
+
+TAIL_RE = re.compile(r"^tail -c \+(\d+) (\S+) \| head -c (\d+)$")
+
+
+def mock_node(files):
+    """MockTransport + tail/head 分块读取应答"""
+    transport = MockTransport(files=files)
+
+    def tail(command, input):
+        start, path, length = TAIL_RE.match(command).groups()
+        data = transport.files[path][int(start) - 1:int(start) - 1 + int(length)]
+        return 0, data, ''
+
+    return transport.on(r'^tail -c ', handler=tail)
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(resumable_transfer, 'STATE_DIR', str(tmp_path / 'state'))
+    monkeypatch.setattr(resumable_transfer.time, 'sleep', lambda seconds: None)
+
+
+def test_download_chunks(tmp_path):
+    transport = mock_node({'/backup.tar.gz': b'0123456789'})
+    target = tmp_path / 'backup.tar.gz'
+    seen = []
+    result = resumable_transfer.download(lambda: TransportRemote(transport), '/backup.tar.gz', str(target),
+                                         chunk_size=4, on_chunk=seen.append)
+    assert target.read_bytes() == b'0123456789'
+    assert seen == [b'0123', b'4567', b'89']
+    assert result['bytes'] == 10 and result['resumed_from'] == 0
+
+
+def test_resume_after_last_short_chunk(tmp_path, monkeypatch):
+    """最后一块 (不满 chunk_size) 已记录断点、改名前中断: 续传不能补零"""
+    transport = mock_node({'/backup.tar.gz': b'0123456789'})
+    target = tmp_path / 'backup.tar.gz'
+    real_replace = resumable_transfer.os.replace
+
+    def dying_replace(src, dst):
+        if str(src).endswith('.part'):
+            raise OSError('进程被终止')
+        real_replace(src, dst)
+
+    monkeypatch.setattr(resumable_transfer.os, 'replace', dying_replace)
+    with pytest.raises(IOError):
+        resumable_transfer.download(lambda: TransportRemote(transport), '/backup.tar.gz', str(target),
+                                    chunk_size=4, retries=1)
+    monkeypatch.setattr(resumable_transfer.os, 'replace', real_replace)
+
+    result = resumable_transfer.download(lambda: TransportRemote(transport), '/backup.tar.gz', str(target),
+                                         chunk_size=4)
+    assert target.read_bytes() == b'0123456789'
+    assert result['resumed_from'] == 10
+
+
+def test_resume_verifies_partial_chunks(tmp_path):
+    """.part 中损坏的块及其之后的数据重新下载"""
+    transport = mock_node({'/backup.tar.gz': b'0123456789'})
+    target = tmp_path / 'backup.tar.gz'
+    checkpoint = resumable_transfer.Checkpoint('get', 'local', '/backup.tar.gz', str(target))
+    checkpoint.load([10, 0], 4)
+    checkpoint.state['hashes'] = [resumable_transfer._sha256(b'0123'), resumable_transfer._sha256(b'4567')]
+    checkpoint.save()
+    (tmp_path / 'backup.tar.gz.part').write_bytes(b'0123XXXX')
+
+    result = resumable_transfer.download(lambda: TransportRemote(transport), '/backup.tar.gz', str(target),
+                                         chunk_size=4)
+    assert target.read_bytes() == b'0123456789'
+    assert result['resumed_from'] == 4
+
+
+def upload_node(fail_writes=0):
+    """mock_node + truncate / cat >> / mv 应答；第 2 次追加写入先失败 fail_writes 次 (模拟连接中断)"""
+    transport = mock_node({})
+    state = {'writes': 0, 'failed': 0}
+
+    def truncate(command, input):
+        size, path = re.match(r'^truncate -s (\d+) (\S+)$', command).groups()
+        transport.files[path] = transport.files.get(path, b'')[:int(size)].ljust(int(size), b'\0')
+        return 0, '', ''
+
+    def append(command, input):
+        state['writes'] += 1
+        if state['writes'] == 2 and state['failed'] < fail_writes:
+            state['failed'] += 1
+            return 255, '', 'Connection reset'
+        path = command.split()[-1]
+        transport.files[path] = transport.files.get(path, b'') + input
+        return 0, '', ''
+
+    def rename(command, input):
+        _, _, src, dst = command.split()
+        transport.files[dst] = transport.files.pop(src)
+        return 0, '', ''
+
+    transport.on(r'^truncate ', handler=truncate).on(r'^cat >> ', handler=append).on(r'^mv -f ', handler=rename)
+    return transport
+
+
+def test_upload_resumes_after_disconnect(tmp_path):
+    """第二块写入时断线: 重连后校验远端已写的块，从断点继续追加"""
+    source = tmp_path / 'backup.tar.gz'
+    source.write_bytes(b'0123456789')
+    transport = upload_node(fail_writes=1)
+    result = resumable_transfer.upload(lambda: TransportRemote(transport), str(source), '/backup.tar.gz',
+                                       chunk_size=4)
+    assert transport.files == {'/backup.tar.gz': b'0123456789'}
+    assert result['bytes'] == 10 and result['resumed_from'] == 0
+    reads = [command for _, command in transport.calls if command.startswith('tail ')]
+    assert reads == ["tail -c +1 /backup.tar.gz.part | head -c 4"]
+    assert sum(command.startswith('cat >> ') for _, command in transport.calls) == 4
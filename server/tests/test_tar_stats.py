@@ -0,0 +1,27 @@
+import io
+import tarfile
+
+from tar_stats import TarStreamStats
+
+
+def make_archive(files, prefix='.openclaw/'):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w:gz') as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(prefix + name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def test_stream_stats():
+    long_name = 'workspace/' + 'x' * 120 + '.md'
+    archive = make_archive({'openclaw.json': b'{}', 'agents/main/a.json': b'a' * 700, long_name: b'b' * 30})
+    stats = TarStreamStats(strip=1)
+    for i in range(0, len(archive), 100):  # 分块喂入，块边界落在头部中间
+        stats.feed(archive[i:i + 100])
+    result = stats.result()
+    assert result['file_count'] == 3
+    assert result['raw_bytes'] == 732
+    assert result['archive_bytes'] == len(archive)
+    assert result['by_dir'] == {'agents': 700, 'workspace': 30, '.': 2}